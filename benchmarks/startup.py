@@ -0,0 +1,200 @@
+"""
+Startup benchmarks: how fast a fresh process is ready and how much memory it holds.
+
+    python -m benchmarks.startup --workers 1 4 --runs 3
+
+"imports" times importing the API app and the update pipeline in fresh
+interpreters, as a forked batch process or pool child would. "server"
+starts uvicorn with --workers and reports the time until the first request
+is answered (GET /auth), the time of the first request that loads the
+services (GET /update/jobs), and the RSS of each worker before and after it.
+Runs against an empty temporary data directory with the synthetic provider.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+from pathlib import Path
+from statistics import median
+
+ROOT = Path(__file__).parent.parent
+API_KEY = "bench"
+
+IMPORT_MODULES = {
+    "api": "main",
+    "pipeline": "service.pipeline",
+}
+
+MEASURE_IMPORT = """
+import sys, time, json, resource
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+heavy = [name for name in ("pandas", "numpy", "yfinance", "pyarrow") if name in sys.modules]
+print(json.dumps({{"seconds": seconds, "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, "heavy": heavy}}))
+"""
+
+
+def bench_env(data_dir: Path) -> dict:
+    return {
+        **os.environ,
+        "API_KEY": API_KEY,
+        "DATA_DIR": str(data_dir),
+        "PROVIDER": "synthetic",
+        "SCHEDULER_ENABLED": "0",
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid: int) -> float | None:
+    """Resident memory of a process (Linux /proc), or None if it is gone."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def child_pids(pid: int) -> list[int]:
+    """Direct children of a process (Linux /proc)."""
+    children = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        # The command name is in parentheses and may contain spaces
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+            children.append(int(entry.name))
+    return children
+
+
+def get(port: int, path: str, timeout: float = 5.0) -> int:
+    request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", headers={"X-API-Key": API_KEY})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        response.read()
+        return response.status
+
+
+def bench_imports(module: str, env: dict) -> dict:
+    """Import one module in a fresh interpreter."""
+    output = subprocess.run(
+        [sys.executable, "-c", MEASURE_IMPORT.format(module=module)],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if output.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{output.stderr[-2000:]}")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def bench_server(workers: int, env: dict, timeout: float = 60.0) -> dict:
+    """Start uvicorn and measure the time to the first answered request and the RSS of its workers."""
+    port = free_port()
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+
+    start = time.perf_counter()
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {server.returncode}")
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError(f"No answer within {timeout}s")
+            try:
+                if get(port, "/auth", timeout=1.0) == 200:
+                    break
+            except OSError:
+                time.sleep(0.01)
+        first_request = time.perf_counter() - start
+
+        # With one worker uvicorn serves from the main process
+        pids = child_pids(server.pid) if workers > 1 else [server.pid]
+        # Give the other workers time to finish booting
+        time.sleep(1.0)
+        idle = [rss_mb(pid) for pid in pids]
+
+        start = time.perf_counter()
+        get(port, "/update/jobs", timeout=timeout)
+        first_service_request = time.perf_counter() - start
+        loaded = [rss_mb(pid) for pid in pids]
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    idle = [value for value in idle if value is not None]
+    loaded = [value for value in loaded if value is not None]
+    return {
+        "first_request_seconds": round(first_request, 3),
+        "first_service_request_seconds": round(first_service_request, 3),
+        "idle_rss_mb": round(median(idle), 1) if idle else None,
+        # Only the worker that served /update/jobs grows, so report the largest
+        "loaded_rss_mb": round(max(loaded), 1) if loaded else None,
+    }
+
+
+def print_table(header: list[str], rows: list[list]) -> None:
+    widths = [max(len(str(value)) for value in column) for column in zip(header, *rows)]
+    for row in [header] + rows:
+        print("  ".join(str(value).rjust(width) for value, width in zip(row, widths)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark process startup time and memory")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--runs", type=int, default=3, help="Runs per scenario (the median is reported)")
+    parser.add_argument("--json", default=None, help="Also write the results to this file")
+    args = parser.parse_args()
+
+    data_dir = Path(tempfile.mkdtemp(prefix="rextract-bench-"))
+    env = bench_env(data_dir)
+    results = {"imports": [], "server": []}
+    try:
+        for name, module in IMPORT_MODULES.items():
+            runs = [bench_imports(module, env) for _ in range(args.runs)]
+            results["imports"].append({
+                "module": name,
+                "seconds": round(median(run["seconds"] for run in runs), 3),
+                "rss_mb": round(median(run["rss_mb"] for run in runs), 1),
+                "heavy": runs[0]["heavy"],
+            })
+
+        for workers in args.workers:
+            runs = [bench_server(workers, env) for _ in range(args.runs)]
+            results["server"].append({
+                "workers": workers,
+                **{key: median(run[key] for run in runs if run[key] is not None) for key in runs[0]},
+            })
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    print_table(
+        ["import", "seconds", "rss MB", "heavy modules"],
+        [[result["module"], result["seconds"], result["rss_mb"], ",".join(result["heavy"]) or "-"] for result in results["imports"]],
+    )
+    print()
+    print_table(
+        ["workers", "first request s", "first service request s", "idle rss MB", "loaded rss MB"],
+        [
+            [result["workers"], result["first_request_seconds"], result["first_service_request_seconds"], result["idle_rss_mb"], result["loaded_rss_mb"]]
+            for result in results["server"]
+        ],
+    )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,129 @@
+"""
+Offline update benchmarks against the synthetic provider (no Yahoo calls).
+
+    python -m benchmarks.update --tickers 1 500 5000 --backends csv parquet
+
+Every scenario runs in fresh processes on an empty temporary data directory:
+"cold" fetches the full history of every ticker while the provider pretends
+the newest bars are --lag-days old, then "incremental" adds those days to
+the stored series. Each run reports tickers/sec, rows/sec, peak RSS and the
+time spent per stage (see service.metrics), summed over all pool threads.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+STAGES = ["fetch", "parse", "merge", "write"]
+
+
+def run_phase(tickers: int, timeframes: list[str], workers: int) -> dict:
+    """Run one update of a synthetic universe in this process and measure it."""
+    from service.pipeline import run_update
+    from service.metrics import ROWS_WRITTEN, stage_totals
+
+    symbols = {"NMS": [f"SYN{i:05d}" for i in range(tickers)]}
+
+    start = time.perf_counter()
+    result = run_update("bench", workers, timeframes, symbols=symbols)
+    seconds = time.perf_counter() - start
+
+    rows = sum(ROWS_WRITTEN.value(timeframe) for timeframe in timeframes)
+    stages = stage_totals()
+    return {
+        "seconds": round(seconds, 3),
+        "updated": len(result["updated"]),
+        "failed": len(result["failed"]),
+        "tickers_per_second": round(tickers / seconds, 2),
+        "rows": int(rows),
+        "rows_per_second": round(rows / seconds, 1),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "stages": {stage: round(stages.get(stage, 0.0), 3) for stage in STAGES},
+    }
+
+
+def run_scenario(tickers: int, backend: str, args: argparse.Namespace) -> list[dict]:
+    """Run the cold and incremental phases of one scenario, each in a child process."""
+    data_dir = Path(tempfile.mkdtemp(prefix="rextract-bench-"))
+    results = []
+    try:
+        for phase, lag_days in (("cold", args.lag_days), ("incremental", 0)):
+            env = {
+                **os.environ,
+                "DATA_DIR": str(data_dir),
+                "PROVIDER": "synthetic",
+                "STORAGE_BACKEND": backend,
+                "SYNTHETIC_LAG_DAYS": str(lag_days),
+                "SYNTHETIC_LATENCY": str(args.latency),
+                "SYNTHETIC_ERROR_RATE": str(args.error_rate),
+                "YF_RATE_LIMIT": str(args.rate_limit),
+                "SHARD_COUNT": "1",
+                "SHARD_INDEX": "0",
+            }
+            command = [
+                sys.executable, "-m", "benchmarks.update", "--phase",
+                "--tickers", str(tickers), "--workers", str(args.workers), "--timeframes", *args.timeframes,
+            ]
+            output = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+            if output.returncode != 0:
+                raise RuntimeError(f"{phase} run failed:\n{output.stderr[-2000:]}")
+
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            results.append({"tickers": tickers, "backend": backend, "phase": phase, **result})
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return results
+
+
+def print_table(results: list[dict]) -> None:
+    header = ["tickers", "backend", "phase", "seconds", "tickers/s", "rows", "rows/s", "rss MB"] + STAGES
+    rows = [
+        [
+            result["tickers"], result["backend"], result["phase"], result["seconds"], result["tickers_per_second"],
+            result["rows"], result["rows_per_second"], result["peak_rss_mb"],
+        ] + [result["stages"][stage] for stage in STAGES]
+        for result in results
+    ]
+    widths = [max(len(str(value)) for value in column) for column in zip(header, *rows)]
+    for row in [header] + rows:
+        print("  ".join(str(value).rjust(width) for value, width in zip(row, widths)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark full update cycles against the synthetic provider")
+    parser.add_argument("--tickers", type=int, nargs="+", default=[1, 500, 5000])
+    parser.add_argument("--backends", nargs="+", default=["csv"], choices=["csv", "parquet"])
+    parser.add_argument("--timeframes", nargs="+", default=["1d"])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--lag-days", type=int, default=5, help="Days of bars the incremental run adds")
+    parser.add_argument("--latency", type=float, default=0.05, help="Synthetic seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Synthetic share of failing requests")
+    parser.add_argument("--rate-limit", type=float, default=1000.0, help="Request governor limit (requests/sec)")
+    parser.add_argument("--json", default=None, help="Also write the results to this file")
+    parser.add_argument("--phase", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase:
+        # Child process: keep stdout for the result line
+        from loguru import logger
+        logger.remove()
+        print(json.dumps(run_phase(args.tickers[0], args.timeframes, args.workers)))
+        sys.exit(0)
+
+    results = []
+    for backend in args.backends:
+        for tickers in args.tickers:
+            results.extend(run_scenario(tickers, backend, args))
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
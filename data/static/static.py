@@ -9,6 +9,166 @@ TIMEFRAME_MAP = {
     "1wk": "1wk",
 }
 
+# Max symbols per multi-ticker yf.download request
+YF_BATCH_SIZE = 50
+
+# Yahoo intraday history limits per timeframe: (max lookback in days, max days per request).
+# None means unlimited (the full history comes back in one request)
+TIMEFRAME_LIMITS = {
+    "1m": (30, 7),
+    "5m": (60, 30),
+    "15m": (60, 30),
+    "1h": (730, 180),
+    "1d": (None, None),
+    "1wk": (None, None),
+}
+
+# Request governor for all Yahoo calls (service/yf.py)
+YF_RATE_LIMIT = 2.0          # requests per second, shared by all workers
+YF_BURST = 5                 # requests allowed back to back
+YF_MAX_RETRIES = 4           # retries per request on 429/5xx
+YF_BACKOFF_BASE = 1.0        # seconds, doubled per retry, with jitter
+YF_BACKOFF_MAX = 60.0        # seconds
+YF_BREAKER_WINDOW = 20       # recent requests considered by the circuit breaker
+YF_BREAKER_THRESHOLD = 0.5   # error rate that pauses all requests
+YF_BREAKER_COOLDOWN = 60.0   # seconds to pause
+YF_RETRY_ROUNDS = 1          # extra rounds for (ticker, timeframe) pairs that came back empty
+YF_RESPONSE_TTL = 30.0       # seconds fetched windows are reused by concurrent callers (0 = in-flight sharing only)
+
+# Ticker metadata (service/meta.py): fields of Yahoo's .info per group and how
+# long each group stays fresh in seconds (None = never expires). Fields outside
+# the listed groups fall in "other". A ticker is refreshed once any group is stale,
+# and meta.json is only rewritten when the content hash of a group changed.
+META_FIELD_GROUPS = {
+    "identity": [
+        "symbol", "shortName", "longName", "exchange", "fullExchangeName", "quoteType",
+        "currency", "exchangeTimezoneName", "market", "isin",
+    ],
+    "profile": ["sector", "industry", "country", "website", "longBusinessSummary", "fullTimeEmployees"],
+    "fundamentals": [
+        "marketCap", "sharesOutstanding", "floatShares", "trailingPE", "forwardPE",
+        "trailingEps", "dividendYield", "beta", "bookValue", "priceToBook",
+    ],
+}
+META_TTL = {
+    "identity": 30 * 86400,
+    "profile": 7 * 86400,
+    "fundamentals": 86400,
+    "other": 7 * 86400,
+}
+# Quote fields of .info that move with every trade. They are stored in meta.json
+# but left out of the group hashes, so they alone never count as a change.
+META_VOLATILE_FIELDS = [
+    "currentPrice", "previousClose", "open", "dayLow", "dayHigh", "volume",
+    "averageVolume", "averageVolume10days", "averageDailyVolume10Day", "averageDailyVolume3Month",
+    "bid", "ask", "bidSize", "askSize", "fiftyDayAverage", "twoHundredDayAverage",
+    "fiftyTwoWeekLow", "fiftyTwoWeekHigh", "fiftyTwoWeekChange", "fiftyTwoWeekLowChange",
+    "fiftyTwoWeekHighChange", "fiftyTwoWeekLowChangePercent", "fiftyTwoWeekHighChangePercent",
+    "fiftyTwoWeekRange", "52WeekChange", "SandP52WeekChange", "fiftyDayAverageChange",
+    "fiftyDayAverageChangePercent", "twoHundredDayAverageChange", "twoHundredDayAverageChangePercent",
+    "enterpriseValue", "enterpriseToRevenue", "enterpriseToEbitda", "marketState",
+]
+META_VOLATILE_PREFIXES = ("regularMarket", "preMarket", "postMarket")
+META_BATCH_SIZE = 50    # tickers refreshed per background batch
+META_WORKERS = 4        # concurrent .info requests (all still go through the request governor)
+
+# Default number of worker threads for an update run (override with UPDATE_WORKERS)
+UPDATE_WORKERS = 8
+
+# Finished jobs kept in memory for GET /update/jobs; older ones are dropped when new jobs are submitted
+JOBS_KEEP = 200
+
+# Tickers fetched and written per chunk of an update run; a crashed run resumes after the last written chunk
+RUN_CHUNK_TICKERS = 500
+
+# Host-level sharding: this host updates only the tickers whose hash falls in
+# shard SHARD_INDEX of SHARD_COUNT (override with the SHARD_INDEX/SHARD_COUNT env vars)
+SHARD_COUNT = 1
+SHARD_INDEX = 0
+
+# Market data provider: "yahoo" or "synthetic" (generated bars for benchmarks, override with PROVIDER)
+PROVIDER = "yahoo"
+
+# Synthetic provider behaviour (each can be overridden by an env var of the same name)
+SYNTHETIC_LATENCY = 0.05       # mean seconds per request
+SYNTHETIC_ERROR_RATE = 0.0     # share of requests failing with a server error
+SYNTHETIC_RATE_LIMIT = 0.0     # requests per second before answering 429 (0 = unlimited)
+SYNTHETIC_LAG_DAYS = 0         # pretend the newest bars are this many days old
+SYNTHETIC_EXCHANGE = "NMS"     # calendar the generated sessions follow
+SYNTHETIC_START = "2000-01-01" # first bar of a full daily history
+
+# Bar storage backend: "csv" (one file per series) or "parquet" (override with STORAGE_BACKEND)
+STORAGE_BACKEND = "csv"
+
+# Partition period per timeframe for partitioned backends
+STORAGE_PARTITIONS = {
+    "1m": "month",
+    "5m": "month",
+    "15m": "month",
+    "1h": "month",
+    "1d": "year",
+    "1wk": "year",
+}
+
+# How each timeframe is kept up to date: "fetch" downloads it from Yahoo,
+# "derive" resamples it locally from the source in DERIVED_TIMEFRAMES once
+# the series has been seeded by one full download
+TIMEFRAME_SOURCES = {
+    "1m": "fetch",
+    "5m": "derive",
+    "15m": "derive",
+    "1h": "derive",
+    "1d": "fetch",
+    "1wk": "derive",
+}
+
+# Source timeframe for each derivable timeframe
+DERIVED_TIMEFRAMES = {
+    "5m": "1m",
+    "15m": "1m",
+    "1h": "1m",
+    "1wk": "1d",
+}
+
+# Rolling features computed after each write (service/features.py), stored in
+# <timeframe>_features.csv next to the bars (enable with FEATURES_ENABLED=1).
+# Each kind maps to its window lengths in bars: "return" (simple return over n bars),
+# "sma" (moving average of Close), "atr" (Wilder's average true range), "vwap" (rolling VWAP)
+FEATURES_ENABLED = False
+FEATURE_TIMEFRAMES = ["1d", "1wk", "1h"]
+FEATURES = {
+    "return": [1, 5],
+    "sma": [20, 50, 200],
+    "atr": [14],
+    "vwap": [20],
+}
+FEATURE_STATE_SLACK = 10    # bars kept beyond the longest window, so re-fetched last bars extend in place
+
+# In-memory LRU cache of hot series for the /bars read API
+BARS_CACHE_BYTES = 256 * 1024 * 1024
+# Typed and cached prices are float32 (service/bars.py) unless one is at or above this,
+# where float32's ~7 significant digits can no longer hold the cents
+FLOAT32_PRICE_LIMIT = 100_000
+BARS_CACHE_PROMOTE_AFTER = 2    # reads of a series before it is loaded whole into the cache
+
+# Rows per chunk for the streaming /export endpoint
+EXPORT_CHUNK_ROWS = 10_000
+
+# In-process scheduler: update each universe this many minutes after its exchange's
+# session closes (enable with SCHEDULER_ENABLED=1, override universes with SCHEDULE_UNIVERSES=a,b)
+SCHEDULE_UNIVERSES = ["test"]
+SCHEDULE_DELAY_MINUTES = 20
+
+# Fetch order within a run: lower first, then the most stale series first
+TIMEFRAME_PRIORITY = {
+    "1d": 0,
+    "1wk": 1,
+    "1h": 2,
+    "15m": 3,
+    "5m": 4,
+    "1m": 5,
+}
+
 TIMEFRAME_DURATIONS = {
     "1m": 1,
     "5m": 5,
@@ -54,4 +214,116 @@ MARKET_HOURS = {
     "TYO": (9, 0, 15, 0, -480),   # Tokyo (JST -> CET/CEST: -8 hours)
     "HKG": (9, 30, 16, 0, -420),  # Hong Kong (HKT -> CET/CEST: -7 hours)
     "TSE": (9, 30, 16, 0, 360),   # Toronto (EST/EDT -> CET/CEST: +6 hours)
-}
\ No newline at end of file
+}
+
+# Exchange holiday rules used to build the session calendar in service/time.py
+# ("fixed", month, day, observance)  observance: None (dropped on weekends),
+#                                    "us" (Sat -> Fri, Sun -> Mon), "next" (weekend -> next free weekday),
+#                                    "sunday" (Sat dropped, Sun -> next free weekday)
+# ("easter", offset_days)            relative to Easter Sunday (-2 Good Friday, 1 Easter Monday, 39 Ascension)
+# ("weekday", month, weekday, n)     n-th weekday of the month (Monday=0), n=-1 for the last one
+# ("weekday_before", month, day, weekday)  last given weekday strictly before month/day
+# ("weekday_between", month, first_day, last_day, weekday)  the given weekday within a day range
+# Optional trailing (first_year, last_year) limits when a rule applies.
+# Lunar and ad-hoc closures (Asian new year, mourning days, ...) are not covered.
+EXCHANGE_HOLIDAYS = {
+    "NMS": [
+        ("fixed", 1, 1, "us"),
+        ("weekday", 1, 0, 3),             # Martin Luther King Jr. Day
+        ("weekday", 2, 0, 3),             # Presidents' Day
+        ("easter", -2),                   # Good Friday
+        ("weekday", 5, 0, -1),            # Memorial Day
+        ("fixed", 6, 19, "us", (2022, None)),  # Juneteenth
+        ("fixed", 7, 4, "us"),
+        ("weekday", 9, 0, 1),             # Labor Day
+        ("weekday", 11, 3, 4),            # Thanksgiving
+        ("fixed", 12, 25, "us"),
+    ],
+    "LON": [
+        ("fixed", 1, 1, "next"),
+        ("easter", -2),
+        ("easter", 1),
+        ("weekday", 5, 0, 1),             # Early May bank holiday
+        ("weekday", 5, 0, -1),            # Spring bank holiday
+        ("weekday", 8, 0, -1),            # Summer bank holiday
+        ("fixed", 12, 25, "next"),
+        ("fixed", 12, 26, "next"),
+    ],
+    "FRA": [
+        ("fixed", 1, 1, None),
+        ("easter", -2),
+        ("easter", 1),
+        ("fixed", 5, 1, None),
+        ("fixed", 12, 24, None),
+        ("fixed", 12, 25, None),
+        ("fixed", 12, 26, None),
+        ("fixed", 12, 31, None),
+    ],
+    "STO": [
+        ("fixed", 1, 1, None),
+        ("fixed", 1, 6, None),            # Epiphany
+        ("easter", -2),
+        ("easter", 1),
+        ("fixed", 5, 1, None),
+        ("easter", 39),                   # Ascension Day
+        ("fixed", 6, 6, None),            # National Day
+        ("weekday_between", 6, 19, 25, 4),  # Midsummer Eve
+        ("fixed", 12, 24, None),
+        ("fixed", 12, 25, None),
+        ("fixed", 12, 26, None),
+        ("fixed", 12, 31, None),
+    ],
+    "PAR": [
+        ("fixed", 1, 1, None),
+        ("easter", -2),
+        ("easter", 1),
+        ("fixed", 5, 1, None),
+        ("fixed", 12, 25, None),
+        ("fixed", 12, 26, None),
+    ],
+    "TYO": [
+        ("fixed", 1, 1, None),
+        ("fixed", 1, 2, None),
+        ("fixed", 1, 3, None),
+        ("weekday", 1, 0, 2),             # Coming of Age Day
+        ("fixed", 2, 11, "sunday"),       # National Foundation Day
+        ("fixed", 2, 23, "sunday", (2020, None)),  # Emperor's Birthday
+        ("fixed", 4, 29, "sunday"),       # Showa Day
+        ("fixed", 5, 3, "sunday"),        # Constitution Day
+        ("fixed", 5, 4, "sunday"),        # Greenery Day
+        ("fixed", 5, 5, "sunday"),        # Children's Day
+        ("weekday", 7, 0, 3),             # Marine Day
+        ("fixed", 8, 11, "sunday", (2016, None)),  # Mountain Day
+        ("weekday", 9, 0, 3),             # Respect for the Aged Day
+        ("weekday", 10, 0, 2),            # Sports Day
+        ("fixed", 11, 3, "sunday"),       # Culture Day
+        ("fixed", 11, 23, "sunday"),      # Labor Thanksgiving Day
+        ("fixed", 12, 31, None),
+    ],
+    "HKG": [
+        ("fixed", 1, 1, "sunday"),
+        ("easter", -2),
+        ("easter", 1),
+        ("fixed", 5, 1, "sunday"),
+        ("fixed", 7, 1, "sunday"),        # HKSAR Establishment Day
+        ("fixed", 10, 1, "sunday"),       # National Day
+        ("fixed", 12, 25, "sunday"),
+        ("fixed", 12, 26, "sunday"),
+    ],
+    "TSE": [
+        ("fixed", 1, 1, "next"),
+        ("weekday", 2, 0, 3, (2008, None)),  # Family Day
+        ("easter", -2),
+        ("weekday_before", 5, 25, 0),     # Victoria Day
+        ("fixed", 7, 1, "next"),          # Canada Day
+        ("weekday", 8, 0, 1),             # Civic Holiday
+        ("weekday", 9, 0, 1),             # Labour Day
+        ("weekday", 10, 0, 2),            # Thanksgiving
+        ("fixed", 12, 25, "next"),
+        ("fixed", 12, 26, "next"),
+    ],
+}
+EXCHANGE_HOLIDAYS["NYQ"] = EXCHANGE_HOLIDAYS["NMS"]
+
+# First year of the precomputed session calendars (the last is two years ahead of today)
+CALENDAR_START_YEAR = 1970
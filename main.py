@@ -1,20 +1,42 @@
+import sys
 from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
 from loguru import logger
 
-from routes import auth, update
+# Routes import their services (pandas, yfinance) on first use, so a worker
+# starts with only FastAPI loaded
+from routes import auth, update, bars, export, snapshot, metrics, gaps, meta
+from service.settings import get_settings
 
 app = FastAPI(title="r-extract", version="0.1.0")
+app.add_middleware(GZipMiddleware, minimum_size=1000)
 
 app.include_router(auth.router)
 app.include_router(update.router)
+app.include_router(bars.router)
+app.include_router(export.router)
+app.include_router(snapshot.router)
+app.include_router(metrics.router)
+app.include_router(gaps.router)
+app.include_router(meta.router)
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize application on startup."""
     logger.info("Starting R-Extract API")
+    settings = get_settings()
+    if settings.scheduler_enabled:
+        from service.scheduler import start_scheduler
+
+        start_scheduler(list(settings.schedule_universes), settings.schedule_delay_minutes, settings.update_workers)
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown."""
-    logger.info("Shutting down R-Extract API")
\ No newline at end of file
+    logger.info("Shutting down R-Extract API")
+    # Nothing to stop or save unless a request loaded them
+    if "service.scheduler" in sys.modules:
+        sys.modules["service.scheduler"].stop_scheduler()
+    if "service.snapshot" in sys.modules:
+        sys.modules["service.snapshot"].save_snapshots()
@@ -1,17 +1,20 @@
-import os
-from fastapi import APIRouter, Header, HTTPException
-from dotenv import load_dotenv
-from loguru import logger
+import hmac
+from fastapi import APIRouter, Depends, Header, HTTPException
 
-load_dotenv()
+from service.settings import get_settings
 
-router = APIRouter(prefix="/auth", tags=["auth"])
 
-@router.get("")
-async def check_auth(x_api_key: str = Header(alias="X-API-Key")):
-
-    key = os.getenv("API_KEY")
+async def require_key(x_api_key: str = Header(alias="X-API-Key")) -> None:
+    """Router dependency: raise 401 unless the X-API-Key header matches API_KEY."""
+    key = get_settings().api_key
 
-    if x_api_key != key:
+    if key is None or not hmac.compare_digest(x_api_key.encode(), key.encode()):
         raise HTTPException(status_code=401, detail="Unauthorized")
-    return {"message": "Authorized"}
\ No newline at end of file
+
+
+router = APIRouter(prefix="/auth", tags=["auth"], dependencies=[Depends(require_key)])
+
+
+@router.get("")
+async def check_auth():
+    return {"message": "Authorized"}
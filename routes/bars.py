@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+
+from routes.auth import require_key
+
+from data.static.static import EXCHANGE_TIMEZONES, TIMEFRAME_MAP
+
+router = APIRouter(prefix="/bars", tags=["bars"], dependencies=[Depends(require_key)])
+
+
+@router.get("/{exchange}/{ticker}/{timeframe}")
+async def get_bars(
+    exchange: str,
+    ticker: str,
+    timeframe: str,
+    start: str | None = None,
+    end: str | None = None,
+    columns: list[str] | None = Query(default=None),
+):
+    from service.reader import read_bars
+    from service.bars import PRICE_COLUMNS, widen_prices
+
+    exchange = exchange.upper()
+    if exchange not in EXCHANGE_TIMEZONES:
+        raise HTTPException(status_code=400, detail=f"Unknown exchange: {exchange}")
+    if timeframe not in TIMEFRAME_MAP:
+        raise HTTPException(status_code=400, detail=f"Unknown timeframe: {timeframe}")
+
+    # Accept both repeated and comma separated columns
+    if columns:
+        columns = [column for value in columns for column in value.split(",") if column]
+
+    try:
+        data = await run_in_threadpool(read_bars, exchange, ticker, timeframe, start, end, columns)
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if data.empty and 'Date' not in data.columns:
+        raise HTTPException(status_code=404, detail="Series not found")
+
+    return {
+        "exchange": exchange,
+        "ticker": ticker.upper(),
+        "timeframe": timeframe,
+        "count": len(data),
+        "data": {
+            column: (
+                data[column].astype(str).tolist() if column == 'Date'
+                else widen_prices(data[column].to_numpy()).tolist() if column in PRICE_COLUMNS
+                else data[column].tolist()
+            )
+            for column in data.columns
+        },
+    }
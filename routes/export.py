@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+
+from routes.auth import require_key
+
+from data.static.static import TIMEFRAME_MAP
+
+router = APIRouter(prefix="/export", tags=["export"], dependencies=[Depends(require_key)])
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+@router.get("/{universe}/{timeframe}")
+async def export_universe(
+    universe: str,
+    timeframe: str,
+    format: str = "ndjson",
+    since: str | None = None,
+):
+    from service.export import iter_ndjson, iter_arrow, parse_since
+    from service.universe import get_registry
+
+    if format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Invalid format: {format}")
+    if timeframe not in TIMEFRAME_MAP:
+        raise HTTPException(status_code=400, detail=f"Unknown timeframe: {timeframe}")
+    try:
+        get_registry().version(universe)
+        since = parse_since(since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    stream = iter_ndjson if format == "ndjson" else iter_arrow
+    # A sync generator, so Starlette iterates it on the thread pool
+    return StreamingResponse(stream(universe, timeframe, since), media_type=MEDIA_TYPES[format])
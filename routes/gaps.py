@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+
+from routes.auth import require_key
+from service.settings import get_settings
+
+from data.static.static import EXCHANGE_TIMEZONES, TIMEFRAME_MAP
+
+router = APIRouter(prefix="/gaps", tags=["gaps"], dependencies=[Depends(require_key)])
+
+
+@router.get("/repair")
+async def repair(
+    universe: str = "test",
+    timeframes: list[str] | None = Query(default=None),
+):
+    from service.universe import get_registry
+    from service.jobs import submit_job
+
+    try:
+        get_registry().version(universe)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if timeframes:
+        unknown = [timeframe for timeframe in timeframes if timeframe not in TIMEFRAME_MAP]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown timeframes: {unknown}")
+
+    job = submit_job(universe, timeframes or None, get_settings().update_workers, coalesce=True, kind="repair")
+
+    return {"message": "Queued", "job_id": job.id}
+
+
+@router.get("/{exchange}/{ticker}/{timeframe}")
+async def get_gaps(
+    exchange: str,
+    ticker: str,
+    timeframe: str,
+    start: str | None = None,
+    end: str | None = None,
+):
+    from service.gaps import find_gaps
+
+    exchange = exchange.upper()
+    if exchange not in EXCHANGE_TIMEZONES:
+        raise HTTPException(status_code=400, detail=f"Unknown exchange: {exchange}")
+    if timeframe not in TIMEFRAME_MAP:
+        raise HTTPException(status_code=400, detail=f"Unknown timeframe: {timeframe}")
+
+    gaps = await run_in_threadpool(find_gaps, exchange, ticker, timeframe, start, end)
+    return {
+        "exchange": exchange,
+        "ticker": ticker,
+        "timeframe": timeframe,
+        "missing_bars": sum(bars for _, _, bars in gaps),
+        "gaps": [{"start": first.isoformat(), "end": last.isoformat(), "bars": bars} for first, last, bars in gaps],
+    }
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from routes.auth import require_key
+
+from data.static.static import EXCHANGE_TIMEZONES
+
+router = APIRouter(prefix="/meta", tags=["meta"], dependencies=[Depends(require_key)])
+
+
+@router.get("/{exchange}/{ticker}")
+async def get_ticker_meta(
+    exchange: str,
+    ticker: str,
+    refresh: bool = False,
+):
+    from service.meta import get_meta_cache, get_meta_refresher
+
+    exchange = exchange.upper()
+    ticker = ticker.upper()
+    if exchange not in EXCHANGE_TIMEZONES:
+        raise HTTPException(status_code=400, detail=f"Unknown exchange: {exchange}")
+
+    cache = get_meta_cache()
+    data = cache.get(exchange, ticker)
+    stale = cache.is_stale(exchange, ticker)
+    # Served as is; stale or missing metadata is refreshed in the background
+    if stale or refresh:
+        get_meta_refresher().submit(exchange, [ticker])
+
+    if data is None:
+        raise HTTPException(status_code=404, detail=f"No metadata for {ticker} yet, a refresh has been queued")
+    return {
+        "exchange": exchange,
+        "ticker": ticker,
+        "stale": stale,
+        "groups": {
+            group: {"checked_at": check["checked_at"], "changed_at": check["changed_at"]}
+            for group, check in cache.checks(exchange, ticker).items()
+        },
+        "data": data,
+    }
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from routes.auth import require_key
+from service.metrics import render
+
+router = APIRouter(tags=["metrics"], dependencies=[Depends(require_key)])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from routes.auth import require_key
+
+from data.static.static import EXCHANGE_TIMEZONES, TIMEFRAME_MAP
+
+router = APIRouter(prefix="/snapshot", tags=["snapshot"], dependencies=[Depends(require_key)])
+
+
+@router.get("/{exchange}/{timeframe}")
+async def get_snapshot(exchange: str, timeframe: str):
+    from service.snapshot import get_table
+
+    exchange = exchange.upper()
+    if exchange not in EXCHANGE_TIMEZONES:
+        raise HTTPException(status_code=400, detail=f"Unknown exchange: {exchange}")
+    if timeframe not in TIMEFRAME_MAP:
+        raise HTTPException(status_code=400, detail=f"Unknown timeframe: {timeframe}")
+
+    data = get_table(exchange, timeframe).to_dict()
+    return {
+        "exchange": exchange,
+        "timeframe": timeframe,
+        "count": len(data["ticker"]),
+        "data": data,
+    }
@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+from datetime import date, datetime
+
+from data.static.static import EXCHANGE_TIMEZONES, FLOAT32_PRICE_LIMIT
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+BAR_COLUMNS = ['Date', *PRICE_COLUMNS, 'Volume']
+
+
+def bar_date(value) -> date:
+    """
+    Calendar date of a bar time in exchange local time.
+
+    Bar times are stored as str(pd.Timestamp) in exchange local time
+    ("2024-01-02 00:00:00-05:00"), and range bounds are YYYY-MM-DD, so the
+    date of a string is its first ten characters.
+    """
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    raise ValueError(f"Invalid bar time: {value!r}")
+
+
+def utc_ns(dates: pd.Series) -> np.ndarray:
+    """UTC epoch ns of a Date column. Only string columns are parsed."""
+    if not isinstance(dates.dtype, pd.DatetimeTZDtype):
+        dates = pd.to_datetime(dates, utc=True, format="ISO8601")
+    return dates.dt.as_unit('ns').astype('int64').to_numpy()
+
+
+def price_dtype(prices: np.ndarray) -> type:
+    """
+    float32, unless a price is at or above FLOAT32_PRICE_LIMIT, where
+    float32 can no longer hold the cents and float64 is kept.
+    """
+    if prices.size and np.nanmax(np.abs(prices), initial=0) >= FLOAT32_PRICE_LIMIT:
+        return np.float64
+    return np.float32
+
+
+def widen_prices(prices: np.ndarray) -> np.ndarray:
+    """
+    Prices as float64 for output (JSON, Arrow). A float32 price becomes the
+    shortest decimal that reads back as the same float32, i.e. what it
+    prints as: 187.44 rather than 187.44000244140625.
+    """
+    if prices.dtype != np.float32:
+        return prices
+    wide = prices.astype(np.float64)
+    result = wide.copy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        magnitude = np.floor(np.log10(np.abs(wide)))
+    done = ~np.isfinite(magnitude)
+    magnitude[done] = 0
+    # float32 needs at most 9 significant digits
+    for digits in range(1, 10):
+        exponent = digits - 1 - magnitude
+        # Scale by exact powers of ten either way, so the result is the double nearest the decimal
+        up, down = 10.0 ** np.maximum(exponent, 0), 10.0 ** np.maximum(-exponent, 0)
+        rounded = np.round(wide * up / down) * down / up
+        hit = ~done & (rounded.astype(np.float32) == prices)
+        result[hit] = rounded[hit]
+        done |= hit
+        if done.all():
+            break
+    return result
+
+
+def to_typed(data: pd.DataFrame, exchange: str) -> pd.DataFrame:
+    """
+    Convert a bar frame to typed columns: Date as a timestamp in the exchange
+    timezone, prices as float32 (see price_dtype) and integer volume.
+    Provider and stored frames all go through this one conversion, and the
+    cache (Bars) returns the same types.
+    """
+    data = data.copy()
+    timezone = EXCHANGE_TIMEZONES.get(exchange.upper(), "UTC")
+    if isinstance(data['Date'].dtype, pd.DatetimeTZDtype):
+        data['Date'] = data['Date'].dt.tz_convert(timezone)
+    else:
+        data['Date'] = pd.to_datetime(data['Date'], utc=True, format="ISO8601").dt.tz_convert(timezone)
+    # Parsing picks the unit from the strings, the cache (Bars) always holds ns
+    data['Date'] = data['Date'].dt.as_unit('ns')
+    prices = [column for column in PRICE_COLUMNS if column in data.columns]
+    if prices:
+        dtype = price_dtype(data[prices].to_numpy(dtype=np.float64))
+        data[prices] = data[prices].astype(dtype)
+    if 'Volume' in data.columns:
+        data['Volume'] = data['Volume'].fillna(0).astype('int64')
+    return data
+
+
+class Bars:
+    """
+    Compact in-memory bar series: sorted UTC epoch ns timestamps (int64),
+    Open/High/Low/Close as one (n, 4) float32 matrix and integer volume,
+    with the exchange timezone kept as metadata: 32 bytes per bar against 48
+    for float64 prices, and ranges are binary searches.
+
+    Prices follow to_typed (see price_dtype), so a series priced at or above
+    FLOAT32_PRICE_LIMIT keeps float64, and a slice of it entirely below the
+    limit comes back as float32 like a ranged read from the store.
+    """
+
+    __slots__ = ("timestamps", "prices", "volumes", "timezone")
+
+    def __init__(self, timestamps: np.ndarray, prices: np.ndarray, volumes: np.ndarray, timezone: str):
+        self.timestamps = timestamps
+        self.prices = prices
+        self.volumes = volumes
+        self.timezone = timezone
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame, timezone: str) -> "Bars":
+        """Build from a bar frame sorted by Date (missing price columns become NaN)."""
+        timestamps = utc_ns(data['Date'])
+        prices = np.column_stack([
+            data[column].to_numpy(dtype=np.float64) if column in data.columns else np.full(len(data), np.nan)
+            for column in PRICE_COLUMNS
+        ]) if len(data) else np.empty((0, len(PRICE_COLUMNS)))
+        prices = prices.astype(price_dtype(prices))
+        if 'Volume' in data.columns:
+            volumes = data['Volume'].fillna(0).to_numpy(dtype=np.int64)
+        else:
+            volumes = np.zeros(len(data), dtype=np.int64)
+        return cls(timestamps, prices, volumes, timezone)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + self.prices.nbytes + self.volumes.nbytes
+
+    def slice(self, start_ns: int | None = None, end_ns: int | None = None) -> "Bars":
+        """The bars with start_ns <= timestamp <= end_ns (both optional), without copying."""
+        i = 0 if start_ns is None else int(np.searchsorted(self.timestamps, start_ns, side="left"))
+        j = len(self) if end_ns is None else int(np.searchsorted(self.timestamps, end_ns, side="right"))
+        return Bars(self.timestamps[i:j], self.prices[i:j], self.volumes[i:j], self.timezone)
+
+    def to_frame(self, columns: list[str] | None = None) -> pd.DataFrame:
+        """A typed frame (see to_typed) with Date and the given columns (defaults to all)."""
+        columns = ['Date'] + [column for column in (columns or BAR_COLUMNS) if column != 'Date']
+        unknown = [column for column in columns if column not in BAR_COLUMNS]
+        if unknown:
+            raise KeyError(f"Unknown columns: {unknown}")
+
+        data = {'Date': pd.DatetimeIndex(self.timestamps, tz="UTC").tz_convert(self.timezone)}
+        selected = [column for column in columns if column in PRICE_COLUMNS]
+        prices = self.prices[:, [PRICE_COLUMNS.index(column) for column in selected]]
+        prices = prices.astype(price_dtype(prices), copy=False)
+        for column in columns[1:]:
+            data[column] = self.volumes if column == 'Volume' else prices[:, selected.index(column)]
+        return pd.DataFrame(data)
@@ -0,0 +1,100 @@
+import pandas as pd
+
+from service.universe import get_registry
+from service.store import get_store
+from service.bars import PRICE_COLUMNS, widen_prices
+
+from data.static.static import EXPORT_CHUNK_ROWS
+
+EXPORT_COLUMNS = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def parse_since(since: str | None) -> pd.Timestamp | None:
+    """
+    Parse the since bound of an export (naive values are in each exchange's
+    timezone). Call before streaming starts, so a bad value is a client
+    error rather than a cut off stream. Raises ValueError.
+    """
+    if since is None:
+        return None
+    try:
+        parsed = pd.Timestamp(since)
+    except ValueError:
+        parsed = pd.NaT
+    if pd.isna(parsed):
+        raise ValueError(f"Invalid since: {since}")
+    return parsed
+
+
+def iter_universe(universe: str, timeframe: str, since=None, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """
+    Yield (ticker, frame) chunks of every stored series of a universe for a
+    timeframe, one series and at most chunk_rows rows at a time, with
+    float64 prices (see widen_prices).
+    """
+    store = get_store()
+    for exchange, tickers in get_registry().groups(universe):
+        for ticker in tickers:
+            for chunk in store.iter_chunks(exchange, ticker, timeframe, since, chunk_rows):
+                chunk = chunk[[column for column in EXPORT_COLUMNS if column in chunk.columns]].copy()
+                for column in PRICE_COLUMNS:
+                    if column in chunk.columns:
+                        chunk[column] = widen_prices(chunk[column].to_numpy())
+                yield ticker, chunk
+
+
+def iter_ndjson(universe: str, timeframe: str, since=None, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Yield the universe as newline-delimited JSON, one bar per line, in chunk_rows sized pieces."""
+    for ticker, chunk in iter_universe(universe, timeframe, since, chunk_rows):
+        chunk.insert(0, 'ticker', ticker)
+        chunk['Date'] = chunk['Date'].dt.tz_convert('UTC')
+        lines = chunk.to_json(orient='records', lines=True, date_format='iso', date_unit='s').encode()
+        yield lines if lines.endswith(b"\n") else lines + b"\n"
+
+
+class _ChunkSink:
+    """Write-only file object collecting what the Arrow writer produced since the last drain."""
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def iter_arrow(universe: str, timeframe: str, since=None, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Yield the universe as an Arrow IPC stream, one record batch per chunk."""
+    import pyarrow as pa
+
+    schema = pa.schema([
+        ('ticker', pa.string()),
+        ('Date', pa.timestamp('ns', tz='UTC')),
+        ('Open', pa.float64()),
+        ('High', pa.float64()),
+        ('Low', pa.float64()),
+        ('Close', pa.float64()),
+        ('Volume', pa.int64()),
+    ])
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(pa.PythonFile(sink, mode='w'), schema)
+    yield sink.drain()
+
+    for ticker, chunk in iter_universe(universe, timeframe, since, chunk_rows):
+        chunk.insert(0, 'ticker', ticker)
+        chunk['Date'] = chunk['Date'].dt.tz_convert('UTC').dt.as_unit('ns')
+        writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
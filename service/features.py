@@ -0,0 +1,190 @@
+import json
+import numpy as np
+import pandas as pd
+
+from service.files import get_ticker_path, add_ticker, append_ticker, read_ticker_range, series_lock, atomic_path
+from service.store import get_store, as_timestamp
+from service.bars import to_typed
+from service.resample import is_derived, bucket_starts
+from service.metrics import timed
+from service.settings import get_settings
+
+from data.static.static import EXCHANGE_TIMEZONES, FEATURES, FEATURE_TIMEFRAMES, FEATURE_STATE_SLACK
+
+BAR_COLUMNS = ['High', 'Low', 'Close', 'Volume']
+
+
+def features_enabled(timeframe: str) -> bool:
+    """Whether features are computed for a timeframe (FEATURES_ENABLED, env overrides static)."""
+    return get_settings().features_enabled and timeframe in FEATURE_TIMEFRAMES
+
+
+def feature_columns() -> list[str]:
+    return [f"{kind}_{window}" for kind, windows in FEATURES.items() for window in windows]
+
+
+def context_rows() -> int:
+    """Bars before the first new bar needed to extend every feature."""
+    return max([window for windows in FEATURES.values() for window in windows] + [1])
+
+
+def _features_name(timeframe: str) -> str:
+    return f"{timeframe}_features"
+
+
+def _true_range(bars: pd.DataFrame) -> pd.Series:
+    previous_close = bars['Close'].shift(1)
+    ranges = [bars['High'] - bars['Low'], (bars['High'] - previous_close).abs(), (bars['Low'] - previous_close).abs()]
+    return pd.concat(ranges, axis=1).max(axis=1)
+
+
+def compute_features(bars: pd.DataFrame, previous_atr: dict[int, float] | None = None, skip: int = 0) -> pd.DataFrame:
+    """
+    Compute the configured features (see FEATURES) of bars[skip:], using
+    bars[:skip] as context. Everything is a vectorized rolling window except
+    ATR, a recursive average that continues from previous_atr (the ATR of
+    each window at bars[skip - 1]) when there is context.
+
+    Returns:
+        Frame with the Date of each bar after the context and one column per feature
+    """
+    # Typed bars have float32 prices, features are computed and stored in float64
+    bars = bars.astype({column: 'float64' for column in BAR_COLUMNS if column in bars.columns})
+    close = bars['Close']
+    features = {}
+    for window in FEATURES.get("return", []):
+        features[f"return_{window}"] = close / close.shift(window) - 1
+    for window in FEATURES.get("sma", []):
+        features[f"sma_{window}"] = close.rolling(window).mean()
+
+    value_traded = (bars['High'] + bars['Low'] + close) / 3 * bars['Volume']
+    for window in FEATURES.get("vwap", []):
+        vwap = value_traded.rolling(window).sum() / bars['Volume'].rolling(window).sum()
+        features[f"vwap_{window}"] = vwap.replace([np.inf, -np.inf], np.nan)
+
+    true_range = _true_range(bars)
+    for window in FEATURES.get("atr", []):
+        if skip:
+            # Wilder's smoothing seeded with the last stored value
+            seeded = pd.concat([pd.Series([previous_atr[window]]), true_range.iloc[skip:]], ignore_index=True)
+            values = seeded.ewm(alpha=1 / window, adjust=False).mean().to_numpy()[1:]
+            features[f"atr_{window}"] = pd.Series(np.r_[np.full(skip, np.nan), values], index=bars.index)
+        else:
+            features[f"atr_{window}"] = true_range.ewm(alpha=1 / window, adjust=False, min_periods=window).mean()
+
+    result = pd.DataFrame({'Date': bars['Date'], **features}, index=bars.index)
+    return result.iloc[skip:].reset_index(drop=True)
+
+
+def _load_state(exchange: str, ticker: str, timeframe: str) -> dict | None:
+    """
+    The rolling state of a series: the feature columns it was computed with,
+    its row count and its last bars with their ATR values.
+    """
+    path = get_ticker_path(exchange, ticker, _features_name(timeframe), "json")
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    tail = pd.DataFrame(state["tail"])
+    tail['Date'] = pd.to_datetime(tail['Date'], utc=True).dt.tz_convert(EXCHANGE_TIMEZONES.get(exchange, "UTC"))
+    state["tail"] = tail
+    return state
+
+
+def _save_state(exchange: str, ticker: str, timeframe: str, rows: int, bars: pd.DataFrame, features: pd.DataFrame) -> None:
+    atr_columns = [column for column in features.columns if column.startswith("atr_")]
+    tail = pd.concat([bars[['Date'] + BAR_COLUMNS], features[atr_columns]], axis=1)
+    tail = tail.tail(context_rows() + FEATURE_STATE_SLACK)
+
+    state = {
+        "columns": feature_columns(),
+        "rows": rows,
+        "tail": {
+            column: tail[column].astype(str).tolist() if column == 'Date' else tail[column].tolist()
+            for column in tail.columns
+        },
+    }
+    path = get_ticker_path(exchange, ticker, _features_name(timeframe), "json")
+    with atomic_path(path) as tmp_path, open(tmp_path, "w") as f:
+        json.dump(state, f)
+
+
+def update_features(exchange: str, ticker: str, timeframe: str, since) -> int:
+    """
+    Bring the features of a series up to date after the bars at or after
+    since were written.
+
+    The features are extended from the rolling state, reading only the new
+    bars, when the state holds enough bars before since and the last of them
+    is still the last stored bar before since. Otherwise (no state, a changed
+    feature set, or bars rewritten or filled in further back) they are
+    recomputed from the whole series.
+
+    Returns:
+        Number of feature rows written
+    """
+    name = _features_name(timeframe)
+    store = get_store()
+    since = as_timestamp(since, EXCHANGE_TIMEZONES.get(exchange, "UTC"))
+    if is_derived(timeframe):
+        # The bucket containing since was rebuilt too
+        since = bucket_starts(pd.Series([since]), exchange, timeframe).iloc[0]
+
+    with timed("features", timeframe), series_lock(exchange, ticker, name):
+        state = _load_state(exchange, ticker, timeframe)
+
+        context = None
+        if state is not None and state["columns"] == feature_columns():
+            tail = state["tail"]
+            before = tail[tail['Date'] < since]
+            covers_history = len(tail) == state["rows"]
+            atr_ready = all(not np.isnan(before[f"atr_{window}"].iloc[-1]) for window in FEATURES.get("atr", [])) if len(before) else False
+            if atr_ready and (len(before) >= context_rows() or covers_history):
+                context = before
+
+        if context is not None:
+            # The stored bars before since must still end with the last context bar
+            last = context['Date'].iloc[-1]
+            stored = store.read(exchange, ticker, timeframe, start=last, end=since - pd.Timedelta(1, "ns"), columns=['Close'])
+            if len(stored) != 1 or stored['Date'].iloc[0] != last:
+                context = None
+
+        if context is not None:
+            new_bars = store.read(exchange, ticker, timeframe, start=since, columns=BAR_COLUMNS)
+            if new_bars.empty:
+                return 0
+            bars = pd.concat([context[['Date'] + BAR_COLUMNS], new_bars], ignore_index=True)
+            previous_atr = {window: context[f"atr_{window}"].iloc[-1] for window in FEATURES.get("atr", [])}
+            features = compute_features(bars, previous_atr, skip=len(context))
+            append_ticker(ticker, exchange, name, features)
+
+            rows = state["rows"] - (len(state["tail"]) - len(context)) + len(new_bars)
+            # Context rows have no features of their own here, take them from the state
+            atr = pd.concat([context.drop(columns=['Date'] + BAR_COLUMNS), features.drop(columns=['Date'])], ignore_index=True)
+            _save_state(exchange, ticker, timeframe, rows, bars, atr)
+            return len(features)
+
+        bars = store.read(exchange, ticker, timeframe, columns=BAR_COLUMNS)
+        if bars.empty:
+            return 0
+        features = compute_features(bars)
+        add_ticker(ticker, exchange, name, features, None)
+        _save_state(exchange, ticker, timeframe, len(bars), bars, features)
+        return len(features)
+
+
+def read_features(exchange: str, ticker: str, timeframe: str, start=None, end=None) -> pd.DataFrame:
+    """Read the stored features with start <= Date <= end (both optional)."""
+    tz = EXCHANGE_TIMEZONES.get(exchange.upper(), "UTC")
+    start_ns = as_timestamp(start, tz).as_unit('ns').value if start is not None else None
+    end_ns = as_timestamp(end, tz).as_unit('ns').value if end is not None else None
+
+    data = read_ticker_range(ticker, exchange, _features_name(timeframe), start_ns, end_ns, None)
+    if data.empty and 'Date' not in data.columns:
+        return pd.DataFrame()
+    return to_typed(data, exchange)
@@ -1,50 +1,482 @@
-import json
+import io
+import os
+import fcntl
+import threading
+import numpy as np
+import pandas as pd
 from pathlib import Path
+from contextlib import contextmanager
 
-DATA_DIR = Path(__file__).parent.parent / "data/markets"
+from service.metrics import timed
+from service.settings import get_settings
+
+# Root of the stored bars (override with DATA_DIR, e.g. for benchmarks)
+DATA_DIR = get_settings().data_dir
+
+# How much of the end of a CSV to inspect when appending new bars
+TAIL_BYTES = 64 * 1024
+# Read size when copying the unchanged start of a CSV
+COPY_CHUNK_BYTES = 1024 * 1024
 
 def get_ticker_path(exchange: str, ticker: str, file_name: str, file_extension: str = "csv") -> Path:
 
     return DATA_DIR / exchange.lower() / ticker.upper() / f"{file_name}.{file_extension}"
 
-def load_symbols(type: str = "test") -> list[str]:
-    
-    if type == "test":
-        file_path = Path(__file__).parent.parent / "data" / "tickers" / "test_tickers.json"
-    elif type == "nasdaq":
-        file_path = Path(__file__).parent.parent / "data" / "tickers" / "nasdaq_tickers.json"
-    else:
-        raise ValueError(f"Invalid type: {type}")
+@contextmanager
+def file_lock(path: Path):
+    """
+    Hold an exclusive advisory lock on path (created if missing) for the
+    duration of the block. Works across threads, processes and hosts sharing
+    the storage, as long as the filesystem supports flock.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
 
 
-    with open(file_path, "r") as f:
-        data = json.load(f)
-    return data
+def series_lock(exchange: str, ticker: str, timeframe: str):
+    """Exclusive lock on one stored series, held around every write to it."""
+    return file_lock(get_ticker_path(exchange, ticker, timeframe, "lock"))
 
 
-def add_symbols(type: str = "test", tickers: list[str] = []) -> None:
-    if type == "test":
-        file_path = Path(__file__).parent.parent / "data" / "tickers" / "test_tickers.json"
-    elif type == "nasdaq":
-        file_path = Path(__file__).parent.parent / "data" / "tickers" / "nasdaq_tickers.json"
-    else:
-        raise ValueError(f"Invalid type: {type}")
+@contextmanager
+def atomic_path(path: Path):
+    """
+    Yield a temporary path next to path, and move it over path once the
+    block succeeds, so readers only ever see the old or the new file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
 
-    # Load existing tickers
-    existing_tickers = load_symbols(type)
-    
-    # Merge with new tickers (avoid duplicates)
-    all_tickers = list(set(existing_tickers + tickers))
-    
-    # Write back to file
-    with open(file_path, "w") as f:
-        json.dump({"tickers": all_tickers}, f, indent=2)
 
 def add_ticker(ticker, exchange, timeframe, data, info) -> None:
     path = get_ticker_path(exchange, ticker, timeframe, "csv")
-    # Create parent directories if they don't exist
+    with timed("write", timeframe):
+        _write_csv(path, data)
+
+def _to_utc(dates: pd.Series) -> pd.Series:
+    """Parse a Date column to UTC timestamps (stored offsets change with DST)."""
+    return pd.to_datetime(dates, utc=True)
+
+
+def _prepare_new_rows(data: pd.DataFrame) -> pd.DataFrame:
+    """Sort new bars by Date and drop duplicated bars, keeping the last one."""
+    data = data.copy()
+    data['_utc'] = _to_utc(data['Date'])
+    data = data.drop_duplicates(subset=['_utc'], keep='last').sort_values('_utc')
+    return data
+
+
+def merge_ticker(ticker: str, exchange: str, timeframe: str, data: pd.DataFrame) -> tuple[str | None, int]:
+    """
+    Merge new bars into a stored series by reading and rewriting the whole CSV.
+    Used when the new bars cannot simply be appended (see append_ticker).
+
+    Returns:
+        (last stored date as a string or None if the series is empty, net number of rows added)
+    """
+    path = get_ticker_path(exchange, ticker, timeframe, "csv")
     path.parent.mkdir(parents=True, exist_ok=True)
-    data.to_csv(path, index=False)
+
+    combined_data = data
+    existing_rows = 0
+    if path.exists():
+        with timed("parse", timeframe):
+            existing_data = pd.read_csv(path)
+        existing_rows = len(existing_data)
+        combined_data = pd.concat([existing_data, data], ignore_index=True)
+
+    # Remove duplicates, keeping last occurrence, and sort by Date
+    with timed("merge", timeframe):
+        combined_data = _prepare_new_rows(combined_data).drop(columns=['_utc']).reset_index(drop=True)
+    with timed("write", timeframe):
+        _write_csv(path, combined_data)
+
+    if combined_data.empty:
+        return None, -existing_rows
+    return str(combined_data['Date'].iloc[-1]), len(combined_data) - existing_rows
+
+
+class _NeedsMerge(Exception):
+    """The new bars cannot be appended in place and need a full merge."""
+
+
+def _read_tail(f, size: int, header_end: int, tail_bytes: int) -> tuple[list[int], list[bytes], bool]:
+    """
+    Read the last complete lines of an open CSV file.
+
+    Returns:
+        (byte offset of each line, the raw lines, whether the tail reaches the header)
+    """
+    start = max(header_end, size - tail_bytes)
+    f.seek(start)
+    chunk = f.read()
+
+    reaches_header = start == header_end
+    offset = start
+    if not reaches_header:
+        # Drop the partial line we landed in
+        cut = chunk.find(b"\n") + 1
+        if cut == 0:
+            return [], [], False
+        chunk = chunk[cut:]
+        offset += cut
+
+    offsets, lines = [], []
+    for line in chunk.splitlines(keepends=True):
+        if line.strip():
+            offsets.append(offset)
+            lines.append(line)
+        offset += len(line)
+    return offsets, lines, reaches_header
+
+
+def append_ticker(
+    ticker: str,
+    exchange: str,
+    timeframe: str,
+    data: pd.DataFrame,
+    tail_bytes: int = TAIL_BYTES,
+) -> tuple[str | None, int]:
+    """
+    Add new bars to a stored series without rewriting it.
+
+    Only the tail of the CSV is read: stored bars at or after the first new
+    bar are replaced by the new bars (later stored bars are kept), and the
+    rest is appended. Bars that only extend the series are written in place;
+    when stored bars are replaced, the unchanged start of the file is copied
+    byte for byte into a temporary file that then replaces the CSV. Falls
+    back to merge_ticker when the columns differ or the overlap reaches
+    further back than the inspected tail.
+
+    Returns:
+        (last stored date as a string or None if the series is empty, net number of rows added)
+    """
+    path = get_ticker_path(exchange, ticker, timeframe, "csv")
+    if not path.exists() or path.stat().st_size == 0:
+        return merge_ticker(ticker, exchange, timeframe, data)
+
+    with timed("merge", timeframe):
+        new_rows = _prepare_new_rows(data)
+    if new_rows.empty:
+        return merge_ticker(ticker, exchange, timeframe, data)
+
+    try:
+        with timed("write", timeframe):
+            return _append_rows(path, new_rows, tail_bytes)
+    except _NeedsMerge:
+        return merge_ticker(ticker, exchange, timeframe, data)
+
+
+def _copy_prefix(src, dst, length: int) -> None:
+    """Copy the first length bytes of src into dst without parsing them."""
+    src.seek(0)
+    remaining = length
+    while remaining > 0:
+        chunk = src.read(min(remaining, COPY_CHUNK_BYTES))
+        if not chunk:
+            break
+        dst.write(chunk)
+        remaining -= len(chunk)
+
+
+def _append_rows(path: Path, new_rows: pd.DataFrame, tail_bytes: int) -> tuple[str, int]:
+    """
+    Splice sorted new rows into the end of a CSV (see append_ticker) and
+    extend its row index. Call with the series lock held.
+
+    When no stored row is replaced the rows are written at the end of the
+    file in place; readers stop at the end of their index (see
+    load_csv_index), so they never see a half written row. Otherwise the
+    spliced series is built in a temporary file that replaces the CSV.
+    """
+    with open(path, "rb+") as f:
+        header = f.readline()
+        columns = header.decode().strip().split(",")
+        if columns != list(new_rows.columns[:-1]) or columns[0] != 'Date':
+            raise _NeedsMerge
+
+        size = f.seek(0, io.SEEK_END)
+        offsets, lines, reaches_header = _read_tail(f, size, len(header), tail_bytes)
+        # A last line without a newline is a row cut short, which readers ignore: write over it
+        complete = size
+        if lines and not lines[-1].endswith(b"\n"):
+            complete = offsets.pop()
+            lines.pop()
+        if not lines and not reaches_header:
+            raise _NeedsMerge
+
+        tail_dates = _to_utc(pd.Series([line.split(b",", 1)[0].decode() for line in lines], dtype=object))
+        first_new = new_rows['_utc'].iloc[0]
+        last_new = new_rows['_utc'].iloc[-1]
+
+        overlap = (tail_dates >= first_new).to_numpy()
+        if overlap.any():
+            start = int(overlap.argmax())
+            if start == 0 and not reaches_header:
+                # Overlap may extend before the part of the file we read
+                raise _NeedsMerge
+            truncate_at = offsets[start]
+        else:
+            start = len(lines)
+            truncate_at = complete
+
+        # Stored bars after the new ones are written back after them
+        later = (tail_dates.iloc[start:] > last_new).to_numpy()
+        kept = [line for line, keep in zip(lines[start:], later) if keep]
+        block = new_rows.drop(columns=['_utc']).to_csv(header=False, index=False).encode() + b"".join(kept)
+
+        ino = os.fstat(f.fileno()).st_ino
+        timestamps, row_offsets, _ = _index_upto(f, ino, len(header), 0, truncate_at, _load_index(path))
+        new_timestamps = np.concatenate([
+            _utc_ns(new_rows['_utc']),
+            _utc_ns(tail_dates.iloc[start:][later]),
+        ])
+
+        if truncate_at == complete:
+            if complete < size:
+                f.truncate(complete)
+            f.seek(complete)
+            f.write(block)
+            f.flush()
+        else:
+            with atomic_path(path) as tmp_path:
+                with open(tmp_path, "wb") as out:
+                    _copy_prefix(f, out, truncate_at)
+                    out.write(block)
+                    ino = os.fstat(out.fileno()).st_ino
+                # Never leave an index that describes the replaced file
+                _index_path(path).unlink(missing_ok=True)
+
+    _save_index(
+        path,
+        ino,
+        np.concatenate([timestamps, new_timestamps]),
+        np.concatenate([row_offsets, _line_starts(block) + truncate_at]),
+        truncate_at + len(block),
+    )
+
+    rows_added = len(new_rows) - (len(lines) - start - len(kept))
+    if kept:
+        return kept[-1].split(b",", 1)[0].decode(), rows_added
+    return str(new_rows['Date'].iloc[-1]), rows_added
+
+
+def _write_csv(path: Path, data: pd.DataFrame) -> None:
+    """Write a whole CSV series and its row index, replacing both."""
+    raw = data.to_csv(index=False).encode()
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, "wb") as out:
+            out.write(raw)
+            ino = os.fstat(out.fileno()).st_ino
+        _index_path(path).unlink(missing_ok=True)
+
+    if 'Date' in data.columns:
+        header_end = raw.find(b"\n") + 1
+        _save_index(path, ino, _utc_ns(_to_utc(data['Date'])), _line_starts(raw[header_end:]) + header_end, len(raw))
+
+
+def _utc_ns(dates: pd.Series) -> np.ndarray:
+    return dates.dt.as_unit('ns').astype('int64').to_numpy()
+
+
+def _line_starts(block: bytes) -> np.ndarray:
+    """Offset of each line of a block of complete lines."""
+    line_ends = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == ord("\n"))
+    return np.r_[0, line_ends[:-1] + 1].astype(np.int64) if len(line_ends) else np.empty(0, dtype=np.int64)
+
+
+def _index_path(path: Path) -> Path:
+    return path.with_name(f"{path.stem}.index.npz")
+
+
+def _load_index(path: Path) -> dict | None:
+    try:
+        with np.load(_index_path(path)) as index:
+            return {
+                "ino": int(index["ino"]),
+                "end": int(index["end"]),
+                "timestamps": index["timestamps"],
+                "offsets": index["offsets"],
+            }
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _save_index(path: Path, ino: int, timestamps: np.ndarray, offsets: np.ndarray, end: int) -> None:
+    with atomic_path(_index_path(path)) as tmp_path, open(tmp_path, "wb") as out:
+        np.savez(out, timestamps=timestamps, offsets=offsets, ino=ino, end=end)
+
+
+def _index_rows(raw: bytes, base: int, date_column: int) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    Index the rows of a block of CSV lines (no header) found at byte base of
+    the file. A last line without a newline is a row still being written or
+    cut short, and is left out.
+
+    Returns:
+        (UTC epoch ns of each row, byte offset of each row, byte after the last row)
+    """
+    raw = raw[:raw.rfind(b"\n") + 1]
+    if not raw:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), base
+    dates = pd.read_csv(io.BytesIO(raw), header=None, usecols=[date_column], skip_blank_lines=False, dtype=str)[date_column]
+    rows = dates.notna().to_numpy()
+    return _utc_ns(_to_utc(dates[rows])), _line_starts(raw)[rows] + base, base + len(raw)
+
+
+def _index_upto(f, ino: int, header_end: int, date_column: int, upto: int, index: dict | None):
+    """
+    Index of the rows of the open CSV f that start before byte upto (a row
+    start or the end of the file). The stored index is used as far as it
+    belongs to this file, and only the bytes it does not cover are parsed.
+
+    Returns:
+        Same as _index_rows
+    """
+    timestamps, offsets, end = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), header_end
+    if index is not None and index["ino"] == ino and index["end"] <= f.seek(0, io.SEEK_END):
+        stored = (index["timestamps"], index["offsets"], index["end"])
+        if stored[2] > upto:
+            keep = int(np.searchsorted(stored[1], upto))
+            stored = (stored[0][:keep], stored[1][:keep], upto)
+        # Inode numbers are reused, so check the last row is where the index has it
+        if len(stored[1]) == 0 or _row_ns(f, int(stored[1][-1]), date_column) == stored[0][-1]:
+            timestamps, offsets, end = stored
+
+    if end < upto:
+        f.seek(end)
+        more = _index_rows(f.read(upto - end), end, date_column)
+        timestamps, offsets, end = np.concatenate([timestamps, more[0]]), np.concatenate([offsets, more[1]]), more[2]
+    return timestamps, offsets, end
+
+
+def _row_ns(f, offset: int, date_column: int) -> int | None:
+    f.seek(offset)
+    fields = f.readline().split(b",")
+    try:
+        return int(_utc_ns(_to_utc(pd.Series([fields[date_column].decode()])))[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def load_csv_index(path: Path, f) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    Timestamp index of a CSV series: UTC epoch ns of every row, the byte
+    offset where each row starts and the byte after the last row. Writers
+    keep it next to the CSV as <timeframe>.index.npz; rows it does not cover
+    (e.g. after a crash between writing the CSV and its index) are indexed
+    here and saved.
+
+    f is the CSV opened in binary mode, and the index describes that open
+    file: it matches the bytes the caller reads even if the CSV is replaced
+    meanwhile, and leaves out a row that is still being appended. Read rows
+    only up to the returned end.
+    """
+    stat = os.fstat(f.fileno())
+    f.seek(0)
+    header = f.readline()
+    date_column = header.decode().strip().split(",").index('Date')
+    index = _load_index(path)
+    timestamps, offsets, end = _index_upto(f, stat.st_ino, len(header), date_column, stat.st_size, index)
+
+    # The stored arrays come back as they are only when the index was current
+    if index is None or offsets is not index["offsets"]:
+        # Don't save an index for a CSV that has been replaced since it was opened
+        try:
+            current = path.stat().st_ino == stat.st_ino
+        except FileNotFoundError:
+            current = False
+        if current:
+            _save_index(path, stat.st_ino, timestamps, offsets, end)
+    return timestamps, offsets, end
+
+
+class _Bounded(io.RawIOBase):
+    """Reads at most limit bytes of a file from its current position."""
+
+    def __init__(self, f, limit: int):
+        self._f = f
+        self._left = limit
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._f.read(min(len(buffer), self._left))
+        buffer[:len(data)] = data
+        self._left -= len(data)
+        return len(data)
+
+
+def read_ticker_range(
+    ticker: str,
+    exchange: str,
+    timeframe: str,
+    start_ns: int | None = None,
+    end_ns: int | None = None,
+    columns: list[str] | None = None,
+) -> pd.DataFrame:
+    """
+    Read the rows of a CSV series with start_ns <= Date <= end_ns (UTC epoch ns)
+    by seeking to them through the series index, so only those rows are parsed.
+    """
+    path = get_ticker_path(exchange, ticker, timeframe, "csv")
+    if not path.exists():
+        return pd.DataFrame()
+
+    with open(path, "rb") as f:
+        timestamps, offsets, end = load_csv_index(path, f)
+        i = 0 if start_ns is None else int(np.searchsorted(timestamps, start_ns, side="left"))
+        j = len(timestamps) if end_ns is None else int(np.searchsorted(timestamps, end_ns, side="right"))
+
+        f.seek(0)
+        header = f.readline()
+        if i >= j:
+            return pd.read_csv(io.BytesIO(header), usecols=columns)
+        f.seek(int(offsets[i]))
+        body = f.read((int(offsets[j]) if j < len(offsets) else end) - int(offsets[i]))
+
+    return pd.read_csv(io.BytesIO(header + body), usecols=columns)
+
+
+def iter_ticker_chunks(
+    ticker: str,
+    exchange: str,
+    timeframe: str,
+    start_ns: int | None = None,
+    chunk_rows: int = 10_000,
+):
+    """
+    Yield a CSV series from start_ns (UTC epoch ns) onwards in frames of at
+    most chunk_rows rows, seeking to the first row through the series index.
+    """
+    path = get_ticker_path(exchange, ticker, timeframe, "csv")
+    if not path.exists():
+        return
+
+    with open(path, "rb") as f:
+        timestamps, offsets, end = load_csv_index(path, f)
+        i = 0 if start_ns is None else int(np.searchsorted(timestamps, start_ns, side="left"))
+        if i >= len(offsets):
+            return
+
+        f.seek(0)
+        columns = f.readline().decode().strip().split(",")
+        f.seek(int(offsets[i]))
+        rows = io.BufferedReader(_Bounded(f, end - int(offsets[i])))
+        yield from pd.read_csv(rows, names=columns, header=None, chunksize=chunk_rows)
+
 
 def update_ticker(ticker: str = None) -> None:
     if ticker is None:
@@ -0,0 +1,253 @@
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+
+from service.store import get_store
+from service.state import get_state
+from service.resample import is_derived, derived_from, derive_timeframe
+from service.features import features_enabled, update_features
+from service.time import get_calendar, get_today_swedish_date
+from service.yf import get_batch_data, plan_ranges
+from service.universe import universe_groups
+
+from data.static.static import EXCHANGE_TIMEZONES, TIMEFRAME_MAP, TIMEFRAME_LIMITS, UPDATE_WORKERS
+
+NS_PER_MINUTE = 60 * 1_000_000_000
+NS_PER_DAY = 1440 * NS_PER_MINUTE
+
+
+def _bar_keys(timestamps: np.ndarray, timeframe: str, timezone: str) -> np.ndarray:
+    """
+    Comparable keys of bar starts (UTC epoch ns): the local day number for
+    daily and weekly bars, whose time of day Yahoo does not always set to
+    midnight, and the minute for intraday bars.
+    """
+    if timeframe in ("1d", "1wk"):
+        local = pd.DatetimeIndex(timestamps, tz="UTC").tz_convert(timezone).tz_localize(None)
+        return local.asi8 // NS_PER_DAY
+    return timestamps // NS_PER_MINUTE
+
+
+def scan_gaps(exchange: str, timeframe: str, stored: np.ndarray) -> list[tuple[pd.Timestamp, pd.Timestamp, int]]:
+    """
+    Find the bars missing between the first and last stored bar of a series
+    by comparing the stored bar starts (sorted UTC epoch ns) with the bars
+    the session calendar expects.
+
+    Ad-hoc closures and shortened sessions the calendar does not know about
+    show up as gaps; repairing them finds no bars and changes nothing.
+
+    Returns:
+        List of (first missing bar, last missing bar, number of missing bars), in exchange local time
+    """
+    if len(stored) == 0:
+        return []
+
+    timezone = EXCHANGE_TIMEZONES.get(exchange, "UTC")
+    bounds = pd.DatetimeIndex([stored[0], stored[-1]], tz="UTC").tz_convert(timezone)
+    expected = get_calendar(exchange).bar_starts(timeframe, bounds[0].date(), bounds[1].date())
+
+    stored_keys = np.unique(_bar_keys(stored, timeframe, timezone))
+    expected_keys = _bar_keys(expected, timeframe, timezone)
+    in_range = (expected_keys >= stored_keys[0]) & (expected_keys <= stored_keys[-1])
+    missing = np.flatnonzero(in_range & ~np.isin(expected_keys, stored_keys))
+    if len(missing) == 0:
+        return []
+
+    # Runs of consecutive expected bars form one gap
+    breaks = np.flatnonzero(np.diff(missing) != 1) + 1
+    firsts = missing[np.r_[0, breaks]]
+    lasts = missing[np.r_[breaks - 1, len(missing) - 1]]
+
+    starts = pd.DatetimeIndex(expected[firsts], tz="UTC").tz_convert(timezone)
+    ends = pd.DatetimeIndex(expected[lasts], tz="UTC").tz_convert(timezone)
+    return list(zip(starts, ends, (lasts - firsts + 1).tolist()))
+
+
+def find_gaps(exchange: str, ticker: str, timeframe: str, start=None, end=None) -> list[tuple[pd.Timestamp, pd.Timestamp, int]]:
+    """Gaps of a stored series (see scan_gaps), optionally limited to start <= Date <= end."""
+    data = get_store().read(exchange, ticker, timeframe, start, end, columns=['Date'])
+    if data.empty:
+        return []
+    stored = np.sort(data['Date'].dt.as_unit('ns').astype('int64').to_numpy())
+    return scan_gaps(exchange, timeframe, stored)
+
+
+def _repairable(gaps: list[tuple[pd.Timestamp, pd.Timestamp, int]], timeframe: str) -> list[tuple[pd.Timestamp, pd.Timestamp, int]]:
+    """Drop the gaps older than Yahoo's lookback for the timeframe, which cannot be refetched."""
+    lookback, _ = TIMEFRAME_LIMITS.get(timeframe, (None, None))
+    if lookback is None:
+        return gaps
+    earliest = get_today_swedish_date().date() - timedelta(days=lookback - 1)
+    return [gap for gap in gaps if gap[1].date() >= earliest]
+
+
+def _within_gaps(data: pd.DataFrame, gaps: list[tuple[pd.Timestamp, pd.Timestamp, int]], timeframe: str, timezone: str) -> pd.DataFrame:
+    """
+    Keep the fetched rows that fall inside one of the gaps, compared on the
+    same bar keys as scan_gaps so daily bars not stamped at midnight match.
+    """
+    dates = pd.to_datetime(data['Date'], utc=True).dt.as_unit('ns').astype('int64').to_numpy()
+    keys = _bar_keys(dates, timeframe, timezone)
+    starts = _bar_keys(np.array([gap[0].as_unit('ns').value for gap in gaps]), timeframe, timezone)
+    ends = _bar_keys(np.array([gap[1].as_unit('ns').value for gap in gaps]), timeframe, timezone)
+    # Gaps are sorted and disjoint: find the last gap starting at or before each row
+    i = np.searchsorted(starts, keys, side="right") - 1
+    inside = (i >= 0) & (keys <= ends[np.clip(i, 0, None)])
+    return data[inside]
+
+
+def repair_gaps(
+    universe: str = "test",
+    workers: int = UPDATE_WORKERS,
+    timeframes: list[str] | None = None,
+    progress=None,
+    symbols: dict[str, list[str]] | None = None,
+) -> dict:
+    """
+    Find the gaps of every fetched series of a universe, refetch only the
+    missing ranges and splice the bars in, one exchange at a time (see
+    repair_exchange).
+
+    Args:
+        universe: Universe name in the registry (see service.universe)
+        workers: Pool size
+        timeframes: Subset of TIMEFRAME_MAP keys to check (defaults to all fetched ones)
+        progress: Optional progress tracker (see service.jobs.Job), also used for cancellation
+        symbols: exchange -> tickers to check instead of the registry members of the universe
+
+    Returns:
+        Summary with the bars spliced into each repaired series, the failed series and the gap count
+    """
+    repaired, failed, gap_count = {}, {}, 0
+    for exchange, tickers in universe_groups(universe, symbols):
+        if progress is not None and progress.cancel_event.is_set():
+            break
+        result = repair_exchange(universe, exchange, tickers, workers, timeframes, progress)
+        repaired.update(result["repaired"])
+        failed.update(result["failed"])
+        gap_count += result["gaps"]
+    return {"repaired": repaired, "failed": failed, "gaps": gap_count}
+
+
+def repair_exchange(
+    universe: str,
+    exchange: str,
+    tickers: list[str],
+    workers: int = UPDATE_WORKERS,
+    timeframes: list[str] | None = None,
+    progress=None,
+) -> dict:
+    """
+    Repair the gaps of the tickers of a universe listed on one exchange.
+    Missing ranges are fetched in batched downloads shared by the tickers
+    with the same window. Derived timeframes, and the features of every
+    repaired timeframe, are rebuilt from the earliest repaired bar.
+
+    Returns:
+        Summary with the bars spliced into each repaired series, the failed series and the gap count
+    """
+    timeframes = [timeframe for timeframe in (timeframes or TIMEFRAME_MAP) if not is_derived(timeframe)]
+    timezone = EXCHANGE_TIMEZONES.get(exchange, "UTC")
+    store = get_store()
+    state = get_state()
+    states = state.load(exchange)
+
+    def cancelled() -> bool:
+        return progress is not None and progress.cancel_event.is_set()
+
+    def record(ticker: str, timeframe: str, last_date: str | None, rows: int, replaced: bool, status: str) -> None:
+        # Same bookkeeping as write_ticker: keep the row count in step with the series
+        previous_rows = states.get(ticker, {}).get("row_count", {}).get(timeframe)
+        if replaced:
+            row_count = rows
+        else:
+            row_count = previous_rows + rows if previous_rows is not None else None
+        state.record(exchange, ticker, timeframe, status, last_bar=last_date, row_count=row_count)
+
+    def scan(ticker: str, timeframe: str):
+        if not store.exists(exchange, ticker, timeframe):
+            return []
+        return _repairable(find_gaps(exchange, ticker, timeframe), timeframe)
+
+    repaired, failed = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="update-repair") as executor:
+        # Scan: gaps of every stored series
+        series = [(ticker, timeframe) for ticker in tickers for timeframe in timeframes]
+        gaps = {}
+        for key, future in zip(series, [executor.submit(scan, *key) for key in series]):
+            try:
+                found = future.result()
+            except Exception as e:
+                logger.error(f"Error scanning {key[0]} {key[1]} for gaps: {e}")
+                failed.setdefault(key[0], {})[key[1]] = str(e)
+                continue
+            if found:
+                gaps[key] = found
+
+        gap_count = sum(len(found) for found in gaps.values())
+        logger.info(f"Found {gap_count} gaps in {len(gaps)} series of {universe} on {exchange}")
+        if progress is not None:
+            progress.start([(ticker, timeframe, None) for ticker, timeframe in gaps])
+
+        # Fetch: one batched download per (timeframe, window) shared by all tickers
+        windows: dict[tuple[str, str, str], list[str]] = {}
+        for (ticker, timeframe), found in gaps.items():
+            for first, last, _ in found:
+                for start, end in plan_ranges(timeframe, first.date().isoformat(), (last.date() + timedelta(days=1)).isoformat()):
+                    tickers_in_window = windows.setdefault((timeframe, start, end), [])
+                    if ticker not in tickers_in_window:
+                        tickers_in_window.append(ticker)
+
+        def fetch(timeframe: str, start: str, end: str, window_tickers: list[str]) -> dict[str, pd.DataFrame]:
+            if cancelled():
+                return {}
+            return get_batch_data(window_tickers, timeframe, start, end)
+
+        pieces: dict[tuple[str, str], list[pd.DataFrame]] = {}
+        futures = {window: executor.submit(fetch, *window, window_tickers) for window, window_tickers in windows.items()}
+        for (timeframe, _, _), future in futures.items():
+            for ticker, frame in future.result().items():
+                pieces.setdefault((ticker, timeframe), []).append(frame)
+
+        # Splice: write the missing bars into each series
+        def splice(ticker: str, timeframe: str) -> int:
+            found = gaps[(ticker, timeframe)]
+            frames = pieces.get((ticker, timeframe))
+            if not frames or cancelled():
+                return 0
+            data = pd.concat(frames, ignore_index=True)
+            data = _within_gaps(data, found, timeframe, timezone)
+            if data.empty:
+                return 0
+
+            last_date, rows = store.append(exchange, ticker, timeframe, data)
+            record(ticker, timeframe, last_date, rows, False, "repaired")
+            for derived in derived_from(timeframe):
+                result = derive_timeframe(exchange, ticker, derived, found[0][0])
+                if result is not None:
+                    record(ticker, derived, *result, "derived")
+            for written in [timeframe, *derived_from(timeframe)]:
+                if features_enabled(written):
+                    update_features(exchange, ticker, written, found[0][0])
+            return rows
+
+        futures = {key: executor.submit(splice, *key) for key in gaps}
+        for (ticker, timeframe), future in futures.items():
+            try:
+                rows = future.result()
+            except Exception as e:
+                logger.error(f"Error repairing {ticker} {timeframe}: {e}")
+                failed.setdefault(ticker, {})[timeframe] = str(e)
+                if progress is not None:
+                    progress.unit_failed(timeframe)
+                continue
+            if rows:
+                repaired.setdefault(ticker, {})[timeframe] = rows
+                logger.info(f"Repaired {rows} bars of {ticker} {timeframe}")
+            if progress is not None:
+                progress.unit_done(timeframe, rows)
+
+    return {"repaired": repaired, "failed": failed, "gaps": gap_count}
@@ -0,0 +1,212 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+from loguru import logger
+
+from service.files import DATA_DIR
+from service.pipeline import run_update
+from service.gaps import repair_gaps
+from service.metrics import profiled
+
+from data.static.static import UPDATE_WORKERS, JOBS_KEEP
+
+# What each job kind runs: fn(universe, workers, timeframes, progress=job, symbols=job.symbols)
+JOB_RUNNERS = {
+    "update": run_update,
+    "repair": repair_gaps,
+}
+
+FINISHED = ("completed", "failed", "cancelled")
+
+# Jobs run one at a time in the background, later ones wait in the queue
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="update-job")
+_jobs: dict[str, "Job"] = {}
+_jobs_lock = Lock()
+
+PROFILE_DIR = DATA_DIR.parent / "profiles"
+
+
+class Job:
+    """An update (or gap repair) run in the background, with progress counters and a cancel flag."""
+
+    def __init__(
+        self,
+        universe: str,
+        timeframes: list[str] | None,
+        workers: int,
+        profile: bool = False,
+        kind: str = "update",
+        symbols: dict[str, list[str]] | None = None,
+    ):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.universe = universe
+        self.timeframes = timeframes
+        # exchange -> tickers to process instead of the whole universe
+        self.symbols = symbols
+        self.workers = workers
+        self.profile = profile
+        self.status = "queued"
+        self.error = None
+        self.result = None
+        self.cancel_event = Event()
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.rows_written = 0
+        self.skipped = 0
+        # timeframe -> {"total", "done", "failed"}
+        self.timeframe_progress: dict[str, dict[str, int]] = {}
+        self._lock = Lock()
+
+    def start(self, requests: list[tuple[str, str, str | None]], skipped: int = 0) -> None:
+        """Record the planned (ticker, timeframe, from_date) units before fetching starts (once per exchange)."""
+        with self._lock:
+            self.skipped += skipped
+            for _, timeframe, _ in requests:
+                counts = self.timeframe_progress.setdefault(timeframe, {"total": 0, "done": 0, "failed": 0})
+                counts["total"] += 1
+
+    def unit_done(self, timeframe: str, rows: int) -> None:
+        with self._lock:
+            self.timeframe_progress[timeframe]["done"] += 1
+            self.rows_written += rows
+
+    def unit_failed(self, timeframe: str) -> None:
+        with self._lock:
+            self.timeframe_progress[timeframe]["failed"] += 1
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+        with self._lock:
+            if self.status == "queued":
+                self.status = "cancelled"
+
+    def run(self) -> None:
+        with self._lock:
+            if self.status == "cancelled":
+                return
+            self.status = "running"
+            self.started_at = time.time()
+
+        runner = JOB_RUNNERS[self.kind]
+        try:
+            if self.profile:
+                with profiled(self.profile_path):
+                    self.result = runner(self.universe, self.workers, self.timeframes, progress=self, symbols=self.symbols)
+            else:
+                self.result = runner(self.universe, self.workers, self.timeframes, progress=self, symbols=self.symbols)
+            status = "cancelled" if self.cancel_event.is_set() else "completed"
+        except Exception as e:
+            logger.error(f"{self.kind.capitalize()} job {self.id} failed: {e}")
+            self.error = str(e)
+            status = "failed"
+
+        with self._lock:
+            self.status = status
+            self.finished_at = time.time()
+        logger.info(f"{self.kind.capitalize()} job {self.id} {status}")
+
+    @property
+    def profile_path(self):
+        """Where the cProfile stats of a profiled run are saved."""
+        return PROFILE_DIR / f"{self.id}.prof"
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            if self.started_at is None:
+                elapsed = 0.0
+            else:
+                elapsed = (self.finished_at or time.time()) - self.started_at
+
+            timeframes = {}
+            done_total = 0
+            for timeframe, counts in self.timeframe_progress.items():
+                remaining = counts["total"] - counts["done"] - counts["failed"]
+                timeframes[timeframe] = {**counts, "remaining": remaining}
+                done_total += counts["done"]
+
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "universe": self.universe,
+                "timeframes": self.timeframes,
+                "exchanges": sorted(self.symbols) if self.symbols is not None else None,
+                "status": self.status,
+                "error": self.error,
+                "progress": timeframes,
+                "rows_written": self.rows_written,
+                "elapsed_seconds": round(elapsed, 3),
+                "units_per_second": round(done_total / elapsed, 3) if elapsed > 0 else 0.0,
+                "rows_per_second": round(self.rows_written / elapsed, 3) if elapsed > 0 else 0.0,
+                "failed_tickers": self.result.get("failed") if self.result else None,
+                "profiled": self.profile,
+            }
+
+
+def _prune_jobs(keep: int = JOBS_KEEP) -> None:
+    """Forget the oldest finished jobs beyond keep. Call with _jobs_lock held."""
+    finished = [job for job in _jobs.values() if job.status in FINISHED]
+    if len(finished) <= keep:
+        return
+    finished.sort(key=lambda job: job.finished_at or job.created_at)
+    for job in finished[:len(finished) - keep]:
+        del _jobs[job.id]
+
+
+def submit_job(
+    universe: str = "test",
+    timeframes: list[str] | None = None,
+    workers: int = UPDATE_WORKERS,
+    coalesce: bool = False,
+    profile: bool = False,
+    kind: str = "update",
+    symbols: dict[str, list[str]] | None = None,
+) -> Job:
+    """
+    Queue an update job and return it immediately. With coalesce set, a job
+    of the same kind for the same universe, timeframes and symbols that is
+    still queued is returned instead of queueing another one (it will see the
+    same pending bars). With profile set the run is profiled (see
+    Job.profile_path). kind selects what the job runs (see JOB_RUNNERS) and
+    symbols (exchange -> tickers) limits it to part of the universe. Only
+    the last JOBS_KEEP finished jobs are kept.
+    """
+    if kind not in JOB_RUNNERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    with _jobs_lock:
+        if coalesce and not profile:
+            for queued in _jobs.values():
+                if (
+                    queued.status == "queued"
+                    and queued.kind == kind
+                    and queued.universe == universe
+                    and queued.timeframes == timeframes
+                    and queued.symbols == symbols
+                ):
+                    logger.info(f"Update for {universe} already queued as job {queued.id}")
+                    return queued
+        job = Job(universe, timeframes, workers, profile, kind, symbols)
+        _jobs[job.id] = job
+        _prune_jobs()
+    _executor.submit(job.run)
+    logger.info(f"Queued {kind} job {job.id} for {universe} ({timeframes or 'all timeframes'})")
+    return job
+
+
+def get_job(job_id: str) -> Job | None:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def list_jobs() -> list[Job]:
+    with _jobs_lock:
+        return list(_jobs.values())
+
+
+def cancel_job(job_id: str) -> Job | None:
+    job = get_job(job_id)
+    if job is not None:
+        job.cancel()
+    return job
@@ -0,0 +1,239 @@
+import json
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock, Thread
+from loguru import logger
+
+from service.files import get_ticker_path, atomic_path
+from service.state import get_state
+from service.yf import get_meta
+
+from data.static.static import (
+    META_FIELD_GROUPS,
+    META_TTL,
+    META_BATCH_SIZE,
+    META_WORKERS,
+    META_VOLATILE_FIELDS,
+    META_VOLATILE_PREFIXES,
+)
+
+_FIELD_GROUP = {field: group for group, fields in META_FIELD_GROUPS.items() for field in fields}
+_VOLATILE = set(META_VOLATILE_FIELDS)
+
+
+def is_volatile(field: str) -> bool:
+    """Whether a field is a live quote value (see META_VOLATILE_FIELDS)."""
+    return field in _VOLATILE or field.startswith(META_VOLATILE_PREFIXES)
+
+
+def split_groups(info: dict) -> dict[str, dict]:
+    """Split an .info dict into its field groups (see META_FIELD_GROUPS)."""
+    groups = {}
+    for field, value in info.items():
+        groups.setdefault(_FIELD_GROUP.get(field, "other"), {})[field] = value
+    return groups
+
+
+def group_hashes(info: dict) -> dict[str, str]:
+    """Content hash of each field group of an .info dict, leaving out volatile quote fields."""
+    stable = {field: value for field, value in info.items() if not is_volatile(field)}
+    return {
+        group: hashlib.sha1(json.dumps(fields, sort_keys=True, default=str).encode()).hexdigest()
+        for group, fields in split_groups(stable).items()
+    }
+
+
+class MetaCache:
+    """
+    Ticker metadata served from memory. Each ticker's meta.json is read on
+    first access, and the hash and last check of each field group come from
+    the state store, one exchange at a time.
+
+    A ticker is stale once any of its field groups is older than its TTL
+    (see META_TTL). Refreshing fetches .info again but only rewrites
+    meta.json and bumps the metadata version when a group hash changed.
+    """
+
+    def __init__(self):
+        # (exchange, ticker) -> .info dict
+        self._data: dict[tuple[str, str], dict] = {}
+        # exchange -> ticker -> {field group: {"hash", "checked_at", "changed_at"}}
+        self._groups: dict[str, dict[str, dict[str, dict]]] = {}
+        self._lock = Lock()
+
+    def _exchange_groups(self, exchange: str) -> dict[str, dict[str, dict]]:
+        with self._lock:
+            groups = self._groups.get(exchange)
+        if groups is None:
+            loaded = get_state().load_meta_groups(exchange)
+            with self._lock:
+                groups = self._groups.setdefault(exchange, loaded)
+        return groups
+
+    def get(self, exchange: str, ticker: str) -> dict | None:
+        """Metadata of a ticker, or None if it has never been fetched."""
+        key = (exchange, ticker)
+        with self._lock:
+            if key in self._data:
+                return self._data[key]
+
+        path = get_ticker_path(exchange, ticker, "meta", "json")
+        if not path.exists():
+            return None
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading {path}: {e}")
+            return None
+
+        with self._lock:
+            return self._data.setdefault(key, data)
+
+    def checks(self, exchange: str, ticker: str) -> dict[str, dict]:
+        """Hash, last check and last change of each field group of a ticker."""
+        groups = self._exchange_groups(exchange)
+        with self._lock:
+            return dict(groups.get(ticker, {}))
+
+    def is_stale(self, exchange: str, ticker: str, now: float | None = None) -> bool:
+        groups = self.checks(exchange, ticker)
+        if not groups:
+            return True
+        now = now or time.time()
+        for group, check in groups.items():
+            ttl = META_TTL.get(group, META_TTL.get("other"))
+            if ttl is not None and now - check["checked_at"] >= ttl:
+                return True
+        return False
+
+    def due(self, exchange: str, tickers: list[str], now: float | None = None) -> list[str]:
+        """The tickers whose metadata is missing or stale."""
+        now = now or time.time()
+        return [ticker for ticker in tickers if self.is_stale(exchange, ticker, now)]
+
+    def refresh(self, exchange: str, ticker: str) -> bool | None:
+        """
+        Fetch the metadata of a ticker and store it if any field group changed.
+
+        Returns:
+            Whether the metadata changed, or None if it could not be fetched
+        """
+        info = get_meta(ticker)
+        if not info:
+            return None
+
+        hashes = group_hashes(info)
+        previous = {group: check["hash"] for group, check in self.checks(exchange, ticker).items()}
+        if not previous:
+            # Checked for the first time: compare with what is already on disk
+            stored = self.get(exchange, ticker)
+            previous = group_hashes(stored) if stored else {}
+
+        state = get_state()
+        changed = hashes != previous
+        if changed:
+            meta_path = get_ticker_path(exchange, ticker, "meta", "json")
+            with atomic_path(meta_path) as tmp_path, open(tmp_path, "w") as f:
+                json.dump(info, f, indent=2)
+            state.record_meta(exchange, ticker)
+        state.record_meta_groups(exchange, ticker, hashes)
+
+        now = time.time()
+        groups = self._exchange_groups(exchange)
+        with self._lock:
+            old = groups.get(ticker, {})
+            groups[ticker] = {
+                group: {
+                    "hash": value,
+                    "checked_at": now,
+                    "changed_at": old[group]["changed_at"] if old.get(group, {}).get("hash") == value else now,
+                }
+                for group, value in hashes.items()
+            }
+            self._data[(exchange, ticker)] = info
+        return changed
+
+
+class MetaRefresher:
+    """
+    Refreshes queued tickers in the background, META_BATCH_SIZE at a time on
+    META_WORKERS threads. Tickers already queued are not queued twice, and
+    every .info request still goes through the request governor.
+    """
+
+    def __init__(self, cache: MetaCache, batch_size: int = META_BATCH_SIZE, workers: int = META_WORKERS):
+        self.cache = cache
+        self.batch_size = batch_size
+        self.workers = workers
+        # Ordered set of queued (exchange, ticker)
+        self._pending: dict[tuple[str, str], None] = {}
+        self._lock = Lock()
+        self._wake = Event()
+        self._idle = Event()
+        self._idle.set()
+        self._thread = None
+
+    def submit(self, exchange: str, tickers: list[str]) -> None:
+        with self._lock:
+            for ticker in tickers:
+                self._pending[(exchange, ticker)] = None
+            if not self._pending:
+                return
+            self._idle.clear()
+            self._wake.set()
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name="meta-refresh", daemon=True)
+                self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until the queue is drained. Returns False on timeout."""
+        return self._idle.wait(timeout)
+
+    def _take_batch(self) -> list[tuple[str, str]]:
+        with self._lock:
+            batch = list(self._pending)[:self.batch_size]
+            for key in batch:
+                del self._pending[key]
+            if not batch:
+                self._idle.set()
+                self._wake.clear()
+        return batch
+
+    def _refresh(self, exchange: str, ticker: str) -> bool | None:
+        try:
+            return self.cache.refresh(exchange, ticker)
+        except Exception as e:
+            logger.error(f"Error refreshing metadata for {ticker}: {e}")
+            return None
+
+    def _run(self) -> None:
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="meta-refresh") as executor:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    self._wake.wait()
+                    continue
+
+                results = list(executor.map(lambda key: self._refresh(*key), batch))
+                changed = sum(result is True for result in results)
+                failed = sum(result is None for result in results)
+                logger.info(f"Refreshed metadata of {len(batch)} tickers: {changed} changed, {failed} failed")
+
+
+_cache = MetaCache()
+_refresher = MetaRefresher(_cache)
+
+
+def get_meta_cache() -> MetaCache:
+    return _cache
+
+
+def get_meta_refresher() -> MetaRefresher:
+    return _refresher
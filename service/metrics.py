@@ -0,0 +1,174 @@
+import sys
+import time
+import pstats
+import cProfile
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+
+# Upper bounds (seconds) of the stage duration histogram buckets
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_metrics = []
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """A monotonically increasing value per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = Lock()
+        _metrics.append(self)
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, labels)} {value:g}" for labels, value in values]
+
+
+class Histogram:
+    """Observations counted into fixed buckets per label combination, plus their sum."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = STAGE_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        # labels -> [count per bucket (last one is +Inf), sum]
+        self._values: dict[tuple[str, ...], list] = {}
+        self._lock = Lock()
+        _metrics.append(self)
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.setdefault(labels, [[0] * (len(self.buckets) + 1), 0.0])
+            entry[0][i] += 1
+            entry[1] += value
+
+    def sums(self) -> dict[tuple[str, ...], float]:
+        """Sum of the observations per label combination."""
+        with self._lock:
+            return {labels: total for labels, (_, total) in self._values.items()}
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+
+        lines = []
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = 'le="' + str(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {total:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("rextract_stage_seconds", "Duration of update stages (fetch, parse, merge, write)", ("stage", "timeframe"))
+ROWS_WRITTEN = Counter("rextract_rows_written_total", "Bars added to storage, net of the stored bars they replaced", ("timeframe",))
+EMPTY_FETCHES = Counter("rextract_empty_fetches_total", "Series fetched without any bars", ("timeframe",))
+ERRORS = Counter("rextract_errors_total", "Errors by stage", ("stage", "timeframe"))
+RETRIES = Counter("rextract_retries_total", "Yahoo requests retried after throttling or server errors", ("timeframe",))
+BREAKER_OPENS = Counter("rextract_breaker_opens_total", "Times the Yahoo circuit breaker opened and paused every request")
+PROVIDER_CALLS = Counter("rextract_provider_calls_total", "Requests sent to the market data provider, retries included", ("method", "timeframe"))
+SERIES_REQUESTS = Counter("rextract_series_requests_total", "Series windows asked for, by where they were served from (provider, inflight, cache)", ("source", "timeframe"))
+CACHE_LOOKUPS = Counter("rextract_cache_lookups_total", "Series reads by whether the series cache held the series (hit, miss)", ("result", "timeframe"))
+UPDATE_REQUESTS = Counter("rextract_update_requests_total", "Update runs requested", ("universe",))
+
+
+@contextmanager
+def timed(stage: str, timeframe: str):
+    """Time the block into the stage duration histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage, timeframe)
+
+
+def stage_totals() -> dict[str, float]:
+    """Total seconds spent per stage so far, over all timeframes."""
+    totals = {}
+    for (stage, _), total in STAGE_SECONDS.sums().items():
+        totals[stage] = totals.get(stage, 0.0) + total
+    return totals
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def profiled(path: Path, thread_prefix: str = "update-"):
+    """
+    Profile the block, including the threads it starts whose name begins
+    with thread_prefix, and save the combined stats to path.
+    """
+    profiles = [cProfile.Profile()]
+
+    # Before 3.12 cProfile only sees the thread that enabled it, so each new
+    # pool thread enables its own profiler. From 3.12 one profiler sees all threads.
+    per_thread = sys.version_info < (3, 12)
+    lock = Lock()
+
+    def start_thread_profile(frame, event, arg):
+        sys.setprofile(None)
+        if threading.current_thread().name.startswith(thread_prefix):
+            profile = cProfile.Profile()
+            with lock:
+                profiles.append(profile)
+            profile.enable()
+
+    if per_thread:
+        threading.setprofile(start_thread_profile)
+    profiles[0].enable()
+    try:
+        yield
+    finally:
+        profiles[0].disable()
+        if per_thread:
+            threading.setprofile(None)
+
+        stats = pstats.Stats(profiles[0])
+        with lock:
+            for profile in profiles[1:]:
+                try:
+                    stats.add(profile)
+                except TypeError:
+                    # The thread never got to run any profiled code
+                    continue
+        path.parent.mkdir(parents=True, exist_ok=True)
+        stats.dump_stats(path)
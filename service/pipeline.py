@@ -0,0 +1,418 @@
+import zlib
+import argparse
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from loguru import logger
+
+from service.universe import universe_groups
+from service.store import get_store
+from service.state import get_state
+from service.resample import is_derived, derived_from, derive_timeframe, with_sources
+from service.features import features_enabled, update_features
+from service.snapshot import save_snapshots
+from service.yf import get_grouped_data, governor
+from service.meta import get_meta_cache, get_meta_refresher
+from service.metrics import ROWS_WRITTEN, EMPTY_FETCHES, ERRORS
+from service.time import should_update_timeframe, get_swedish_time
+from service.settings import get_settings
+
+from data.static.static import TIMEFRAME_MAP, TIMEFRAME_PRIORITY, UPDATE_WORKERS, RUN_CHUNK_TICKERS
+
+
+def shard_of(ticker: str, shard_count: int) -> int:
+    """Shard of a ticker: a hash that is stable across processes, hosts and restarts."""
+    return zlib.crc32(ticker.upper().encode()) % shard_count
+
+
+def host_shard() -> tuple[int, int]:
+    """The (index, count) shard this host is configured for (SHARD_INDEX/SHARD_COUNT, env overrides static)."""
+    settings = get_settings()
+    count, index = settings.shard_count, settings.shard_index
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard {index} of {count}")
+    return index, count
+
+
+def plan_ticker(exchange: str, ticker: str, ticker_state: dict | None, now=None) -> tuple[dict, list[tuple[str, str, str | None]]]:
+    """
+    Work out which timeframes of a ticker need fetching from its state
+    (an entry of StateStore.load, or None for a ticker never seen before).
+
+    Returns:
+        (last_update dict, list of (ticker, timeframe, from_date) requests)
+    """
+    if ticker_state is None:
+        requests = [(ticker, timeframe, None) for timeframe in TIMEFRAME_MAP.keys()]
+        return {}, requests
+
+    last_update = dict(ticker_state["last_update"])
+    requests = []
+    for timeframe in TIMEFRAME_MAP.keys():
+        # Seeded derived timeframes are rebuilt from their source instead
+        if is_derived(timeframe) and timeframe in last_update:
+            continue
+        if should_update_timeframe(exchange, timeframe, last_update, now=now):
+            logger.debug(f"{ticker} {timeframe} needs updating from {last_update.get(timeframe)}")
+            requests.append((ticker, timeframe, last_update.get(timeframe)))
+
+    return last_update, requests
+
+
+def prioritize_requests(requests: list[tuple[str, str, str | None]]) -> list[tuple[str, str, str | None]]:
+    """
+    Order (ticker, timeframe, from_date) requests by TIMEFRAME_PRIORITY (daily
+    before intraday), then most stale first, with never fetched series first.
+    Batches are fetched in this order, so the most urgent bars land first.
+    """
+    def key(request: tuple[str, str, str | None]) -> tuple:
+        _, timeframe, from_date = request
+        # Dates of one exchange are ISO strings, so they sort chronologically
+        return TIMEFRAME_PRIORITY.get(timeframe, len(TIMEFRAME_PRIORITY)), from_date is not None, from_date or ""
+
+    return sorted(requests, key=key)
+
+
+def write_timeframe(exchange: str, ticker: str, timeframe: str, data: pd.DataFrame, merge: bool) -> tuple[str | None, int, bool]:
+    """
+    Write fetched data for one timeframe to the configured store. With merge
+    set the new bars are appended to the stored series, otherwise it is replaced.
+
+    Returns:
+        (last stored date as a string or None, rows stored or added, whether the series was replaced)
+    """
+    store = get_store()
+    if merge and store.exists(exchange, ticker, timeframe):
+        return (*store.append(exchange, ticker, timeframe, data), False)
+    return (*store.write(exchange, ticker, timeframe, data), True)
+
+
+def write_ticker(
+    exchange: str,
+    ticker: str,
+    ticker_state: dict | None,
+    requests: list[tuple[str, str, str | None]],
+    fetched: dict[tuple[str, str], pd.DataFrame],
+    progress=None,
+    derive_timeframes: list[str] | None = None,
+    run_id: int | None = None,
+) -> dict[str, str]:
+    """
+    Write all fetched timeframes of a ticker and record each outcome in the
+    state store. Metadata is refreshed separately (see service.meta).
+
+    Derived timeframes (see service.resample) that were not fetched are
+    rebuilt from each written source timeframe, limited to derive_timeframes
+    when given. With a run_id, every fetched timeframe that was written (or
+    came back empty) is journaled as a finished unit of that run.
+
+    When enabled, the rolling features of every written timeframe are then
+    extended from the first new bar (see service.features). A feature
+    failure is logged without failing the timeframe.
+
+    Returns:
+        Dict of timeframe -> error for the timeframes that failed
+    """
+    state = get_state()
+    row_counts = ticker_state["row_count"] if ticker_state else {}
+    last_updates = ticker_state["last_update"] if ticker_state else {}
+    fetched_timeframes = {timeframe for _, timeframe, _ in requests}
+    errors = {}
+
+    def record(timeframe: str, last_date: str | None, rows: int, replaced: bool, status: str) -> None:
+        previous_rows = row_counts.get(timeframe)
+        if replaced:
+            row_count = rows
+        else:
+            row_count = previous_rows + rows if previous_rows is not None else None
+        state.record(exchange, ticker, timeframe, status, last_bar=last_date, row_count=row_count)
+
+    def extend_features(timeframe: str, since) -> None:
+        if not features_enabled(timeframe):
+            return
+        try:
+            update_features(exchange, ticker, timeframe, since)
+        except Exception as e:
+            logger.error(f"Error computing features for {ticker} {timeframe}: {e}")
+            ERRORS.inc("features", timeframe)
+
+    for _, timeframe, from_date in requests:
+        data = fetched.get((ticker, timeframe))
+
+        if data is None or data.empty:
+            logger.info(f"No data fetched for {ticker} {timeframe}")
+            EMPTY_FETCHES.inc(timeframe)
+            state.record(exchange, ticker, timeframe, "empty")
+            if run_id is not None:
+                state.record_unit(run_id, ticker, timeframe, "empty")
+            if progress is not None:
+                progress.unit_done(timeframe, 0)
+            continue
+
+        try:
+            last_date, rows, replaced = write_timeframe(exchange, ticker, timeframe, data, merge=from_date is not None)
+        except Exception as e:
+            logger.error(f"Error writing {ticker} {timeframe}: {e}")
+            ERRORS.inc("write", timeframe)
+            errors[timeframe] = str(e)
+            state.record(exchange, ticker, timeframe, "error", error=str(e))
+            if progress is not None:
+                progress.unit_failed(timeframe)
+            continue
+
+        record(timeframe, last_date, rows, replaced, "ok")
+        ROWS_WRITTEN.inc(timeframe, amount=rows)
+        if run_id is not None:
+            state.record_unit(run_id, ticker, timeframe, "ok", str(data['Date'].min()), last_date, rows)
+
+        if progress is not None:
+            progress.unit_done(timeframe, rows)
+        logger.info(f"Data updated for {ticker} {timeframe}")
+        extend_features(timeframe, data['Date'].min())
+
+        # Resample the derived timeframes affected by the new source bars
+        for derived in derived_from(timeframe):
+            if derived in fetched_timeframes or (derive_timeframes is not None and derived not in derive_timeframes):
+                continue
+            # A derived series left behind its source (by an update of another subset) catches up from its own last bar
+            since = data['Date'].min()
+            if last_updates.get(derived) is not None:
+                since = min(since, pd.Timestamp(last_updates[derived]))
+            try:
+                result = derive_timeframe(exchange, ticker, derived, since)
+            except Exception as e:
+                logger.error(f"Error deriving {ticker} {derived}: {e}")
+                ERRORS.inc("derive", derived)
+                errors[derived] = str(e)
+                state.record(exchange, ticker, derived, "error", error=str(e))
+                continue
+            if result is not None:
+                record(derived, *result, "derived")
+                logger.info(f"Data derived for {ticker} {derived} from {timeframe}")
+                extend_features(derived, since)
+
+    return errors
+
+
+def run_update(
+    universe: str = "test",
+    workers: int = UPDATE_WORKERS,
+    timeframes: list[str] | None = None,
+    progress=None,
+    shard: tuple[int, int] | None = None,
+    symbols: dict[str, list[str]] | None = None,
+    refresh_meta: bool = True,
+) -> dict:
+    """
+    Update every ticker of a universe on a bounded thread pool, one exchange
+    at a time as the universe registry streams them (see update_exchange).
+
+    Once the bars are written, tickers with missing or stale metadata are
+    queued for the background metadata refresh (see service.meta), so bar
+    updates never wait on .info.
+
+    Args:
+        universe: Universe name in the registry (see service.universe)
+        workers: Pool size
+        timeframes: Subset of TIMEFRAME_MAP keys to update (defaults to all). Derived
+            timeframes in it are rebuilt from their source, which is fetched too
+        progress: Optional progress tracker (see service.jobs.Job), also used for cancellation
+        shard: (index, count) to only update the tickers of that shard (defaults to host_shard())
+        symbols: exchange -> tickers to update instead of the registry members of the universe
+        refresh_meta: Queue the metadata refresh of stale tickers after the run
+
+    Returns:
+        Summary with the updated and failed tickers
+    """
+    shard = shard or host_shard()
+    updated, failed = [], {}
+    for exchange, tickers in universe_groups(universe, symbols):
+        if progress is not None and progress.cancel_event.is_set():
+            break
+        result = update_exchange(universe, exchange, tickers, workers, timeframes, progress, shard, refresh_meta)
+        updated.extend(result["updated"])
+        failed.update(result["failed"])
+
+    save_snapshots()
+    return {"updated": updated, "failed": failed}
+
+
+def update_exchange(
+    universe: str,
+    exchange: str,
+    tickers: list[str],
+    workers: int = UPDATE_WORKERS,
+    timeframes: list[str] | None = None,
+    progress=None,
+    shard: tuple[int, int] = (0, 1),
+    refresh_meta: bool = True,
+) -> dict:
+    """
+    Update the tickers of a universe listed on one exchange.
+
+    The exchange state is loaded once from the state store and planned in
+    memory. Tickers are then fetched and written in chunks of
+    RUN_CHUNK_TICKERS: fetching runs one batched download per pool slot and
+    writing runs per ticker on the pool. A failure in one ticker is logged
+    and reported without stopping the others.
+
+    Finished units are journaled (see StateStore.start_run), so a run that
+    died part way is resumed by the next run of the same universe and scope,
+    refetching only the units whose journaled bars have gone stale since.
+
+    Returns:
+        Summary with the updated and failed tickers
+    """
+    workers = max(1, workers)
+
+    shard_index, shard_count = shard
+    if shard_count > 1:
+        tickers = [ticker for ticker in tickers if shard_of(ticker, shard_count) == shard_index]
+        logger.info(f"Updating shard {shard_index + 1}/{shard_count} of {universe} on {exchange}: {len(tickers)} tickers")
+
+    def cancelled() -> bool:
+        return progress is not None and progress.cancel_event.is_set()
+
+    def write(ticker: str, requests: list, fetched: dict):
+        if cancelled():
+            return None
+        return write_ticker(exchange, ticker, states.get(ticker), requests, fetched, progress, timeframes, run_id)
+
+    # Plan: collect every (ticker, timeframe, from_date) that needs fetching
+    state = get_state()
+    states = state.load(exchange)
+    now = get_swedish_time()
+    plans = {}
+    failed = {}
+    # Derived timeframes are brought up to date through their source
+    fetchable = with_sources(timeframes) if timeframes is not None else None
+    for ticker in tickers:
+        try:
+            _, requests = plan_ticker(exchange, ticker, states.get(ticker), now)
+        except Exception as e:
+            logger.error(f"Error planning {ticker}: {e}")
+            failed[ticker] = str(e)
+            continue
+        if fetchable is not None:
+            requests = [request for request in requests if request[1] in fetchable]
+        plans[ticker] = requests
+
+    # Resume an interrupted run of the same scope, skipping the units it
+    # finished whose bars are still current (sessions may have closed since)
+    scope = f"{exchange}|{','.join(timeframes) if timeframes else '*'}|{shard_index}/{shard_count}"
+    run_id, done = state.start_run(universe, scope)
+    if done:
+        current = {
+            (ticker, timeframe) for (ticker, timeframe), last_bar in done.items()
+            if last_bar is not None and not should_update_timeframe(exchange, timeframe, {timeframe: last_bar}, now=now)
+        }
+        logger.info(f"Resuming run {run_id} of {universe} on {exchange}, skipping {len(current)} of {len(done)} finished units")
+        plans = {
+            ticker: [request for request in ticker_requests if (ticker, request[1]) not in current]
+            for ticker, ticker_requests in plans.items()
+        }
+
+    requests = prioritize_requests([request for ticker_requests in plans.values() for request in ticker_requests])
+    if progress is not None:
+        progress.start(requests, skipped=len(tickers) - len(plans))
+
+    # Tickers in order of their most urgent request, then those with nothing to fetch
+    order = list(dict.fromkeys([ticker for ticker, _, _ in requests] + list(plans)))
+
+    written = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="update-write") as executor:
+        # Fetch and write chunk by chunk, so an interrupted run keeps what it wrote
+        for i in range(0, len(order), RUN_CHUNK_TICKERS):
+            if cancelled():
+                break
+            chunk = order[i:i + RUN_CHUNK_TICKERS]
+
+            # Fetch: one batched download per (timeframe, start date) chunk
+            cancel_event = progress.cancel_event if progress is not None else None
+            chunk_requests = prioritize_requests([request for ticker in chunk for request in plans[ticker]])
+            fetched = get_grouped_data(chunk_requests, max_workers=workers, cancel=cancel_event) if chunk_requests else {}
+
+            # Write: merge fetched frames into each ticker's series
+            futures = {ticker: executor.submit(write, ticker, plans[ticker], fetched) for ticker in chunk}
+            for ticker, future in futures.items():
+                try:
+                    errors = future.result()
+                except Exception as e:
+                    logger.error(f"Error writing {ticker}: {e}")
+                    failed[ticker] = str(e)
+                    continue
+                if errors:
+                    failed[ticker] = errors
+                elif errors is not None:
+                    written.append(ticker)
+
+    state.finish_run(run_id, "cancelled" if cancelled() else "completed")
+
+    if refresh_meta and not cancelled():
+        get_meta_refresher().submit(exchange, get_meta_cache().due(exchange, tickers))
+
+    return {"updated": written, "failed": failed}
+
+
+def _init_shard_process(processes: int) -> None:
+    # Every process has its own governor, so split the Yahoo rate limit between them
+    governor.bucket.rate /= processes
+
+
+def run_sharded(
+    universe: str = "test",
+    processes: int = 2,
+    workers: int = UPDATE_WORKERS,
+    timeframes: list[str] | None = None,
+) -> dict:
+    """
+    Update a universe on several processes, each running run_update on its
+    own shard of the tickers. Combined with host sharding, process p of this
+    host updates shard host_index * processes + p of host_count * processes.
+    Stale metadata of the host's tickers is queued from this process once
+    every shard is done.
+
+    Returns:
+        Combined summary with the updated and failed tickers
+    """
+    host_index, host_count = host_shard()
+    shards = [(host_index * processes + p, host_count * processes) for p in range(processes)]
+
+    updated, failed = [], {}
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_shard_process, initargs=(processes,)) as executor:
+        futures = [executor.submit(run_update, universe, workers, timeframes, None, shard, refresh_meta=False) for shard in shards]
+        for shard, future in zip(shards, futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Shard {shard[0] + 1}/{shard[1]} failed: {e}")
+                failed[f"shard {shard[0]}"] = str(e)
+                continue
+            updated.extend(result["updated"])
+            failed.update(result["failed"])
+
+    for exchange, tickers in universe_groups(universe):
+        tickers = [ticker for ticker in tickers if host_count == 1 or shard_of(ticker, host_count) == host_index]
+        get_meta_refresher().submit(exchange, get_meta_cache().due(exchange, tickers))
+
+    return {"updated": updated, "failed": failed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update a universe, optionally sharded across processes")
+    parser.add_argument("--universe", default="test")
+    parser.add_argument("--processes", type=int, default=1, help="Processes to shard this host's tickers across")
+    parser.add_argument("--workers", type=int, default=UPDATE_WORKERS, help="Threads per process")
+    parser.add_argument("--timeframes", nargs="*", default=None, choices=list(TIMEFRAME_MAP))
+    args = parser.parse_args()
+
+    if args.processes > 1:
+        summary = run_sharded(args.universe, args.processes, args.workers, args.timeframes)
+    else:
+        summary = run_update(args.universe, args.workers, args.timeframes)
+    logger.info(f"Updated {len(summary['updated'])} tickers, {len(summary['failed'])} failed")
+
+    # The metadata refresh runs in the background, let it finish before exiting
+    refresher = get_meta_refresher()
+    if refresher.pending:
+        logger.info(f"Refreshing metadata of {refresher.pending} tickers")
+    refresher.wait()
@@ -0,0 +1,218 @@
+import time
+import zlib
+import random
+import numpy as np
+import pandas as pd
+from collections import deque
+from datetime import date, timedelta
+from threading import Lock
+
+from service.time import get_calendar, get_today_swedish_date
+from service.metrics import timed
+from service.settings import get_settings
+
+from data.static.static import (
+    EXCHANGE_TIMEZONES,
+    TIMEFRAME_DURATIONS,
+    TIMEFRAME_LIMITS,
+    SYNTHETIC_LATENCY,
+    SYNTHETIC_ERROR_RATE,
+    SYNTHETIC_RATE_LIMIT,
+    SYNTHETIC_LAG_DAYS,
+    SYNTHETIC_EXCHANGE,
+    SYNTHETIC_START,
+)
+
+NS_PER_MINUTE = 60 * 1_000_000_000
+
+
+class RetryableError(Exception):
+    """A provider error worth retrying (throttling or a server error)."""
+
+
+class Provider:
+    """
+    Source of market data behind get_data/update_data/get_meta and the
+    batched fetches. Frames have a tz-aware 'Date' column followed by
+    Open, High, Low, Close and Volume. Dates are YYYY-MM-DD strings with an
+    exclusive end; without a start the whole period is returned.
+    """
+
+    name = ""
+
+    @classmethod
+    def from_env(cls) -> "Provider":
+        return cls()
+
+    def history(self, ticker: str, timeframe: str, start: str | None, end: str | None, period: str = "max") -> pd.DataFrame:
+        """Bars of one ticker."""
+        raise NotImplementedError
+
+    def download(
+        self,
+        tickers: list[str],
+        timeframe: str,
+        start: str | None,
+        end: str | None,
+        period: str = "max",
+    ) -> dict[str, pd.DataFrame]:
+        """Bars of many tickers in one request. Tickers without bars are left out."""
+        raise NotImplementedError
+
+    def info(self, ticker: str) -> dict:
+        """Metadata of one ticker."""
+        raise NotImplementedError
+
+
+def _uniform(keys: np.ndarray, seed: int) -> np.ndarray:
+    """Deterministic uniform [0, 1) values for integer keys (splitmix64)."""
+    with np.errstate(over="ignore"):
+        x = keys.astype(np.uint64) + np.uint64(seed)
+        x = x * np.uint64(0x9E3779B97F4A7C15)
+        x ^= x >> np.uint64(30)
+        x = x * np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(27)
+        x = x * np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+class SyntheticProvider(Provider):
+    """
+    Generates OHLCV bars locally for any ticker, timeframe and range, on the
+    sessions of one exchange calendar. Prices are a deterministic function
+    of the ticker and bar time, so overlapping and incremental fetches agree.
+
+    Every request sleeps for a jittered latency, fails with a server error
+    at error_rate, and is answered with 429 above rate_limit requests per
+    second, so retries, backoff and the circuit breaker can be exercised.
+    """
+
+    name = "synthetic"
+
+    def __init__(
+        self,
+        latency: float = SYNTHETIC_LATENCY,
+        error_rate: float = SYNTHETIC_ERROR_RATE,
+        rate_limit: float = SYNTHETIC_RATE_LIMIT,
+        lag_days: int = SYNTHETIC_LAG_DAYS,
+        exchange: str = SYNTHETIC_EXCHANGE,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.lag_days = lag_days
+        self.exchange = exchange
+        self.timezone = EXCHANGE_TIMEZONES[exchange]
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._recent = deque()
+        self._lock = Lock()
+
+    @classmethod
+    def from_env(cls) -> "SyntheticProvider":
+        settings = get_settings()
+        return cls(
+            latency=settings.synthetic_latency,
+            error_rate=settings.synthetic_error_rate,
+            rate_limit=settings.synthetic_rate_limit,
+            lag_days=settings.synthetic_lag_days,
+            exchange=settings.synthetic_exchange,
+        )
+
+    def _request(self) -> None:
+        """Simulate one round trip: latency, throttling and server errors."""
+        with self._lock:
+            self.calls += 1
+            delay = self.latency * self._random.uniform(0.5, 1.5)
+            failed = self._random.random() < self.error_rate
+
+            now = time.monotonic()
+            while self._recent and self._recent[0] <= now - 1:
+                self._recent.popleft()
+            throttled = self.rate_limit > 0 and len(self._recent) >= self.rate_limit
+            self._recent.append(now)
+
+        if delay > 0:
+            time.sleep(delay)
+        if throttled:
+            raise RetryableError("429 Too Many Requests (synthetic)")
+        if failed:
+            raise RetryableError("503 Service Unavailable (synthetic)")
+
+    def _bar_starts(self, timeframe: str, start: str | None, end: str | None) -> tuple[np.ndarray, int]:
+        """UTC epoch ns of every bar start in [start, end) and the bar length in ns."""
+        today = get_today_swedish_date().date()
+        lookback, _ = TIMEFRAME_LIMITS.get(timeframe, (None, None))
+        if start is not None:
+            first = date.fromisoformat(start)
+        elif lookback is not None:
+            first = today - timedelta(days=lookback - 1)
+        else:
+            first = date.fromisoformat(SYNTHETIC_START)
+        last = date.fromisoformat(end) - timedelta(days=1) if end is not None else today
+
+        starts = get_calendar(self.exchange).bar_starts(timeframe, first, last)
+        if timeframe == "1wk":
+            length = 7 * 1440 * NS_PER_MINUTE
+        else:
+            length = TIMEFRAME_DURATIONS.get(timeframe, 1440) * NS_PER_MINUTE
+
+        cutoff = time.time_ns() - self.lag_days * 1440 * NS_PER_MINUTE
+        return starts[starts < cutoff], length
+
+    def _price(self, moments: np.ndarray, seed: int, base: float) -> np.ndarray:
+        years = moments / (365.25 * 1440 * NS_PER_MINUTE)
+        phase = (seed % 1000) / 1000 * 2 * np.pi
+        trend = 0.3 * np.sin(2 * np.pi * years / 3 + phase) + 0.1 * np.sin(2 * np.pi * years * 6 + 2 * phase)
+        noise = 0.004 * (_uniform(moments // NS_PER_MINUTE, seed) - 0.5)
+        return base * np.exp(trend + noise)
+
+    def bars(self, ticker: str, timeframe: str, start: str | None, end: str | None) -> pd.DataFrame:
+        starts, length = self._bar_starts(timeframe, start, end)
+        if len(starts) == 0:
+            return pd.DataFrame(columns=['Date', 'Open', 'High', 'Low', 'Close', 'Volume'])
+
+        seed = zlib.crc32(ticker.upper().encode())
+        base = 10 + seed % 490
+        opens = self._price(starts, seed, base)
+        closes = self._price(starts + length, seed, base)
+        spread = 1 + 0.01 * _uniform(starts, seed + 1) * np.sqrt(length / NS_PER_MINUTE / 390)
+        minutes = min(length // NS_PER_MINUTE, 390 * 5)
+        volumes = (1000 + seed % 9000) * minutes * (0.5 + _uniform(starts, seed + 2))
+
+        return pd.DataFrame({
+            'Date': pd.DatetimeIndex(starts, tz="UTC").tz_convert(self.timezone),
+            'Open': opens.round(4),
+            'High': (np.maximum(opens, closes) * spread).round(4),
+            'Low': (np.minimum(opens, closes) / spread).round(4),
+            'Close': closes.round(4),
+            'Volume': volumes.astype(np.int64),
+        })
+
+    def history(self, ticker, timeframe, start, end, period="max"):
+        with timed("fetch", timeframe):
+            self._request()
+            return self.bars(ticker, timeframe, start, end)
+
+    def download(self, tickers, timeframe, start, end, period="max"):
+        frames = {}
+        with timed("fetch", timeframe):
+            self._request()
+            for ticker in tickers:
+                frame = self.bars(ticker, timeframe, start, end)
+                if not frame.empty:
+                    frames[ticker] = frame
+        return frames
+
+    def info(self, ticker):
+        self._request()
+        return {
+            "symbol": ticker.upper(),
+            "shortName": f"{ticker.upper()} (synthetic)",
+            "exchange": self.exchange,
+            "exchangeTimezoneName": self.timezone,
+            "currency": "USD",
+            "quoteType": "EQUITY",
+        }
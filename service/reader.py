@@ -0,0 +1,112 @@
+import pandas as pd
+from collections import OrderedDict
+from threading import Lock
+
+from service.store import get_store, on_write, as_timestamp
+from service.bars import Bars
+from service.metrics import CACHE_LOOKUPS
+
+from data.static.static import BARS_CACHE_BYTES, BARS_CACHE_PROMOTE_AFTER, EXCHANGE_TIMEZONES
+
+
+class SeriesCache:
+    """
+    Size-bounded LRU cache of whole series, each kept in the compact Bars
+    layout (see service.bars) so range lookups are binary searches.
+
+    A series is only loaded whole once it has missed promote_after times;
+    colder series are served by ranged reads from the store. Each series has
+    a generation that writes bump, so a load that raced with a write is not
+    cached.
+    """
+
+    def __init__(self, max_bytes: int, promote_after: int):
+        self.max_bytes = max_bytes
+        self.promote_after = promote_after
+        self._entries: OrderedDict[tuple, Bars] = OrderedDict()
+        self._misses: dict[tuple, int] = {}
+        self._generations: dict[tuple, int] = {}
+        self._bytes = 0
+        self._lock = Lock()
+
+    def get(self, key: tuple) -> Bars | None:
+        with self._lock:
+            bars = self._entries.get(key)
+            if bars is None:
+                return None
+            self._entries.move_to_end(key)
+            return bars
+
+    def miss(self, key: tuple) -> bool:
+        """Count a miss. Returns True once the series is hot enough to load whole."""
+        with self._lock:
+            self._misses[key] = self._misses.get(key, 0) + 1
+            return self._misses[key] >= self.promote_after
+
+    def generation(self, key: tuple) -> int:
+        """Take before reading a series from the store, and pass to put."""
+        with self._lock:
+            return self._generations.get(key, 0)
+
+    def put(self, key: tuple, bars: Bars, generation: int) -> Bars:
+        size = bars.nbytes
+
+        with self._lock:
+            self._misses.pop(key, None)
+            if size > self.max_bytes or self._generations.get(key, 0) != generation:
+                # Too big, or written since it was read
+                return bars
+            self._discard(key)
+            self._entries[key] = bars
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+        return bars
+
+    def invalidate(self, exchange: str, ticker: str, timeframe: str, data: pd.DataFrame = None) -> None:
+        key = (exchange.upper(), ticker.upper(), timeframe)
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self._discard(key)
+
+    def _discard(self, key: tuple) -> None:
+        bars = self._entries.pop(key, None)
+        if bars is not None:
+            self._bytes -= bars.nbytes
+
+
+cache = SeriesCache(BARS_CACHE_BYTES, BARS_CACHE_PROMOTE_AFTER)
+on_write(cache.invalidate)
+
+
+def read_bars(
+    exchange: str,
+    ticker: str,
+    timeframe: str,
+    start=None,
+    end=None,
+    columns: list[str] | None = None,
+) -> pd.DataFrame:
+    """
+    Read the bars of a series with start <= Date <= end (both optional),
+    from the cache when the series is hot and from the store otherwise.
+    Naive bounds are in the exchange timezone.
+    """
+    key = (exchange.upper(), ticker.upper(), timeframe)
+    bars = cache.get(key)
+    tz = EXCHANGE_TIMEZONES.get(exchange.upper(), "UTC")
+    CACHE_LOOKUPS.inc("miss" if bars is None else "hit", timeframe)
+
+    if bars is None:
+        if not cache.miss(key):
+            return get_store().read(exchange, ticker, timeframe, start, end, columns)
+        generation = cache.generation(key)
+        data = get_store().read(exchange, ticker, timeframe)
+        if data.empty:
+            return data
+        bars = cache.put(key, Bars.from_frame(data, tz), generation)
+
+    start_ns = None if start is None else as_timestamp(start, tz).as_unit('ns').value
+    end_ns = None if end is None else as_timestamp(end, tz).as_unit('ns').value
+    return bars.slice(start_ns, end_ns).to_frame(columns)
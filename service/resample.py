@@ -0,0 +1,99 @@
+import pandas as pd
+
+from service.store import get_store
+
+from data.static.static import (
+    DERIVED_TIMEFRAMES,
+    EXCHANGE_TIMEZONES,
+    MARKET_HOURS,
+    TIMEFRAME_DURATIONS,
+    TIMEFRAME_SOURCES,
+)
+
+AGGREGATIONS = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Volume': 'sum',
+}
+
+
+def is_derived(timeframe: str) -> bool:
+    """Whether a timeframe is configured to be resampled locally instead of fetched."""
+    return TIMEFRAME_SOURCES.get(timeframe) == "derive" and timeframe in DERIVED_TIMEFRAMES
+
+
+def derived_from(source: str) -> list[str]:
+    """Derived timeframes built from a source timeframe."""
+    return [timeframe for timeframe, parent in DERIVED_TIMEFRAMES.items() if parent == source and is_derived(timeframe)]
+
+
+def with_sources(timeframes: list[str]) -> set[str]:
+    """
+    The timeframes an update of a subset may fetch: the subset plus the
+    source of each derived timeframe in it, which seeded derived series are
+    rebuilt from.
+    """
+    return set(timeframes) | {DERIVED_TIMEFRAMES[timeframe] for timeframe in timeframes if is_derived(timeframe)}
+
+
+def bucket_starts(dates: pd.Series, exchange: str, timeframe: str) -> pd.Series:
+    """
+    Start of the timeframe bucket each bar falls in, in exchange local time.
+
+    Intraday buckets are aligned to the session open (so 1h bars on NMS
+    start at 9:30, 10:30, ...) and weekly buckets start on Monday, like the
+    bars Yahoo returns.
+    """
+    local = pd.to_datetime(dates, utc=True).dt.tz_convert(EXCHANGE_TIMEZONES.get(exchange, "UTC"))
+    day = local.dt.normalize()
+
+    if timeframe == "1wk":
+        return day - pd.to_timedelta(day.dt.weekday, unit="D")
+
+    open_hour, open_minute, _, _, _ = MARKET_HOURS[exchange]
+    session_open = day + pd.Timedelta(hours=open_hour, minutes=open_minute)
+    size = pd.Timedelta(minutes=TIMEFRAME_DURATIONS[timeframe])
+    return session_open + ((local - session_open) // size) * size
+
+
+def resample_bars(data: pd.DataFrame, exchange: str, timeframe: str) -> pd.DataFrame:
+    """Aggregate finer bars into timeframe bars (OHLC from first/max/min/last, summed volume)."""
+    if data.empty:
+        return data
+
+    buckets = bucket_starts(data['Date'], exchange, timeframe)
+    aggregations = {column: how for column, how in AGGREGATIONS.items() if column in data.columns}
+    bars = data.groupby(buckets.rename('Date'), sort=True).agg(aggregations).reset_index()
+    return bars[[column for column in data.columns if column in bars.columns]]
+
+
+def derive_timeframe(
+    exchange: str,
+    ticker: str,
+    timeframe: str,
+    since: pd.Timestamp,
+) -> tuple[str | None, int, bool] | None:
+    """
+    Rebuild the buckets of a derived timeframe from its stored source bars.
+
+    Only buckets at or after the bucket containing since are recomputed, so
+    after an update only the buckets touched by the new source bars are read
+    and rewritten.
+
+    Returns:
+        Same as pipeline.write_timeframe, or None if there were no source bars
+    """
+    store = get_store()
+    source = DERIVED_TIMEFRAMES[timeframe]
+
+    start = bucket_starts(pd.Series([since]), exchange, timeframe).iloc[0]
+    data = store.read(exchange, ticker, source, start=start)
+    if data.empty:
+        return None
+
+    bars = resample_bars(data, exchange, timeframe)
+    if store.exists(exchange, ticker, timeframe):
+        return (*store.append(exchange, ticker, timeframe, bars), False)
+    return (*store.write(exchange, ticker, timeframe, bars), True)
@@ -0,0 +1,140 @@
+import heapq
+import time
+from threading import Event, Lock, Thread
+from loguru import logger
+
+from service.universe import get_registry
+from service.jobs import submit_job
+from service.time import get_calendar
+
+from data.static.static import SCHEDULE_DELAY_MINUTES, UPDATE_WORKERS
+
+
+class Scheduler:
+    """
+    Fires an update job for each universe shortly after every session close
+    of each of its exchanges, limited to the members on that exchange, so
+    each exchange refreshes on its own clock.
+
+    Upcoming triggers are kept in a priority queue ordered by fire time.
+    Triggers that come due together are queued earliest close first, and a
+    trigger for an exchange whose previous job is still queued is coalesced
+    into that job (see submit_job).
+    """
+
+    def __init__(self, universes: list[str], delay_minutes: int = SCHEDULE_DELAY_MINUTES, workers: int = UPDATE_WORKERS):
+        self.universes = universes
+        self.delay_ns = delay_minutes * 60 * 1_000_000_000
+        self.workers = workers
+        # (fire time as UTC epoch ns, universe, exchange)
+        self._queue: list[tuple[int, str, str]] = []
+        self._lock = Lock()
+        self._wake = Event()
+        self._stopped = Event()
+        self._thread = None
+        # (universe, exchange) -> id of the last job fired
+        self.triggered: dict[tuple[str, str], str] = {}
+
+    def next_fire(self, exchange: str, after_ns: int) -> int | None:
+        """First session close plus delay strictly after after_ns, or None past the calendar."""
+        closes = get_calendar(exchange).closes
+        i = int(closes.searchsorted(after_ns - self.delay_ns, side="right"))
+        if i >= len(closes):
+            return None
+        return int(closes[i]) + self.delay_ns
+
+    def _schedule(self, universe: str, exchange: str, after_ns: int) -> None:
+        fire_ns = self.next_fire(exchange, after_ns)
+        if fire_ns is None:
+            logger.warning(f"No upcoming {exchange} sessions in the calendar, {universe} is not scheduled")
+            return
+        with self._lock:
+            heapq.heappush(self._queue, (fire_ns, universe, exchange))
+        self._wake.set()
+
+    def start(self) -> None:
+        now_ns = time.time_ns()
+        for universe in self.universes:
+            try:
+                exchanges = get_registry().exchanges(universe)
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Cannot schedule {universe}: {e}")
+                continue
+            for exchange in exchanges:
+                self._schedule(universe, exchange, now_ns)
+
+        self._thread = Thread(target=self._run, name="update-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Scheduler started for {', '.join(self.universes)}")
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _pop_due(self, now_ns: int) -> tuple[list[tuple[int, str, str]], float | None]:
+        """Pop every due trigger. Returns them and the seconds until the next one (None if empty)."""
+        due = []
+        with self._lock:
+            while self._queue and self._queue[0][0] <= now_ns:
+                due.append(heapq.heappop(self._queue))
+            wait = (self._queue[0][0] - now_ns) / 1e9 if self._queue else None
+        return due, wait
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            now_ns = time.time_ns()
+            due, wait = self._pop_due(now_ns)
+
+            for _, universe, exchange in due:
+                try:
+                    members = [symbol for _, symbol in get_registry().iter_members(universe, exchange)]
+                    job = submit_job(universe, None, self.workers, coalesce=True, symbols={exchange: members})
+                    self.triggered[(universe, exchange)] = job.id
+                    logger.info(f"Scheduled update of {universe} after the {exchange} close")
+                except Exception as e:
+                    logger.error(f"Scheduled update of {universe} failed: {e}")
+                # Missed closes (e.g. after a suspend) collapse into this one trigger
+                self._schedule(universe, exchange, now_ns)
+
+            if due:
+                continue
+            self._wake.clear()
+            self._wake.wait(timeout=wait)
+
+    def to_dict(self) -> list[dict]:
+        with self._lock:
+            upcoming = sorted(self._queue)
+        return [
+            {
+                "universe": universe,
+                "exchange": exchange,
+                "fire_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(fire_ns / 1e9)),
+                "last_job_id": self.triggered.get((universe, exchange)),
+            }
+            for fire_ns, universe, exchange in upcoming
+        ]
+
+
+_scheduler = None
+
+
+def start_scheduler(universes: list[str], delay_minutes: int = SCHEDULE_DELAY_MINUTES, workers: int = UPDATE_WORKERS) -> Scheduler:
+    """Start the shared scheduler (once per process)."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = Scheduler(universes, delay_minutes, workers)
+        _scheduler.start()
+    return _scheduler
+
+
+def get_scheduler() -> Scheduler | None:
+    return _scheduler
+
+
+def stop_scheduler() -> None:
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+        _scheduler = None
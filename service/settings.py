@@ -0,0 +1,91 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from dotenv import load_dotenv
+
+from data.static.static import (
+    UPDATE_WORKERS,
+    PROVIDER,
+    STORAGE_BACKEND,
+    SCHEDULE_UNIVERSES,
+    SCHEDULE_DELAY_MINUTES,
+    SHARD_COUNT,
+    SHARD_INDEX,
+    FEATURES_ENABLED,
+    YF_RATE_LIMIT,
+    YF_RESPONSE_TTL,
+    SYNTHETIC_LATENCY,
+    SYNTHETIC_ERROR_RATE,
+    SYNTHETIC_RATE_LIMIT,
+    SYNTHETIC_LAG_DAYS,
+    SYNTHETIC_EXCHANGE,
+)
+
+DEFAULT_DATA_DIR = Path(__file__).parent.parent / "data/markets"
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Configuration that can be overridden from the environment (or .env),
+    read once per process. Everything else lives in data/static/static.py.
+    """
+
+    api_key: str | None
+    data_dir: Path
+    update_workers: int
+    provider: str
+    storage_backend: str
+    scheduler_enabled: bool
+    schedule_universes: tuple[str, ...]
+    schedule_delay_minutes: int
+    shard_count: int
+    shard_index: int
+    features_enabled: bool
+    yf_rate_limit: float
+    yf_response_ttl: float
+    synthetic_latency: float
+    synthetic_error_rate: float
+    synthetic_rate_limit: float
+    synthetic_lag_days: int
+    synthetic_exchange: str
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        universes = os.getenv("SCHEDULE_UNIVERSES")
+        return cls(
+            api_key=os.getenv("API_KEY"),
+            data_dir=Path(os.getenv("DATA_DIR", DEFAULT_DATA_DIR)),
+            update_workers=int(os.getenv("UPDATE_WORKERS", UPDATE_WORKERS)),
+            provider=os.getenv("PROVIDER", PROVIDER),
+            storage_backend=os.getenv("STORAGE_BACKEND", STORAGE_BACKEND),
+            scheduler_enabled=os.getenv("SCHEDULER_ENABLED", "0") == "1",
+            schedule_universes=tuple(universes.split(",") if universes else SCHEDULE_UNIVERSES),
+            schedule_delay_minutes=int(os.getenv("SCHEDULE_DELAY_MINUTES", SCHEDULE_DELAY_MINUTES)),
+            shard_count=int(os.getenv("SHARD_COUNT", SHARD_COUNT)),
+            shard_index=int(os.getenv("SHARD_INDEX", SHARD_INDEX)),
+            features_enabled=os.getenv("FEATURES_ENABLED", "1" if FEATURES_ENABLED else "0") == "1",
+            yf_rate_limit=float(os.getenv("YF_RATE_LIMIT", YF_RATE_LIMIT)),
+            yf_response_ttl=float(os.getenv("YF_RESPONSE_TTL", YF_RESPONSE_TTL)),
+            synthetic_latency=float(os.getenv("SYNTHETIC_LATENCY", SYNTHETIC_LATENCY)),
+            synthetic_error_rate=float(os.getenv("SYNTHETIC_ERROR_RATE", SYNTHETIC_ERROR_RATE)),
+            synthetic_rate_limit=float(os.getenv("SYNTHETIC_RATE_LIMIT", SYNTHETIC_RATE_LIMIT)),
+            synthetic_lag_days=int(os.getenv("SYNTHETIC_LAG_DAYS", SYNTHETIC_LAG_DAYS)),
+            synthetic_exchange=os.getenv("SYNTHETIC_EXCHANGE", SYNTHETIC_EXCHANGE),
+        )
+
+
+_settings = None
+_lock = Lock()
+
+
+def get_settings() -> Settings:
+    """The process settings, loaded from .env and the environment on first use."""
+    global _settings
+    if _settings is None:
+        with _lock:
+            if _settings is None:
+                load_dotenv()
+                _settings = Settings.from_env()
+    return _settings
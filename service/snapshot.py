@@ -0,0 +1,153 @@
+import os
+import numpy as np
+import pandas as pd
+from threading import Lock
+from loguru import logger
+
+from service.files import DATA_DIR, file_lock
+from service.store import on_write
+
+from data.static.static import EXCHANGE_TIMEZONES
+
+SNAPSHOT_DIR = DATA_DIR / "snapshot"
+
+FLOAT_COLUMNS = ['Open', 'High', 'Low', 'Close']
+
+
+class LatestBars:
+    """
+    Latest bar of every ticker for one exchange and timeframe, stored
+    column-wise in numpy arrays (one row per ticker) and updated in place.
+    """
+
+    def __init__(self, exchange: str, timeframe: str, capacity: int = 64):
+        self.exchange = exchange
+        self.timeframe = timeframe
+        self.tickers: list[str] = []
+        self.rows: dict[str, int] = {}
+        self.dates = np.zeros(capacity, dtype=np.int64)
+        self.prices = np.zeros((capacity, len(FLOAT_COLUMNS)), dtype=np.float64)
+        self.volumes = np.zeros(capacity, dtype=np.int64)
+        self._lock = Lock()
+
+    def _grow(self) -> None:
+        capacity = len(self.dates) * 2
+        self.dates = np.resize(self.dates, capacity)
+        self.prices = np.resize(self.prices, (capacity, len(FLOAT_COLUMNS)))
+        self.volumes = np.resize(self.volumes, capacity)
+
+    def update(self, ticker: str, date_ns: int, prices: list[float], volume: int) -> None:
+        """Set the latest bar of a ticker, unless a newer bar is already recorded."""
+        with self._lock:
+            row = self.rows.get(ticker)
+            if row is None:
+                if len(self.tickers) == len(self.dates):
+                    self._grow()
+                row = len(self.tickers)
+                self.tickers.append(ticker)
+                self.rows[ticker] = row
+            elif self.dates[row] > date_ns:
+                return
+            self.dates[row] = date_ns
+            self.prices[row] = prices
+            self.volumes[row] = volume
+
+    def copy(self) -> tuple[list[str], np.ndarray, np.ndarray, np.ndarray]:
+        """A consistent copy of the filled rows: (tickers, dates, prices, volumes)."""
+        with self._lock:
+            n = len(self.tickers)
+            return list(self.tickers), self.dates[:n].copy(), self.prices[:n].copy(), self.volumes[:n].copy()
+
+    def to_dict(self) -> dict:
+        tickers, dates, prices, volumes = self.copy()
+        tz = EXCHANGE_TIMEZONES.get(self.exchange, "UTC")
+        data = {
+            "ticker": tickers,
+            "Date": pd.DatetimeIndex(dates, tz="UTC").tz_convert(tz).astype(str).tolist(),
+        }
+        for i, column in enumerate(FLOAT_COLUMNS):
+            data[column] = prices[:, i].tolist()
+        data["Volume"] = volumes.tolist()
+        return data
+
+    def save(self, path) -> None:
+        tickers, dates, prices, volumes = self.copy()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, tickers=np.array(tickers, dtype=str), dates=dates, prices=prices, volumes=volumes)
+        os.replace(tmp_path, path)
+
+    def load(self, path) -> None:
+        with np.load(path) as saved:
+            tickers = saved["tickers"].tolist()
+            with self._lock:
+                self.tickers = tickers
+                self.rows = {ticker: row for row, ticker in enumerate(tickers)}
+                capacity = max(64, len(tickers))
+                self.dates = np.resize(saved["dates"], capacity)
+                self.prices = np.resize(saved["prices"], (capacity, len(FLOAT_COLUMNS)))
+                self.volumes = np.resize(saved["volumes"], capacity)
+
+    def merge(self, path) -> None:
+        """Take in the saved rows that are newer than ours (e.g. saved by another shard process)."""
+        with np.load(path) as saved:
+            for ticker, date_ns, prices, volume in zip(
+                saved["tickers"].tolist(), saved["dates"].tolist(), saved["prices"], saved["volumes"].tolist()
+            ):
+                self.update(ticker, date_ns, prices, volume)
+
+
+_tables: dict[tuple[str, str], LatestBars] = {}
+_tables_lock = Lock()
+
+
+def _snapshot_path(exchange: str, timeframe: str):
+    return SNAPSHOT_DIR / f"{exchange.lower()}_{timeframe}.npz"
+
+
+def get_table(exchange: str, timeframe: str) -> LatestBars:
+    """The latest-bar table of an exchange and timeframe, loaded from its last saved copy on first use."""
+    key = (exchange.upper(), timeframe)
+    with _tables_lock:
+        table = _tables.get(key)
+        if table is None:
+            table = LatestBars(*key)
+            path = _snapshot_path(*key)
+            if path.exists():
+                try:
+                    table.load(path)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.error(f"Error loading snapshot {path}: {e}")
+            _tables[key] = table
+        return table
+
+
+def record_latest(exchange: str, ticker: str, timeframe: str, data: pd.DataFrame) -> None:
+    """Record the last bar of a freshly written frame in the snapshot (a store write listener)."""
+    if data is None or data.empty:
+        return
+    dates = pd.to_datetime(data['Date'], utc=True)
+    i = dates.idxmax()
+    last = data.loc[i]
+    prices = [float(last[column]) if column in last else np.nan for column in FLOAT_COLUMNS]
+    volume = int(last['Volume']) if 'Volume' in last and pd.notna(last['Volume']) else 0
+    get_table(exchange, timeframe).update(ticker.upper(), dates[i].as_unit("ns").value, prices, volume)
+
+
+def save_snapshots() -> None:
+    """Persist every loaded table for a warm restart."""
+    with _tables_lock:
+        tables = list(_tables.values())
+    for table in tables:
+        path = _snapshot_path(table.exchange, table.timeframe)
+        with file_lock(path.with_suffix(".lock")):
+            if path.exists():
+                try:
+                    table.merge(path)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.error(f"Error merging snapshot {path}: {e}")
+            table.save(path)
+
+
+on_write(record_latest)
@@ -0,0 +1,334 @@
+import json
+import time
+import sqlite3
+from pathlib import Path
+from threading import Lock
+from loguru import logger
+
+from service.files import DATA_DIR
+
+STATE_PATH = DATA_DIR / "state.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    exchange TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    last_bar TEXT,
+    row_count INTEGER,
+    status TEXT NOT NULL,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (exchange, ticker, timeframe)
+);
+CREATE INDEX IF NOT EXISTS series_timeframe ON series (exchange, timeframe, status);
+CREATE TABLE IF NOT EXISTS tickers (
+    exchange TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    meta_version INTEGER NOT NULL DEFAULT 0,
+    meta_updated_at REAL,
+    PRIMARY KEY (exchange, ticker)
+);
+CREATE TABLE IF NOT EXISTS meta_groups (
+    exchange TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    field_group TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    changed_at REAL NOT NULL,
+    PRIMARY KEY (exchange, ticker, field_group)
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    universe TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS runs_open ON runs (universe, scope, status);
+CREATE TABLE IF NOT EXISTS run_units (
+    run_id INTEGER NOT NULL,
+    ticker TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    status TEXT NOT NULL,
+    first_bar TEXT,
+    last_bar TEXT,
+    rows INTEGER,
+    completed_at REAL NOT NULL,
+    PRIMARY KEY (run_id, ticker, timeframe)
+);
+"""
+
+
+class StateStore:
+    """
+    Per-series update state for the whole universe in one SQLite file:
+    last bar, row count and last fetch status per (exchange, ticker, timeframe),
+    and the metadata version and field group hashes per (exchange, ticker).
+
+    Also holds the run journal: every update run and each (ticker, timeframe)
+    unit it finished with the range written, so an interrupted run resumes
+    where it stopped.
+
+    Replaces probing meta.json/last_update.json for every ticker. Existing
+    JSON files are imported when the database is first created.
+    """
+
+    def __init__(self, path: Path = STATE_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not path.exists()
+
+        self.path = path
+        self._lock = Lock()
+        # Other processes sharing the file may hold the write lock for a while
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+        if is_new:
+            count = self.import_json()
+            if count:
+                logger.info(f"Imported {count} tickers from last_update.json/meta.json")
+
+    def load(self, exchange: str) -> dict[str, dict]:
+        """
+        Load the state of every ticker of an exchange in one pass.
+
+        Returns:
+            Dict of ticker -> {"meta_version": int | None, "last_update": {timeframe: last_bar}, "row_count": {timeframe: int}}
+        """
+        state = {}
+        with self._lock:
+            for row in self._conn.execute(
+                "SELECT ticker, meta_version FROM tickers WHERE exchange = ?", (exchange,)
+            ):
+                state[row["ticker"]] = {"meta_version": row["meta_version"], "last_update": {}, "row_count": {}}
+
+            for row in self._conn.execute(
+                "SELECT ticker, timeframe, last_bar, row_count FROM series WHERE exchange = ? AND last_bar IS NOT NULL",
+                (exchange,),
+            ):
+                ticker_state = state.setdefault(
+                    row["ticker"], {"meta_version": None, "last_update": {}, "row_count": {}}
+                )
+                ticker_state["last_update"][row["timeframe"]] = row["last_bar"]
+                ticker_state["row_count"][row["timeframe"]] = row["row_count"]
+
+        return state
+
+    def record(
+        self,
+        exchange: str,
+        ticker: str,
+        timeframe: str,
+        status: str,
+        last_bar: str | None = None,
+        row_count: int | None = None,
+        error: str | None = None,
+    ) -> None:
+        """Record the outcome of fetching one series. Keeps the previous last bar and row count when not given."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO series (exchange, ticker, timeframe, last_bar, row_count, status, error, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (exchange, ticker, timeframe) DO UPDATE SET
+                    last_bar = COALESCE(excluded.last_bar, last_bar),
+                    row_count = COALESCE(excluded.row_count, row_count),
+                    status = excluded.status,
+                    error = excluded.error,
+                    updated_at = excluded.updated_at
+                """,
+                (exchange, ticker, timeframe, last_bar, row_count, status, error, time.time()),
+            )
+
+    def record_meta(self, exchange: str, ticker: str) -> int:
+        """Bump the metadata version of a ticker. Returns the new version."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO tickers (exchange, ticker, meta_version, meta_updated_at) VALUES (?, ?, 1, ?)
+                ON CONFLICT (exchange, ticker) DO UPDATE SET
+                    meta_version = meta_version + 1,
+                    meta_updated_at = excluded.meta_updated_at
+                """,
+                (exchange, ticker, time.time()),
+            )
+            row = self._conn.execute(
+                "SELECT meta_version FROM tickers WHERE exchange = ? AND ticker = ?", (exchange, ticker)
+            ).fetchone()
+        return row["meta_version"]
+
+    def load_meta_groups(self, exchange: str) -> dict[str, dict[str, dict]]:
+        """
+        Metadata field group hashes of every ticker on an exchange.
+
+        Returns:
+            Dict of ticker -> {field group: {"hash", "checked_at", "changed_at"}}
+        """
+        groups = {}
+        with self._lock:
+            for row in self._conn.execute(
+                "SELECT ticker, field_group, hash, checked_at, changed_at FROM meta_groups WHERE exchange = ?",
+                (exchange,),
+            ):
+                groups.setdefault(row["ticker"], {})[row["field_group"]] = {
+                    "hash": row["hash"],
+                    "checked_at": row["checked_at"],
+                    "changed_at": row["changed_at"],
+                }
+        return groups
+
+    def record_meta_groups(self, exchange: str, ticker: str, hashes: dict[str, str]) -> None:
+        """
+        Record a metadata check: the hash of each field group, keeping
+        changed_at for unchanged groups and dropping groups no longer present.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"DELETE FROM meta_groups WHERE exchange = ? AND ticker = ? AND field_group NOT IN ({','.join('?' * len(hashes))})",
+                (exchange, ticker, *hashes),
+            )
+            self._conn.executemany(
+                """
+                INSERT INTO meta_groups (exchange, ticker, field_group, hash, checked_at, changed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (exchange, ticker, field_group) DO UPDATE SET
+                    changed_at = CASE WHEN hash = excluded.hash THEN changed_at ELSE excluded.changed_at END,
+                    hash = excluded.hash,
+                    checked_at = excluded.checked_at
+                """,
+                [(exchange, ticker, group, value, now, now) for group, value in hashes.items()],
+            )
+
+    def query(
+        self,
+        exchange: str | None = None,
+        ticker: str | None = None,
+        timeframe: str | None = None,
+        status: str | None = None,
+        updated_before: float | None = None,
+    ) -> list[dict]:
+        """Return series state rows matching all given filters."""
+        clauses, params = [], []
+        for column, value in (("exchange", exchange), ("ticker", ticker), ("timeframe", timeframe), ("status", status)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if updated_before is not None:
+            clauses.append("updated_at < ?")
+            params.append(updated_before)
+
+        sql = "SELECT * FROM series"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY exchange, ticker, timeframe"
+
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def start_run(self, universe: str, scope: str) -> tuple[int, dict[tuple[str, str], str | None]]:
+        """
+        Resume the latest interrupted run of a universe and scope (timeframes
+        and shard), or start a new one.
+
+        Returns:
+            (run id, (ticker, timeframe) -> last bar written of the units the run already finished)
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id FROM runs WHERE universe = ? AND scope = ? AND status = 'running' ORDER BY id DESC LIMIT 1",
+                (universe, scope),
+            ).fetchone()
+            if row is None:
+                cursor = self._conn.execute(
+                    "INSERT INTO runs (universe, scope, status, started_at) VALUES (?, ?, 'running', ?)",
+                    (universe, scope, time.time()),
+                )
+                return cursor.lastrowid, {}
+
+            done = {
+                (unit["ticker"], unit["timeframe"]): unit["last_bar"]
+                for unit in self._conn.execute("SELECT ticker, timeframe, last_bar FROM run_units WHERE run_id = ?", (row["id"],))
+            }
+            return row["id"], done
+
+    def record_unit(
+        self,
+        run_id: int,
+        ticker: str,
+        timeframe: str,
+        status: str,
+        first_bar: str | None = None,
+        last_bar: str | None = None,
+        rows: int = 0,
+    ) -> None:
+        """Journal a finished (ticker, timeframe) unit of a run and the range it wrote."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO run_units (run_id, ticker, timeframe, status, first_bar, last_bar, rows, completed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (run_id, ticker, timeframe, status, first_bar, last_bar, rows, time.time()),
+            )
+
+    def finish_run(self, run_id: int, status: str) -> None:
+        """Close a run (completed or cancelled) so it is not resumed, and drop its unit journal."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE runs SET status = ?, finished_at = ? WHERE id = ?", (status, time.time(), run_id)
+            )
+            self._conn.execute("DELETE FROM run_units WHERE run_id = ?", (run_id,))
+
+    def import_json(self) -> int:
+        """
+        Import every data/markets/<exchange>/<TICKER>/last_update.json and meta.json.
+
+        Returns:
+            Number of tickers imported
+        """
+        count = 0
+        for ticker_dir in sorted(DATA_DIR.glob("*/*")):
+            if not ticker_dir.is_dir():
+                continue
+            exchange = ticker_dir.parent.name.upper()
+            ticker = ticker_dir.name
+
+            last_update_path = ticker_dir / "last_update.json"
+            meta_path = ticker_dir / "meta.json"
+            if not last_update_path.exists() and not meta_path.exists():
+                continue
+
+            if meta_path.exists():
+                self.record_meta(exchange, ticker)
+
+            if last_update_path.exists():
+                try:
+                    with open(last_update_path, "r") as f:
+                        last_update = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Error importing {last_update_path}: {e}")
+                    continue
+                for timeframe, last_bar in last_update.items():
+                    self.record(exchange, ticker, timeframe, "imported", last_bar=last_bar)
+
+            count += 1
+        return count
+
+
+_state = None
+_state_lock = Lock()
+
+
+def get_state() -> StateStore:
+    """Return the shared state store, opening it on first use."""
+    global _state
+    with _state_lock:
+        if _state is None:
+            _state = StateStore()
+        return _state
@@ -0,0 +1,322 @@
+import argparse
+import pandas as pd
+from pathlib import Path
+from loguru import logger
+
+from service.files import (
+    DATA_DIR, get_ticker_path, add_ticker, append_ticker, read_ticker_range, iter_ticker_chunks, series_lock, atomic_path,
+)
+
+from service.metrics import timed
+from service.bars import to_typed
+from service.settings import get_settings
+
+from data.static.static import EXCHANGE_TIMEZONES, STORAGE_PARTITIONS, TIMEFRAME_MAP
+
+# Callbacks run with (exchange, ticker, timeframe, written bars) after a series is written
+_write_listeners = []
+
+
+def on_write(callback) -> None:
+    """Register a callback run after any series is written (e.g. to invalidate caches)."""
+    _write_listeners.append(callback)
+
+
+def _notify_write(exchange: str, ticker: str, timeframe: str, data: pd.DataFrame) -> None:
+    for callback in _write_listeners:
+        callback(exchange, ticker, timeframe, data)
+
+
+class BarStore:
+    """
+    Storage backend for bar series, one series per (exchange, ticker, timeframe).
+
+    Writes hold the series lock (see service.files.series_lock) and replace
+    files atomically, so several processes or hosts can share the storage.
+    """
+
+    name = ""
+
+    def write(self, exchange: str, ticker: str, timeframe: str, data: pd.DataFrame) -> tuple[str | None, int]:
+        """Replace a series. Returns the last stored date as a string and the number of rows stored."""
+        raise NotImplementedError
+
+    def append(self, exchange: str, ticker: str, timeframe: str, data: pd.DataFrame) -> tuple[str | None, int]:
+        """Merge new bars into a series. Returns the last stored date as a string and the net rows added."""
+        raise NotImplementedError
+
+    def read(
+        self,
+        exchange: str,
+        ticker: str,
+        timeframe: str,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+        columns: list[str] | None = None,
+    ) -> pd.DataFrame:
+        """Read the bars with start <= Date <= end (both optional)."""
+        raise NotImplementedError
+
+    def iter_chunks(self, exchange: str, ticker: str, timeframe: str, start=None, chunk_rows: int = 10_000):
+        """Yield the bars with Date >= start in typed frames of at most chunk_rows rows."""
+        raise NotImplementedError
+
+    def exists(self, exchange: str, ticker: str, timeframe: str) -> bool:
+        raise NotImplementedError
+
+
+def _last_date(data: pd.DataFrame) -> str | None:
+    if 'Date' not in data.columns or data.empty:
+        return None
+    return str(data['Date'].iloc[-1])
+
+
+def as_timestamp(value, tz) -> pd.Timestamp:
+    """Make a range bound comparable with a Date column in timezone tz."""
+    value = pd.Timestamp(value)
+    if value.tzinfo is None and tz is not None:
+        return value.tz_localize(tz)
+    return value
+
+
+def _filter_range(data: pd.DataFrame, start, end, columns: list[str] | None) -> pd.DataFrame:
+    tz = data['Date'].dt.tz
+    if start is not None:
+        data = data[data['Date'] >= as_timestamp(start, tz)]
+    if end is not None:
+        data = data[data['Date'] <= as_timestamp(end, tz)]
+    if columns:
+        data = data[['Date'] + [column for column in columns if column != 'Date']]
+    return data.reset_index(drop=True)
+
+
+class CsvStore(BarStore):
+    """The original layout: data/markets/<exchange>/<TICKER>/<timeframe>.csv"""
+
+    name = "csv"
+
+    def write(self, exchange, ticker, timeframe, data):
+        with series_lock(exchange, ticker, timeframe):
+            add_ticker(ticker, exchange, timeframe, data, None)
+        _notify_write(exchange, ticker, timeframe, data)
+        return _last_date(data), len(data)
+
+    def append(self, exchange, ticker, timeframe, data):
+        with series_lock(exchange, ticker, timeframe):
+            result = append_ticker(ticker, exchange, timeframe, data)
+        _notify_write(exchange, ticker, timeframe, data)
+        return result
+
+    def read(self, exchange, ticker, timeframe, start=None, end=None, columns=None):
+        tz = EXCHANGE_TIMEZONES.get(exchange.upper(), "UTC")
+        start_ns = as_timestamp(start, tz).as_unit('ns').value if start is not None else None
+        end_ns = as_timestamp(end, tz).as_unit('ns').value if end is not None else None
+        usecols = ['Date'] + [column for column in columns if column != 'Date'] if columns else None
+
+        data = read_ticker_range(ticker, exchange, timeframe, start_ns, end_ns, usecols)
+        if data.empty and 'Date' not in data.columns:
+            return pd.DataFrame()
+        return to_typed(data, exchange)
+
+    def iter_chunks(self, exchange, ticker, timeframe, start=None, chunk_rows=10_000):
+        tz = EXCHANGE_TIMEZONES.get(exchange.upper(), "UTC")
+        start_ns = as_timestamp(start, tz).as_unit('ns').value if start is not None else None
+        for chunk in iter_ticker_chunks(ticker, exchange, timeframe, start_ns, chunk_rows):
+            yield to_typed(chunk, exchange)
+
+    def exists(self, exchange, ticker, timeframe):
+        return get_ticker_path(exchange, ticker, timeframe, "csv").exists()
+
+
+class ParquetStore(BarStore):
+    """
+    Typed, compressed Parquet files partitioned by period:
+    data/markets/<exchange>/<TICKER>/<timeframe>/<period>.parquet
+
+    The period is a month (YYYY-MM) or a year (YYYY) depending on the
+    timeframe (see STORAGE_PARTITIONS). Appends only rewrite the partitions
+    the new bars fall in, and range reads only open the partitions that
+    overlap the range.
+    """
+
+    name = "parquet"
+    compression = "zstd"
+
+    def series_dir(self, exchange: str, ticker: str, timeframe: str) -> Path:
+        return get_ticker_path(exchange, ticker, timeframe, "csv").with_suffix("")
+
+    def _period_format(self, timeframe: str) -> str:
+        return "%Y-%m" if STORAGE_PARTITIONS.get(timeframe, "year") == "month" else "%Y"
+
+    def _partitions(self, exchange, ticker, timeframe) -> list[Path]:
+        directory = self.series_dir(exchange, ticker, timeframe)
+        if not directory.exists():
+            return []
+        return sorted(directory.glob("*.parquet"))
+
+    def _write_partitions(self, directory: Path, timeframe: str, data: pd.DataFrame) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        periods = data['Date'].dt.strftime(self._period_format(timeframe))
+        for period, partition in data.groupby(periods, sort=False):
+            partition = partition.reset_index(drop=True)
+            with atomic_path(directory / f"{period}.parquet") as tmp_path:
+                partition.to_parquet(tmp_path, index=False, compression=self.compression)
+
+    def write(self, exchange, ticker, timeframe, data):
+        data = to_typed(data, exchange)
+        data = data.drop_duplicates(subset=['Date'], keep='last').sort_values('Date')
+
+        directory = self.series_dir(exchange, ticker, timeframe)
+        with series_lock(exchange, ticker, timeframe):
+            periods = set(data['Date'].dt.strftime(self._period_format(timeframe)))
+            with timed("write", timeframe):
+                self._write_partitions(directory, timeframe, data)
+            # Drop partitions the new series no longer covers
+            for path in self._partitions(exchange, ticker, timeframe):
+                if path.stem not in periods:
+                    path.unlink()
+        _notify_write(exchange, ticker, timeframe, data)
+        return _last_date(data), len(data)
+
+    def append(self, exchange, ticker, timeframe, data):
+        data = to_typed(data, exchange)
+        directory = self.series_dir(exchange, ticker, timeframe)
+        period_format = self._period_format(timeframe)
+
+        with series_lock(exchange, ticker, timeframe):
+            # Merge the new bars into each partition they touch
+            merged = []
+            existing_rows = 0
+            periods = data['Date'].dt.strftime(period_format)
+            for period, new_rows in data.groupby(periods, sort=False):
+                path = directory / f"{period}.parquet"
+                if path.exists():
+                    existing = pd.read_parquet(path)
+                    existing_rows += len(existing)
+                    new_rows = pd.concat([existing, new_rows], ignore_index=True)
+                merged.append(new_rows)
+
+            rows_added = 0
+            if merged:
+                with timed("merge", timeframe):
+                    combined = pd.concat(merged, ignore_index=True)
+                    combined = combined.drop_duplicates(subset=['Date'], keep='last').sort_values('Date')
+                with timed("write", timeframe):
+                    self._write_partitions(directory, timeframe, combined)
+                rows_added = len(combined) - existing_rows
+
+            partitions = self._partitions(exchange, ticker, timeframe)
+
+        if merged:
+            _notify_write(exchange, ticker, timeframe, data)
+        if not partitions:
+            return None, rows_added
+        return _last_date(pd.read_parquet(partitions[-1], columns=['Date'])), rows_added
+
+    def read(self, exchange, ticker, timeframe, start=None, end=None, columns=None):
+        period_format = self._period_format(timeframe)
+        tz = EXCHANGE_TIMEZONES.get(exchange.upper(), "UTC")
+        first = as_timestamp(start, tz).tz_convert(tz).strftime(period_format) if start is not None else None
+        last = as_timestamp(end, tz).tz_convert(tz).strftime(period_format) if end is not None else None
+
+        paths = [
+            path for path in self._partitions(exchange, ticker, timeframe)
+            if (first is None or path.stem >= first) and (last is None or path.stem <= last)
+        ]
+        if not paths:
+            return pd.DataFrame()
+
+        read_columns = None
+        if columns:
+            read_columns = ['Date'] + [column for column in columns if column != 'Date']
+        data = pd.concat([pd.read_parquet(path, columns=read_columns) for path in paths], ignore_index=True)
+        # Partitions written at different times may differ in price dtype
+        return to_typed(_filter_range(data, start, end, columns), exchange)
+
+    def iter_chunks(self, exchange, ticker, timeframe, start=None, chunk_rows=10_000):
+        import pyarrow.parquet as pq
+
+        tz = EXCHANGE_TIMEZONES.get(exchange.upper(), "UTC")
+        start = as_timestamp(start, tz) if start is not None else None
+        first = start.tz_convert(tz).strftime(self._period_format(timeframe)) if start is not None else None
+
+        for path in self._partitions(exchange, ticker, timeframe):
+            if first is not None and path.stem < first:
+                continue
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+                chunk = batch.to_pandas()
+                if start is not None:
+                    chunk = chunk[chunk['Date'] >= start]
+                if not chunk.empty:
+                    yield to_typed(chunk.reset_index(drop=True), exchange)
+
+    def exists(self, exchange, ticker, timeframe):
+        return bool(self._partitions(exchange, ticker, timeframe))
+
+
+STORES = {
+    CsvStore.name: CsvStore,
+    ParquetStore.name: ParquetStore,
+}
+
+_store = None
+
+
+def get_store() -> BarStore:
+    """Return the configured storage backend (STORAGE_BACKEND, env overrides static)."""
+    global _store
+    if _store is None:
+        backend = get_settings().storage_backend
+        if backend not in STORES:
+            raise ValueError(f"Invalid storage backend: {backend}")
+        _store = STORES[backend]()
+    return _store
+
+
+def migrate_csv(target: BarStore, exchange: str | None = None, delete: bool = False) -> int:
+    """
+    Convert every stored <timeframe>.csv series into the target backend.
+    Only bar series are converted: features stay CSV on every backend (see
+    service.features).
+
+    Returns:
+        Number of series converted
+    """
+    converted = 0
+    exchange_dirs = [DATA_DIR / exchange.lower()] if exchange else sorted(DATA_DIR.glob("*"))
+
+    for exchange_dir in exchange_dirs:
+        if not exchange_dir.is_dir():
+            continue
+        paths = sorted(path for timeframe in TIMEFRAME_MAP for path in exchange_dir.glob(f"*/{timeframe}.csv"))
+        for path in paths:
+            ticker = path.parent.name
+            timeframe = path.stem
+            try:
+                data = pd.read_csv(path)
+                if data.empty:
+                    continue
+                target.write(exchange_dir.name.upper(), ticker, timeframe, data)
+            except Exception as e:
+                logger.error(f"Error migrating {path}: {e}")
+                continue
+
+            converted += 1
+            if delete:
+                path.unlink()
+                path.with_name(f"{timeframe}.index.npz").unlink(missing_ok=True)
+            logger.info(f"Migrated {exchange_dir.name.upper()} {ticker} {timeframe}")
+
+    return converted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the CSV bar tree to another storage backend")
+    parser.add_argument("command", choices=["migrate"])
+    parser.add_argument("--to", default="parquet", choices=[name for name in STORES if name != "csv"])
+    parser.add_argument("--exchange", default=None, help="Only migrate one exchange (e.g. NMS)")
+    parser.add_argument("--delete", action="store_true", help="Delete each CSV after converting it")
+    args = parser.parse_args()
+
+    count = migrate_csv(STORES[args.to](), args.exchange, args.delete)
+    logger.info(f"Migrated {count} series to {args.to}")
@@ -1,6 +1,10 @@
-from datetime import datetime, timedelta, time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 from zoneinfo import ZoneInfo
-from data.static.static import EXCHANGE_TIMEZONES, MARKET_HOURS
+import numpy as np
+import pandas as pd
+from service.bars import bar_date
+from data.static.static import EXCHANGE_TIMEZONES, MARKET_HOURS, EXCHANGE_HOLIDAYS, CALENDAR_START_YEAR, TIMEFRAME_DURATIONS
 
 
 def get_swedish_time() -> datetime:
@@ -14,44 +18,244 @@ def get_today_swedish_date() -> datetime:
     return swedish_now.replace(hour=0, minute=0, second=0, microsecond=0)
 
 
-def is_session_ended(exchange: str, check_date: datetime = None) -> bool:
+def _easter(year: int) -> date:
+    """Easter Sunday (Gregorian, anonymous algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """The n-th given weekday of a month (n=-1 for the last one)."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    last = next_month - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _holiday_dates(exchange: str, start_year: int, end_year: int) -> set[date]:
+    """Expand the EXCHANGE_HOLIDAYS rules of an exchange into weekday holiday dates."""
+    holidays = set()
+    rules = EXCHANGE_HOLIDAYS.get(exchange, [])
+
+    for year in range(start_year, end_year + 1):
+        for rule in rules:
+            kind = rule[0]
+            years = rule[-1] if isinstance(rule[-1], tuple) else None
+            if years is not None:
+                first_year, last_year = years
+                if (first_year and year < first_year) or (last_year and year > last_year):
+                    continue
+
+            if kind == "fixed":
+                day = date(year, rule[1], rule[2])
+                observance = rule[3]
+                if day.weekday() == 5:
+                    if observance == "us":
+                        # NYSE does not move New Year's Day back into the previous year
+                        if (day.month, day.day) == (1, 1):
+                            continue
+                        day -= timedelta(days=1)
+                    elif observance == "next":
+                        day += timedelta(days=2)
+                    else:
+                        continue
+                elif day.weekday() == 6:
+                    if observance in ("us", "next", "sunday"):
+                        day += timedelta(days=1)
+                    else:
+                        continue
+                if observance in ("next", "sunday"):
+                    while day in holidays or day.weekday() >= 5:
+                        day += timedelta(days=1)
+            elif kind == "easter":
+                day = _easter(year) + timedelta(days=rule[1])
+            elif kind == "weekday":
+                day = _nth_weekday(year, rule[1], rule[2], rule[3])
+            elif kind == "weekday_before":
+                limit = date(year, rule[1], rule[2])
+                day = limit - timedelta(days=(limit.weekday() - rule[3] - 1) % 7 + 1)
+            elif kind == "weekday_between":
+                first = date(year, rule[1], rule[2])
+                day = first + timedelta(days=(rule[4] - first.weekday()) % 7)
+            else:
+                raise ValueError(f"Unknown holiday rule: {rule}")
+
+            if day.weekday() < 5:
+                holidays.add(day)
+
+    return holidays
+
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _to_datetime64(day) -> np.datetime64:
+    """The calendar date of a date/datetime as datetime64[D]."""
+    if isinstance(day, np.datetime64):
+        return day.astype("datetime64[D]")
+    return np.datetime64(_day_number(day), "D")
+
+
+def _day_number(day) -> int:
+    """Days since the epoch of the calendar date of a date/datetime/datetime64."""
+    if isinstance(day, np.datetime64):
+        return int(day.astype("datetime64[D]").astype("int64"))
+    return day.toordinal() - _EPOCH_ORDINAL
+
+
+def _to_ns(moment: datetime) -> int:
+    """UTC epoch nanoseconds of a datetime (naive values are Swedish time)."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=ZoneInfo("Europe/Stockholm"))
+    return int(moment.timestamp()) * 1_000_000_000 + moment.microsecond * 1000
+
+
+def _week_number(days: np.ndarray) -> np.ndarray:
+    """Monday-based week number since the epoch (1970-01-01 was a Thursday)."""
+    return (days.astype("int64") + 3) // 7
+
+
+class SessionCalendar:
+    """
+    Precomputed trading sessions of one exchange: the session dates and
+    their DST-aware open/close instants (UTC epoch ns) as sorted arrays, so
+    lookups are binary searches instead of day-by-day loops.
+    """
+
+    def __init__(self, exchange: str, start_year: int, end_year: int):
+        if exchange not in MARKET_HOURS or exchange not in EXCHANGE_TIMEZONES:
+            raise ValueError(f"Unknown exchange: {exchange}")
+
+        self.exchange = exchange
+        self.timezone = EXCHANGE_TIMEZONES[exchange]
+        open_hour, open_minute, close_hour, close_minute, _ = MARKET_HOURS[exchange]
+
+        days = np.arange(np.datetime64(f"{start_year}-01-01"), np.datetime64(f"{end_year + 1}-01-01"), dtype="datetime64[D]")
+        holidays = np.array(sorted(_holiday_dates(exchange, start_year, end_year)), dtype="datetime64[D]")
+        weekdays = (days.astype("int64") + 3) % 7
+        self.days = days[(weekdays < 5) & ~np.isin(days, holidays)]
+        self.day_numbers = self.days.astype("int64")
+        self.holidays = holidays
+
+        local_midnight = pd.DatetimeIndex(self.days).as_unit("ns")
+        self.opens = (local_midnight + pd.Timedelta(hours=open_hour, minutes=open_minute)).tz_localize(self.timezone).asi8
+        self.closes = (local_midnight + pd.Timedelta(hours=close_hour, minutes=close_minute)).tz_localize(self.timezone).asi8
+
+    def _index(self, day) -> int | None:
+        day = _day_number(day)
+        i = int(self.day_numbers.searchsorted(day))
+        if i < len(self.day_numbers) and self.day_numbers[i] == day:
+            return i
+        return None
+
+    def _range(self, start, end) -> tuple[int, int]:
+        i = int(self.day_numbers.searchsorted(_day_number(start), side="left"))
+        j = int(self.day_numbers.searchsorted(_day_number(end), side="right"))
+        return i, j
+
+    def is_session(self, day) -> bool:
+        """Whether the exchange trades on this date."""
+        return self._index(day) is not None
+
+    def sessions_between(self, start, end) -> np.ndarray:
+        """Session dates between two dates (inclusive) as datetime64[D]."""
+        i, j = self._range(start, end)
+        return self.days[i:j]
+
+    def session_hours_between(self, start, end) -> tuple[np.ndarray, np.ndarray]:
+        """Open and close instants (UTC epoch ns) of the sessions between two dates (inclusive)."""
+        i, j = self._range(start, end)
+        return self.opens[i:j], self.closes[i:j]
+
+    def bar_starts(self, timeframe: str, start, end) -> np.ndarray:
+        """
+        Start instants (UTC epoch ns) of every bar Yahoo serves for the sessions
+        between two dates (inclusive): local midnight of each session for 1d,
+        the Monday of each week with a session for 1wk, and session-aligned
+        steps from the open for intraday timeframes.
+        """
+        days = self.sessions_between(start, end)
+        if timeframe in ("1d", "1wk"):
+            if timeframe == "1wk":
+                day_numbers = days.astype("int64")
+                days = np.unique(day_numbers - (day_numbers + 3) % 7).astype("datetime64[D]")
+            return pd.DatetimeIndex(days).as_unit("ns").tz_localize(self.timezone).asi8
+
+        opens, closes = self.session_hours_between(start, end)
+        length = TIMEFRAME_DURATIONS[timeframe] * 60 * 1_000_000_000
+        counts = -((opens - closes) // length)
+        offsets = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+        return np.repeat(opens, counts) + offsets * length
+
+    def closed_sessions_between(self, start, end, now: datetime) -> np.ndarray:
+        """Session dates between two dates (inclusive) whose session closed before now."""
+        i, j = self._range(start, end)
+        j = min(j, int(self.closes.searchsorted(_to_ns(now), side="right")))
+        return self.days[i:max(i, j)]
+
+    def is_session_closed(self, day, now: datetime) -> bool:
+        """Whether the session on this date has closed (False if the date is not a session)."""
+        i = self._index(day)
+        return i is not None and self.closes[i] <= _to_ns(now)
+
+    def last_closed_session(self, now: datetime) -> np.datetime64 | None:
+        i = int(self.closes.searchsorted(_to_ns(now), side="right"))
+        return self.days[i - 1] if i > 0 else None
+
+    def last_closed_week_end(self, now: datetime) -> np.datetime64 | None:
+        """Last session of the latest week whose sessions have all closed."""
+        i = int(self.closes.searchsorted(_to_ns(now), side="right"))
+        if i == 0:
+            return None
+        weeks = _week_number(self.day_numbers[i - 1:i + 1])
+        if len(weeks) == 2 and weeks[0] == weeks[1]:
+            # The week of the last closed session still has sessions to come
+            i = int(_week_number(self.day_numbers[:i]).searchsorted(weeks[0], side="left"))
+            if i == 0:
+                return None
+        return self.days[i - 1]
+
+
+@lru_cache(maxsize=None)
+def get_calendar(exchange: str) -> SessionCalendar:
+    """Session calendar of an exchange, built once per process."""
+    return SessionCalendar(exchange, CALENDAR_START_YEAR, date.today().year + 2)
+
+
+def _to_swedish_datetime(day: np.datetime64) -> datetime:
+    day = day.astype(date)
+    return datetime(day.year, day.month, day.day, tzinfo=ZoneInfo("Europe/Stockholm"))
+
+
+def is_session_ended(exchange: str, check_date: datetime = None, now: datetime = None) -> bool:
     """
     Check if the trading session has ended for a given exchange on a specific date.
     
     Args:
         exchange: Exchange code (e.g., "NMS", "NYQ")
         check_date: Date to check (defaults to today in Swedish timezone)
+        now: Current time (defaults to now in Swedish timezone)
     
     Returns:
-        True if session has ended, False otherwise
+        True if session has ended, False otherwise (also for holidays and weekends)
     """
+    if now is None:
+        now = get_swedish_time()
     if check_date is None:
-        check_date = get_swedish_time()
-    else:
-        # Ensure check_date is timezone-aware in Swedish time
-        if check_date.tzinfo is None:
-            check_date = check_date.replace(tzinfo=ZoneInfo("Europe/Stockholm"))
-    
-    if exchange not in MARKET_HOURS:
-        raise ValueError(f"Unknown exchange: {exchange}")
-    
-    # Get market hours: (open_hour, open_minute, close_hour, close_minute, offset_minutes)
-    _, _, close_hour, close_minute, offset_minutes = MARKET_HOURS[exchange]
-    
-    # Calculate market close time in Swedish timezone
-    # offset_minutes converts from exchange local time to Swedish time
-    # For US markets: close at 16:00 EST = 22:00 CET (16:00 + 6 hours = 22:00)
-    market_close_swedish = check_date.replace(hour=close_hour, minute=close_minute, second=0, microsecond=0)
-    market_close_swedish += timedelta(minutes=offset_minutes)
-    
-    # Check if current Swedish time is past the market close time
-    current_swedish = get_swedish_time()
-    
-    # Only check if it's a weekday (Monday=0, Sunday=6)
-    if current_swedish.weekday() >= 5:  # Saturday or Sunday
-        return False
-    
-    return current_swedish >= market_close_swedish
+        check_date = now
+
+    return get_calendar(exchange).is_session_closed(check_date, now)
 
 
 def is_weekday(date: datetime) -> bool:
@@ -59,30 +263,29 @@ def is_weekday(date: datetime) -> bool:
     return date.weekday() < 5
 
 
-def get_trading_days_between(start_date: datetime, end_date: datetime) -> list[datetime]:
+def get_trading_days_between(start_date: datetime, end_date: datetime, exchange: str = None) -> list[datetime]:
     """
-    Get list of trading days (weekdays) between two dates (inclusive).
+    Get list of trading days between two dates (inclusive).
     
     Args:
         start_date: Start date (inclusive)
         end_date: End date (inclusive)
+        exchange: Exchange code, to skip its holidays (weekdays only if not given)
     
     Returns:
         List of trading day datetimes
     """
     if start_date > end_date:
         return []
-    
-    trading_days = []
-    current = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
-    end = end_date.replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    while current <= end:
-        if is_weekday(current):
-            trading_days.append(current)
-        current += timedelta(days=1)
-    
-    return trading_days
+
+    if exchange is not None:
+        days = get_calendar(exchange).sessions_between(start_date, end_date)
+    else:
+        days = np.arange(_to_datetime64(start_date), _to_datetime64(end_date) + 1, dtype="datetime64[D]")
+        days = days[(days.astype("int64") + 3) % 7 < 5]
+
+    start = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    return [start + timedelta(days=int(offset)) for offset in (days - _to_datetime64(start_date)).astype("int64")]
 
 
 def get_last_friday_of_week(date: datetime) -> datetime:
@@ -94,124 +297,96 @@ def get_last_friday_of_week(date: datetime) -> datetime:
     return friday.replace(hour=0, minute=0, second=0, microsecond=0)
 
 
-def is_week_fully_closed(exchange: str, week_end_date: datetime = None) -> bool:
+def is_week_fully_closed(exchange: str, week_end_date: datetime = None, now: datetime = None) -> bool:
     """
-    Check if a trading week has fully closed.
-    A week is considered closed if:
-    1. It's Monday (or later) in Swedish time
-    2. The previous Friday's session has ended
+    Check if a trading week has fully closed, i.e. its last session has ended.
     
     Args:
         exchange: Exchange code
-        week_end_date: The Friday date to check (defaults to last Friday)
+        week_end_date: A date in the week to check (defaults to the current week)
+        now: Current time (defaults to now in Swedish timezone)
     
     Returns:
         True if the week is fully closed, False otherwise
     """
-    swedish_now = get_swedish_time()
-    
-    # If today is Monday or later, check if last Friday's session ended
+    if now is None:
+        now = get_swedish_time()
     if week_end_date is None:
-        if swedish_now.weekday() == 0:  # Monday
-            # Check last Friday (3 days ago)
-            last_friday = swedish_now - timedelta(days=3)
-        elif swedish_now.weekday() >= 1:  # Tuesday onwards
-            # Check if we're past Monday, so last Friday was definitely closed
-            # But still verify the session ended
-            days_since_friday = (swedish_now.weekday() + 3) % 7
-            if days_since_friday == 0:
-                days_since_friday = 7
-            last_friday = swedish_now - timedelta(days=days_since_friday)
-        else:  # Sunday
-            return False  # Week hasn't started yet
-        week_end_date = last_friday
-    else:
-        week_end_date = week_end_date.replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    # Check if that Friday's session has ended
-    return is_session_ended(exchange, week_end_date)
+        week_end_date = now
+
+    week_end = get_calendar(exchange).last_closed_week_end(now)
+    if week_end is None:
+        return False
+    return _week_number(np.array([_to_datetime64(week_end_date)]))[0] <= _week_number(np.array([week_end]))[0]
+
+
+def _pending_sessions(
+    exchange: str,
+    last_update_date: str,
+    timeframe: str,
+    today_date: datetime = None,
+    now: datetime = None,
+) -> np.ndarray:
+    """Closed session dates (datetime64[D]) after the last update, see get_dates_to_update."""
+    if now is None:
+        now = get_swedish_time()
+    if today_date is None:
+        today_date = now
+
+    try:
+        last_day = _to_datetime64(bar_date(last_update_date))
+    except (ValueError, TypeError):
+        return np.array([], dtype="datetime64[D]")
+
+    calendar = get_calendar(exchange)
+
+    if timeframe == "1wk":
+        # Only update once the last session of a newer week has closed
+        week_end = calendar.last_closed_week_end(now)
+        if week_end is not None and last_day < week_end:
+            return np.array([week_end], dtype="datetime64[D]")
+        return np.array([], dtype="datetime64[D]")
+
+    # For other timeframes (1m, 5m, 15m, 1h, 1d): closed sessions after the
+    # last update date (we already have that day's data)
+    sessions = calendar.closed_sessions_between(last_day, today_date, now)
+    if len(sessions) and sessions[0] == last_day:
+        sessions = sessions[1:]
+    return sessions
 
 
 def get_dates_to_update(
     exchange: str,
     last_update_date: str,
     timeframe: str,
-    today_date: datetime = None
+    today_date: datetime = None,
+    now: datetime = None,
 ) -> list[datetime]:
     """
     Get list of dates that need to be updated for a given timeframe.
-    Only returns dates for sessions that have definitely ended.
+    Only returns dates for sessions that have definitely ended; exchange
+    holidays are skipped.
     
     Args:
         exchange: Exchange code
         last_update_date: Last update date as string (from last_update.json)
         timeframe: Timeframe code (e.g., "1d", "1wk")
         today_date: Today's date in Swedish timezone (defaults to current)
+        now: Current time (defaults to now in Swedish timezone)
     
     Returns:
         List of dates that need updating (empty if nothing to update)
     """
-    if today_date is None:
-        today_date = get_today_swedish_date()
-    
-    # Parse last_update_date string to datetime
-    try:
-        # Try parsing as ISO format datetime
-        last_update = datetime.fromisoformat(last_update_date.replace('Z', '+00:00'))
-    except (ValueError, AttributeError):
-        try:
-            # Try parsing as date only
-            last_update = datetime.strptime(last_update_date, '%Y-%m-%d')
-        except ValueError:
-            return []
-    
-    # Ensure timezone-aware
-    if last_update.tzinfo is None:
-        last_update = last_update.replace(tzinfo=ZoneInfo("Europe/Stockholm"))
-    
-    # Ensure today_date is timezone-aware
-    if today_date.tzinfo is None:
-        today_date = today_date.replace(tzinfo=ZoneInfo("Europe/Stockholm"))
-    
-    if timeframe == "1wk":
-        # Special handling for weekly timeframe
-        if not is_week_fully_closed(exchange):
-            return []
-        
-        # Get the last complete week's Friday
-        last_friday = get_last_friday_of_week(today_date - timedelta(days=7))
-        
-        # Only update if last_update is before last Friday
-        if last_update.date() < last_friday.date():
-            return [last_friday]
-        return []
-    
-    else:
-        # For other timeframes (1m, 5m, 15m, 1h, 1d)
-        # Get all trading days between last_update and today
-        trading_days = get_trading_days_between(last_update, today_date)
-        
-        # Filter out today if today's session hasn't ended
-        dates_to_update = []
-        for day in trading_days:
-            # Skip today if session hasn't ended
-            if day.date() == today_date.date():
-                if not is_session_ended(exchange, day):
-                    continue
-            dates_to_update.append(day)
-        
-        # Remove last_update date itself (we already have that data)
-        if dates_to_update and dates_to_update[0].date() == last_update.date():
-            dates_to_update.pop(0)
-        
-        return dates_to_update
+    sessions = _pending_sessions(exchange, last_update_date, timeframe, today_date, now)
+    return [_to_swedish_datetime(day) for day in sessions]
 
 
 def should_update_timeframe(
     exchange: str,
     timeframe: str,
     last_update_dict: dict,
-    today_date: datetime = None
+    today_date: datetime = None,
+    now: datetime = None,
 ) -> bool:
     """
     Quick check if a timeframe needs updating based on last_update.json.
@@ -221,18 +396,20 @@ def should_update_timeframe(
         timeframe: Timeframe code
         last_update_dict: Dictionary from last_update.json
         today_date: Today's date (defaults to current)
+        now: Current time, pass it in when checking many series (defaults to now)
     
     Returns:
         True if timeframe needs updating, False otherwise
     """
     if timeframe not in last_update_dict:
         return True  # Never updated before
-    
-    dates_to_update = get_dates_to_update(
+
+    sessions = _pending_sessions(
         exchange,
         last_update_dict[timeframe],
         timeframe,
-        today_date
+        today_date,
+        now,
     )
-    
-    return len(dates_to_update) > 0
+
+    return len(sessions) > 0
@@ -0,0 +1,337 @@
+import json
+import time
+import sqlite3
+import argparse
+from contextlib import closing
+from itertools import groupby
+from pathlib import Path
+from threading import Lock
+from typing import Iterable, Iterator
+from loguru import logger
+
+from service.settings import get_settings
+
+from data.static.static import EXCHANGE_TIMEZONES
+
+# Seed files, imported into the registry the first time a universe is used
+TICKERS_DIR = Path(__file__).parent.parent / "data" / "tickers"
+UNIVERSE_PATH = get_settings().data_dir / "universes.sqlite"
+
+# Members streamed per database round trip
+ITER_BATCH_SIZE = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS universes (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    source TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+    universe TEXT NOT NULL,
+    exchange TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    added_version INTEGER NOT NULL,
+    PRIMARY KEY (universe, exchange, symbol)
+);
+CREATE INDEX IF NOT EXISTS members_symbol ON members (symbol, exchange);
+CREATE TABLE IF NOT EXISTS deltas (
+    universe TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    op TEXT NOT NULL,
+    exchange TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deltas_version ON deltas (universe, version);
+"""
+
+
+def _member(exchange: str, symbol: str) -> tuple[str, str]:
+    """Normalize an (exchange, symbol) pair, raising ValueError for an unknown exchange."""
+    exchange, symbol = exchange.upper(), symbol.strip().upper()
+    if exchange not in EXCHANGE_TIMEZONES:
+        raise ValueError(f"Unknown exchange: {exchange}")
+    if not symbol:
+        raise ValueError("Empty symbol")
+    return exchange, symbol
+
+
+def read_seed(path: Path) -> tuple[dict, list[tuple[str, str]]]:
+    """
+    Read a seed file: a JSON object with "tickers" and a default "exchange".
+    Each ticker is a symbol on the default exchange or a
+    {"symbol", "exchange"} object for a symbol listed elsewhere.
+
+    Returns:
+        (the other top level fields, such as universe/version/created_at, list of (exchange, symbol))
+    """
+    with open(path, "r") as f:
+        data = json.load(f)
+
+    default = data.get("exchange")
+    members = []
+    for entry in data.get("tickers", []):
+        if isinstance(entry, str):
+            if default is None:
+                raise ValueError(f"{path.name}: {entry} has no exchange and the file sets no default")
+            members.append(_member(default, entry))
+        else:
+            members.append(_member(entry.get("exchange", default), entry["symbol"]))
+    header = {key: value for key, value in data.items() if key != "tickers"}
+    return header, members
+
+
+class UniverseRegistry:
+    """
+    Universes of (exchange, symbol) members in one SQLite file, so a single
+    universe can span several exchanges and hold tens of thousands of symbols.
+
+    Every change is an add/remove delta under a new universe version, applied
+    to the member table in place (nothing is rewritten). Members are indexed
+    by universe, exchange and symbol, and are streamed in exchange order, so
+    a run handles one exchange at a time without loading the whole universe.
+
+    A universe used for the first time is imported from its seed file
+    (data/tickers/<universe>_tickers.json) as version 1. After that the
+    registry is the source of truth and the seed file is no longer read.
+    """
+
+    def __init__(self, path: Path = UNIVERSE_PATH, seeds_dir: Path = TICKERS_DIR):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.seeds_dir = seeds_dir
+        self._lock = Lock()
+        # Other processes sharing the file may hold the write lock for a while
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def _version(self, universe: str) -> int | None:
+        row = self._conn.execute("SELECT version FROM universes WHERE name = ?", (universe,)).fetchone()
+        return row["version"] if row else None
+
+    def _apply(self, universe: str, add: list[tuple[str, str]], remove: list[tuple[str, str]], source: dict | None = None) -> int:
+        """Record one delta and apply it to the members. Call with the lock held, inside a transaction."""
+        current = self._version(universe)
+        version = (current or 0) + 1
+        now = time.time()
+
+        added = [
+            member for member in dict.fromkeys(add)
+            if not self._conn.execute(
+                "SELECT 1 FROM members WHERE universe = ? AND exchange = ? AND symbol = ?", (universe, *member)
+            ).fetchone()
+        ]
+        adding = set(added)
+        removed = [
+            member for member in dict.fromkeys(remove)
+            if member not in adding and self._conn.execute(
+                "SELECT 1 FROM members WHERE universe = ? AND exchange = ? AND symbol = ?", (universe, *member)
+            ).fetchone()
+        ]
+        if current is not None and not added and not removed:
+            return current
+
+        self._conn.executemany(
+            "INSERT INTO members (universe, exchange, symbol, added_version) VALUES (?, ?, ?, ?)",
+            [(universe, exchange, symbol, version) for exchange, symbol in added],
+        )
+        self._conn.executemany(
+            "DELETE FROM members WHERE universe = ? AND exchange = ? AND symbol = ?",
+            [(universe, exchange, symbol) for exchange, symbol in removed],
+        )
+        self._conn.executemany(
+            "INSERT INTO deltas (universe, version, op, exchange, symbol, at) VALUES (?, ?, ?, ?, ?, ?)",
+            [(universe, version, "add", exchange, symbol, now) for exchange, symbol in added]
+            + [(universe, version, "remove", exchange, symbol, now) for exchange, symbol in removed],
+        )
+        self._conn.execute(
+            """
+            INSERT INTO universes (name, version, source, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (name) DO UPDATE SET version = excluded.version, updated_at = excluded.updated_at
+            """,
+            (universe, version, json.dumps(source) if source is not None else None, now),
+        )
+        return version
+
+    def _ensure(self, universe: str) -> int:
+        """The version of a universe, importing its seed file on first use. Raises ValueError if there is neither."""
+        with self._lock:
+            version = self._version(universe)
+        if version is not None:
+            return version
+
+        path = self.seeds_dir / f"{universe}_tickers.json"
+        if not path.exists():
+            raise ValueError(f"Invalid universe: {universe}")
+        header, members = read_seed(path)
+        with self._lock, self._conn:
+            # Another thread or process may have imported it meanwhile
+            version = self._version(universe)
+            if version is None:
+                version = self._apply(universe, members, [], {"file": path.name, **header})
+                logger.info(f"Imported {len(set(members))} symbols of {universe} from {path.name}")
+        return version
+
+    def names(self) -> list[str]:
+        """Registered universes and the seed files not imported yet."""
+        with self._lock:
+            registered = [row["name"] for row in self._conn.execute("SELECT name FROM universes")]
+        seeds = [path.name.removesuffix("_tickers.json") for path in self.seeds_dir.glob("*_tickers.json")]
+        return sorted(set(registered) | set(seeds))
+
+    def version(self, universe: str) -> int:
+        return self._ensure(universe)
+
+    def apply(self, universe: str, add: Iterable[tuple[str, str]] = (), remove: Iterable[tuple[str, str]] = ()) -> int:
+        """
+        Add and remove (exchange, symbol) members as one new version of a
+        universe, creating it if it does not exist. Adding a member twice or
+        removing one that is not there changes nothing.
+
+        Returns:
+            The universe version after the change
+        """
+        add = [_member(*member) for member in add]
+        remove = [_member(*member) for member in remove]
+        try:
+            self._ensure(universe)
+        except ValueError:
+            pass
+        with self._lock, self._conn:
+            return self._apply(universe, add, remove)
+
+    def changes(self, universe: str, since_version: int = 0) -> list[dict]:
+        """The deltas after since_version, oldest first: {"version", "op", "exchange", "symbol", "at"}."""
+        self._ensure(universe)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT version, op, exchange, symbol, at FROM deltas WHERE universe = ? AND version > ? ORDER BY version, rowid",
+                (universe, since_version),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def contains(self, universe: str, exchange: str, symbol: str) -> bool:
+        self._ensure(universe)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM members WHERE universe = ? AND exchange = ? AND symbol = ?",
+                (universe, exchange.upper(), symbol.upper()),
+            ).fetchone()
+        return row is not None
+
+    def lookup(self, symbol: str, exchange: str | None = None) -> list[tuple[str, str]]:
+        """The (universe, exchange) pairs a symbol is a member of, optionally on one exchange."""
+        sql = "SELECT universe, exchange FROM members WHERE symbol = ?"
+        params = [symbol.upper()]
+        if exchange is not None:
+            sql += " AND exchange = ?"
+            params.append(exchange.upper())
+        with self._lock:
+            return [(row["universe"], row["exchange"]) for row in self._conn.execute(sql + " ORDER BY universe, exchange", params)]
+
+    def exchanges(self, universe: str) -> dict[str, int]:
+        """Member count per exchange of a universe."""
+        self._ensure(universe)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT exchange, COUNT(*) AS members FROM members WHERE universe = ? GROUP BY exchange ORDER BY exchange",
+                (universe,),
+            ).fetchall()
+        return {row["exchange"]: row["members"] for row in rows}
+
+    def iter_members(self, universe: str, exchange: str | None = None, batch_size: int = ITER_BATCH_SIZE) -> Iterator[tuple[str, str]]:
+        """
+        Stream the (exchange, symbol) members of a universe ordered by
+        exchange and symbol, batch_size rows per round trip. Uses its own
+        connection, so other registry calls are not blocked meanwhile (and
+        the consumer may resume it from another thread).
+        """
+        self._ensure(universe)
+        sql = "SELECT exchange, symbol FROM members WHERE universe = ?"
+        params = [universe]
+        if exchange is not None:
+            sql += " AND exchange = ?"
+            params.append(exchange.upper())
+
+        with closing(sqlite3.connect(self.path, timeout=30, check_same_thread=False)) as conn:
+            cursor = conn.execute(sql + " ORDER BY exchange, symbol", params)
+            while rows := cursor.fetchmany(batch_size):
+                yield from rows
+
+    def groups(self, universe: str) -> Iterator[tuple[str, list[str]]]:
+        """Stream a universe as (exchange, symbols) groups, one exchange at a time."""
+        for exchange, members in groupby(self.iter_members(universe), key=lambda member: member[0]):
+            yield exchange, [symbol for _, symbol in members]
+
+
+_registry = None
+_registry_lock = Lock()
+
+
+def get_registry() -> UniverseRegistry:
+    """Return the shared universe registry, opening it on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = UniverseRegistry()
+        return _registry
+
+
+def universe_groups(universe: str, symbols: dict[str, list[str]] | None = None) -> Iterator[tuple[str, list[str]]]:
+    """
+    (exchange, tickers) groups to process: the given symbols (exchange ->
+    tickers) or else the members of the universe from the registry.
+    """
+    if symbols is not None:
+        yield from symbols.items()
+    else:
+        yield from get_registry().groups(universe)
+
+
+def _parse_members(values: list[str], exchange: str | None) -> list[tuple[str, str]]:
+    """EXCHANGE:SYMBOL values, or plain symbols on the --exchange default."""
+    members = []
+    for value in values:
+        if ":" in value:
+            members.append(tuple(value.split(":", 1)))
+        elif exchange is not None:
+            members.append((exchange, value))
+        else:
+            raise ValueError(f"{value} has no exchange (use EXCHANGE:SYMBOL or --exchange)")
+    return members
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the universe registry")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("add", "remove"):
+        command = commands.add_parser(name, help=f"{name.capitalize()} symbols as a new universe version")
+        command.add_argument("universe")
+        command.add_argument("symbols", nargs="+", help="EXCHANGE:SYMBOL, or SYMBOL with --exchange")
+        command.add_argument("--exchange", default=None, help="Exchange of symbols given without one")
+
+    show = commands.add_parser("show", help="Version and members per exchange (all universes without a name)")
+    show.add_argument("universe", nargs="?")
+
+    changes = commands.add_parser("changes", help="Deltas after a version")
+    changes.add_argument("universe")
+    changes.add_argument("--since", type=int, default=0)
+
+    args = parser.parse_args()
+    registry = get_registry()
+
+    if args.command in ("add", "remove"):
+        members = _parse_members(args.symbols, args.exchange)
+        version = registry.apply(args.universe, **{args.command: members})
+        logger.info(f"{args.universe} is at version {version}")
+    elif args.command == "show":
+        for universe in [args.universe] if args.universe else registry.names():
+            print(f"{universe} v{registry.version(universe)}: {registry.exchanges(universe)}")
+    elif args.command == "changes":
+        for change in registry.changes(args.universe, args.since):
+            print(f"v{change['version']} {change['op']} {change['exchange']}:{change['symbol']}")
@@ -1,60 +1,366 @@
-import yfinance as yf
+import sys
+import time
+import random
 import pandas as pd
-from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from threading import Event, Lock
 from loguru import logger
 
-from data.static.static import TIMEFRAME_MAP
+from data.static.static import (
+    TIMEFRAME_MAP,
+    TIMEFRAME_LIMITS,
+    YF_BATCH_SIZE,
+    YF_BURST,
+    YF_MAX_RETRIES,
+    YF_BACKOFF_BASE,
+    YF_BACKOFF_MAX,
+    YF_BREAKER_WINDOW,
+    YF_BREAKER_THRESHOLD,
+    YF_BREAKER_COOLDOWN,
+    YF_RETRY_ROUNDS,
+)
 from service.time import get_today_swedish_date
+from service.metrics import timed, ERRORS, RETRIES, BREAKER_OPENS, PROVIDER_CALLS, SERIES_REQUESTS
+from service.provider import Provider, SyntheticProvider, RetryableError
+from service.bars import bar_date
+from service.settings import get_settings
 
 
-def _parse_date_string(date_str: str) -> str:
+def _is_retryable(error: Exception) -> bool:
+    """Whether an error is throttling (429) or a 5xx server error."""
+    if isinstance(error, RetryableError):
+        return True
+    # yfinance is only imported by YahooProvider, so its errors cannot exist before that
+    yf_exceptions = sys.modules.get("yfinance.exceptions")
+    if yf_exceptions is not None and isinstance(error, yf_exceptions.YFRateLimitError):
+        return True
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    message = str(error)
+    return "429" in message or "Too Many Requests" in message or "Rate limited" in message
+
+
+class TokenBucket:
+    """Token bucket shared by all threads: rate tokens per second, up to burst saved up."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
     """
-    Parse a date/datetime string and return just the date part in YYYY-MM-DD format.
-    Handles various formats including datetime strings with timezone info.
+    Opens when the error rate over the last window calls reaches threshold,
+    which pauses every caller for cooldown seconds.
     """
-    if not date_str:
-        return None
-    
-    # Try parsing as ISO format datetime
-    try:
-        dt = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-        return dt.strftime('%Y-%m-%d')
-    except (ValueError, AttributeError):
-        pass
-    
-    # Try parsing as date only (YYYY-MM-DD)
-    try:
-        dt = datetime.strptime(date_str.split()[0], '%Y-%m-%d')
-        return dt.strftime('%Y-%m-%d')
-    except (ValueError, IndexError):
-        pass
-    
-    # Return first 10 characters if it looks like a date
-    if len(date_str) >= 10:
-        return date_str[:10]
-    
-    return date_str
+
+    def __init__(self, window: int, threshold: float, cooldown: float):
+        self.window = window
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._outcomes = deque(maxlen=window)
+        self._open_until = 0.0
+        self._lock = Lock()
+
+    def wait(self) -> None:
+        while True:
+            with self._lock:
+                remaining = self._open_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            self._outcomes.append(ok)
+            if len(self._outcomes) < self.window:
+                return
+            error_rate = self._outcomes.count(False) / len(self._outcomes)
+            if error_rate >= self.threshold:
+                self._open_until = time.monotonic() + self.cooldown
+                self._outcomes.clear()
+                BREAKER_OPENS.inc()
+                logger.warning(f"Yahoo error rate {error_rate:.0%}, pausing requests for {self.cooldown}s")
+
+
+class RequestGovernor:
+    """
+    Every Yahoo request goes through one governor: a shared rate limit, a
+    circuit breaker, and jittered exponential backoff on throttling and
+    server errors.
+    """
+
+    def __init__(self):
+        self.bucket = TokenBucket(get_settings().yf_rate_limit, YF_BURST)
+        self.breaker = CircuitBreaker(YF_BREAKER_WINDOW, YF_BREAKER_THRESHOLD, YF_BREAKER_COOLDOWN)
+
+    def call(self, fn, *args, timeframe: str = "", **kwargs):
+        """Call fn through the governor. timeframe only labels the retry metrics."""
+        attempt = 0
+        while True:
+            self.breaker.wait()
+            self.bucket.acquire()
+            PROVIDER_CALLS.inc(getattr(fn, "__name__", "call"), timeframe)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not _is_retryable(e):
+                    raise
+                self.breaker.record(False)
+                if attempt >= YF_MAX_RETRIES:
+                    raise
+                delay = min(YF_BACKOFF_MAX, YF_BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+                attempt += 1
+                RETRIES.inc(timeframe)
+                logger.warning(f"Yahoo request failed ({e}), retry {attempt}/{YF_MAX_RETRIES} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            self.breaker.record(True)
+            return result
+
+
+governor = RequestGovernor()
+
+
+class _Flight:
+    """One provider request for a window of a series, and its result once it is done."""
+
+    __slots__ = ("start", "end", "done", "frame", "error", "finished_at")
+
+    def __init__(self, start: str | None, end: str | None):
+        self.start = start
+        self.end = end
+        self.done = Event()
+        self.frame = None
+        self.error = None
+        self.finished_at = None
+
+    def covers(self, start: str | None, end: str | None) -> bool:
+        """Whether the [start, end) window of this request contains [start, end) (None is open ended)."""
+        if self.start is not None and (start is None or start < self.start):
+            return False
+        if self.end is not None and (end is None or end > self.end):
+            return False
+        return True
+
+
+class SeriesFlights:
+    """
+    Single-flight layer in front of the provider. A caller asking for a
+    window of a (ticker, timeframe) series that an in-flight request already
+    covers waits for that request instead of sending its own, and results
+    stay cached for ttl seconds to absorb bursts. Empty and failed results
+    are never cached, so retry rounds still reach the provider.
+
+    Callers claim the windows they need, fetch the ones they own and settle
+    them, and only then wait for the shared ones, so no caller ever waits
+    while holding an unsettled request.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        # (ticker, timeframe, period) -> requests in flight or cached
+        self._flights: dict[tuple[str, str, str], list[_Flight]] = {}
+        self._lock = Lock()
+        self._purged_at = 0.0
+
+    def _purge(self, now: float) -> None:
+        if now - self._purged_at < max(self.ttl, 1.0):
+            return
+        self._purged_at = now
+        for key in list(self._flights):
+            alive = [flight for flight in self._flights[key] if flight.finished_at is None or now - flight.finished_at < self.ttl]
+            if alive:
+                self._flights[key] = alive
+            else:
+                del self._flights[key]
+
+    def claim(self, tickers: list[str], timeframe: str, start: str | None, end: str | None, period: str = "max") -> tuple[dict[str, _Flight], dict[str, _Flight]]:
+        """
+        Claim the [start, end) window of each ticker.
+
+        Returns:
+            (ticker -> request the caller must send and settle, ticker -> in-flight or cached request to wait for)
+        """
+        owned, shared = {}, {}
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            for ticker in tickers:
+                flights = self._flights.setdefault((ticker, timeframe, period), [])
+                for flight in flights:
+                    fresh = flight.finished_at is None or now - flight.finished_at < self.ttl
+                    if fresh and flight.covers(start, end):
+                        shared[ticker] = flight
+                        SERIES_REQUESTS.inc("cache" if flight.done.is_set() else "inflight", timeframe)
+                        break
+                else:
+                    flight = _Flight(start, end)
+                    flights.append(flight)
+                    owned[ticker] = flight
+                    SERIES_REQUESTS.inc("provider", timeframe)
+        return owned, shared
+
+    def settle(self, owned: dict[str, _Flight], timeframe: str, period: str = "max", frames: dict[str, pd.DataFrame] | None = None, error: Exception | None = None) -> None:
+        """Publish the result of the owned requests to their waiters and cache the ones with data."""
+        now = time.monotonic()
+        with self._lock:
+            for ticker, flight in owned.items():
+                frame = (frames or {}).get(ticker)
+                flight.error = error
+                flight.frame = frame
+                flight.finished_at = now
+                if error is not None or frame is None or frame.empty or self.ttl <= 0:
+                    flights = self._flights.get((ticker, timeframe, period), [])
+                    if flight in flights:
+                        flights.remove(flight)
+                flight.done.set()
+
+    @staticmethod
+    def wait(flight: _Flight, start: str | None, end: str | None) -> pd.DataFrame | None:
+        """The rows of a shared request within [start, end), or None if it returned no data. Re-raises its error."""
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        frame = flight.frame
+        if frame is None or frame.empty:
+            return None
+        if (flight.start, flight.end) == (start, end) or (start is None and end is None):
+            return frame.copy()
+
+        dates = frame['Date']
+        if isinstance(dates.dtype, pd.DatetimeTZDtype):
+            dates = dates.dt.tz_localize(None)
+        days = pd.to_datetime(dates).dt.normalize()
+        mask = pd.Series(True, index=frame.index)
+        if start is not None:
+            mask &= days >= pd.Timestamp(start)
+        if end is not None:
+            mask &= days < pd.Timestamp(end)
+        frame = frame[mask].reset_index(drop=True)
+        return frame if not frame.empty else None
+
+
+flights = SeriesFlights(get_settings().yf_response_ttl)
+
+
+def _normalize_history(hist: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalize a yfinance history frame: move the index into a 'Date' column
+    and drop the corporate action columns we do not store.
+    """
+    hist = hist.reset_index()
+
+    if 'Datetime' in hist.columns:
+        hist.rename(columns={'Datetime': 'Date'}, inplace=True)
+    elif 'Date' not in hist.columns and len(hist.columns) > 0:
+        # If the first column is the date column but not named, rename it
+        hist.rename(columns={hist.columns[0]: 'Date'}, inplace=True)
+
+    hist.columns.name = None
+    hist = hist.drop(columns=['Dividends', 'Stock Splits'], errors='ignore')
+
+    return hist
+
+def plan_ranges(timeframe: str, from_date: str | None = None, to_date: str | None = None) -> list[tuple[str | None, str | None]]:
+    """
+    Split the range to fetch for a timeframe into windows Yahoo will serve.
+
+    The start is clamped to the timeframe's maximum lookback and the range
+    is cut into windows of at most the per-request size (TIMEFRAME_LIMITS).
+    Without from_date the whole available history is planned. Dates are
+    YYYY-MM-DD strings, the end of each window is exclusive and defaults to
+    tomorrow so today's closed session is included.
+
+    Returns:
+        List of (start, end) windows; [(None, None)] means "period=max" in one request
+    """
+    lookback, window = TIMEFRAME_LIMITS.get(timeframe, (None, None))
+    if from_date is None and lookback is None:
+        return [(None, None)]
+
+    today = get_today_swedish_date().date()
+    end = bar_date(to_date) if to_date else today + timedelta(days=1)
+
+    start = bar_date(from_date) if from_date else None
+    if lookback is not None:
+        earliest = today - timedelta(days=lookback - 1)
+        start = earliest if start is None else max(start, earliest)
+
+    if start >= end:
+        return []
+    if window is None:
+        return [(start.isoformat(), end.isoformat())]
+
+    ranges = []
+    while start < end:
+        window_end = min(end, start + timedelta(days=window))
+        ranges.append((start.isoformat(), window_end.isoformat()))
+        start = window_end
+    return ranges
+
+
+def _stitch(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate frames fetched for adjacent windows into one sorted frame."""
+    frames = [frame for frame in frames if frame is not None and not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+    hist = pd.concat(frames, ignore_index=True)
+    return hist.drop_duplicates(subset=['Date'], keep='last').sort_values('Date').reset_index(drop=True)
+
+
+def _fetch_ticker_ranges(ticker: str, timeframe: str, ranges: list[tuple[str | None, str | None]], period: str = "max") -> pd.DataFrame:
+    """Fetch the planned windows of one ticker in parallel and stitch them."""
+    provider = get_provider()
+
+    def fetch(start: str | None, end: str | None) -> pd.DataFrame:
+        owned, shared = flights.claim([ticker], timeframe, start, end, period)
+        if shared:
+            hist = flights.wait(shared[ticker], start, end)
+            return hist if hist is not None else pd.DataFrame()
+        try:
+            hist = governor.call(provider.history, ticker, timeframe, start, end, period, timeframe=timeframe)
+        except Exception as e:
+            flights.settle(owned, timeframe, period, error=e)
+            raise
+        flights.settle(owned, timeframe, period, {ticker: hist})
+        return hist
+
+    if len(ranges) == 1:
+        return fetch(*ranges[0])
+    with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+        return _stitch(list(executor.map(lambda window: fetch(*window), ranges)))
+
 
 def get_data(ticker: str, timeframe: str = "1d", period: str = "max") -> pd.DataFrame | None:
     try:
 
-        yf_ticker = yf.Ticker(ticker)
-        yf_timeframe = TIMEFRAME_MAP.get(timeframe, "1d")
-
-        hist = yf_ticker.history(period=period, interval=yf_timeframe)
-        hist.reset_index(inplace=True)
+        hist = _fetch_ticker_ranges(ticker, timeframe, plan_ranges(timeframe), period)
 
         if hist.empty:
             raise ValueError("No data found for the given dates")
 
-        if 'Datetime' in hist.columns:
-            hist.rename(columns={'Datetime': 'Date'}, inplace=True)
-        elif 'Date' not in hist.columns and len(hist.columns) > 0:
-            # If the first column is the date column but not named, rename it
-            hist.rename(columns={hist.columns[0]: 'Date'}, inplace=True)
-
-        hist = hist.drop(columns=['Dividends', 'Stock Splits'], errors='ignore')
-
         return hist
 
     except Exception as e:
@@ -63,36 +369,18 @@ def get_data(ticker: str, timeframe: str = "1d", period: str = "max") -> pd.Data
 
 def update_data(ticker: str, timeframe: str = "1d", from_date: str = None, to_date: str = None) -> None:
     try:
-        # TODO: If dates is within weekend, adjust to nearest weekday
-        if to_date is None:
-            today = get_today_swedish_date()
-            to_date = today.strftime('%Y-%m-%d')
-        else:
-            # Parse to_date to extract just the date part
-            to_date = _parse_date_string(to_date)
-        
         if from_date is None:
             raise ValueError("from_date is required")
-        
-        # Parse from_date to extract just the date part
-        from_date = _parse_date_string(from_date)
 
-        yf_ticker = yf.Ticker(ticker)
-        yf_timeframe = TIMEFRAME_MAP.get(timeframe, "1d")
-        hist = yf_ticker.history(start=from_date, end=to_date, interval=yf_timeframe)
-        hist.reset_index(inplace=True)
+        # Windows within the timeframe's lookback limit, fetched in parallel
+        ranges = plan_ranges(timeframe, from_date, to_date)
+        if not ranges:
+            raise ValueError("No data found for the given dates")
+        hist = _fetch_ticker_ranges(ticker, timeframe, ranges)
 
         if hist.empty:
             raise ValueError("No data found for the given dates")
 
-        if 'Datetime' in hist.columns:
-            hist.rename(columns={'Datetime': 'Date'}, inplace=True)
-        elif 'Date' not in hist.columns and len(hist.columns) > 0:
-            # If the first column is the date column but not named, rename it
-            hist.rename(columns={hist.columns[0]: 'Date'}, inplace=True)
-
-        hist = hist.drop(columns=['Dividends', 'Stock Splits'], errors='ignore')
-
         return hist
 
     except Exception as e:
@@ -101,9 +389,242 @@ def update_data(ticker: str, timeframe: str = "1d", from_date: str = None, to_da
 
 def get_meta(ticker: str) -> dict | None:
     try:
-        yf_ticker = yf.Ticker(ticker)
-        info = yf_ticker.info
+        info = governor.call(get_provider().info, ticker)
         return info
     except Exception as e:
         logger.error(f"Error getting metadata for {ticker}: {e}")
         return None
+
+
+def _split_batch(hist: pd.DataFrame, tickers: list[str]) -> dict[str, pd.DataFrame]:
+    """
+    Split a multi-ticker yf.download frame (grouped by ticker) into
+    per-ticker frames with the same columns as get_data/update_data.
+    Tickers without any rows are left out.
+    """
+    frames = {}
+    if hist is None or hist.empty:
+        return frames
+
+    for ticker in tickers:
+        if isinstance(hist.columns, pd.MultiIndex):
+            if ticker not in hist.columns.get_level_values(0):
+                continue
+            ticker_hist = hist[ticker]
+        else:
+            # Single ticker downloads may come back with flat columns
+            ticker_hist = hist
+
+        # Rows only exist for other tickers in the batch
+        ticker_hist = ticker_hist.dropna(how='all')
+        if ticker_hist.empty:
+            continue
+
+        frames[ticker] = _normalize_history(ticker_hist)
+
+    return frames
+
+
+class YahooProvider(Provider):
+    """Yahoo Finance through yfinance, imported on first use (it is slow to import)."""
+
+    name = "yahoo"
+
+    def history(self, ticker, timeframe, start, end, period="max"):
+        import yfinance as yf
+
+        yf_ticker = yf.Ticker(ticker)
+        yf_timeframe = TIMEFRAME_MAP.get(timeframe, "1d")
+        with timed("fetch", timeframe):
+            if start is None:
+                hist = yf_ticker.history(period=period, interval=yf_timeframe)
+            else:
+                hist = yf_ticker.history(start=start, end=end, interval=yf_timeframe)
+        with timed("parse", timeframe):
+            return _normalize_history(hist)
+
+    def download(self, tickers, timeframe, start, end, period="max"):
+        """One multi-ticker yf.download call, raising RetryableError when Yahoo throttled it."""
+        import yfinance as yf
+
+        yf_timeframe = TIMEFRAME_MAP.get(timeframe, "1d")
+        with timed("fetch", timeframe):
+            if start is None:
+                hist = yf.download(
+                    tickers, period=period, interval=yf_timeframe, group_by='ticker',
+                    auto_adjust=True, ignore_tz=False, progress=False, threads=True,
+                )
+            else:
+                hist = yf.download(
+                    tickers, start=start, end=end, interval=yf_timeframe, group_by='ticker',
+                    auto_adjust=True, ignore_tz=False, progress=False, threads=True,
+                )
+
+        # yf.download swallows per-ticker errors into a shared dict. It is
+        # process-global, so a concurrent batch may occasionally cause an extra retry.
+        errors = [str(error) for ticker, error in getattr(yf.shared, "_ERRORS", {}).items() if ticker in tickers]
+        with timed("parse", timeframe):
+            frames = _split_batch(hist, tickers)
+        if not frames and any(_is_retryable(Exception(error)) for error in errors):
+            raise RetryableError(errors[0])
+        return frames
+
+    def info(self, ticker):
+        import yfinance as yf
+
+        return yf.Ticker(ticker).info
+
+
+PROVIDERS = {
+    YahooProvider.name: YahooProvider,
+    SyntheticProvider.name: SyntheticProvider,
+}
+
+_provider = None
+
+
+def get_provider() -> Provider:
+    """Return the configured market data provider (PROVIDER, env overrides static)."""
+    global _provider
+    if _provider is None:
+        name = get_settings().provider
+        if name not in PROVIDERS:
+            raise ValueError(f"Invalid provider: {name}")
+        _provider = PROVIDERS[name].from_env()
+    return _provider
+
+
+def get_batch_data(
+    tickers: list[str],
+    timeframe: str = "1d",
+    from_date: str = None,
+    to_date: str = None,
+    period: str = "max",
+    batch_size: int = YF_BATCH_SIZE,
+) -> dict[str, pd.DataFrame]:
+    """
+    Download history for many tickers sharing the same timeframe and range.
+
+    Tickers are sent to Yahoo in chunks of batch_size symbols per request,
+    each through the request governor. Tickers whose window another caller
+    is already fetching, or fetched within YF_RESPONSE_TTL, share that
+    request instead (see SeriesFlights). Without from_date the full period is
+    fetched (like get_data), otherwise the from_date/to_date window is
+    fetched as is (see plan_ranges for splitting long ranges).
+
+    Returns:
+        Dict of ticker -> frame, only for tickers that returned data
+    """
+    provider = get_provider()
+    if from_date is not None:
+        from_date = bar_date(from_date).isoformat()
+        if to_date is None:
+            to_date = (get_today_swedish_date() + timedelta(days=1)).strftime('%Y-%m-%d')
+        else:
+            to_date = bar_date(to_date).isoformat()
+
+    frames = {}
+    shared = {}
+    for i in range(0, len(tickers), batch_size):
+        owned, waiting = flights.claim(tickers[i:i + batch_size], timeframe, from_date, to_date, period)
+        shared.update(waiting)
+        if not owned:
+            continue
+        chunk = list(owned)
+        try:
+            fetched = governor.call(provider.download, chunk, timeframe, from_date, to_date, period, timeframe=timeframe)
+        except Exception as e:
+            flights.settle(owned, timeframe, period, error=e)
+            ERRORS.inc("fetch", timeframe)
+            logger.error(f"Error getting batch data for {len(chunk)} tickers ({timeframe}): {e}")
+            continue
+        flights.settle(owned, timeframe, period, fetched)
+        frames.update(fetched)
+
+    # Tickers another caller is already fetching (or fetched moments ago)
+    for ticker, flight in shared.items():
+        try:
+            frame = flights.wait(flight, from_date, to_date)
+        except Exception as e:
+            logger.debug(f"Shared request for {ticker} ({timeframe}) failed: {e}")
+            continue
+        if frame is not None:
+            frames[ticker] = frame
+
+    return frames
+
+
+def _plan_units(requests: list[tuple[str, str, str | None]]) -> list[tuple[str, str, str | None, str | None]]:
+    """Expand (ticker, timeframe, from_date) requests into (ticker, timeframe, start, end) windows."""
+    ranges = {}
+    units = []
+    for ticker, timeframe, from_date in requests:
+        key = (timeframe, bar_date(from_date).isoformat() if from_date else None)
+        if key not in ranges:
+            ranges[key] = plan_ranges(*key)
+        for start, end in ranges[key]:
+            units.append((ticker, timeframe, start, end))
+    return units
+
+
+def _group_units(units: list[tuple[str, str, str | None, str | None]]) -> dict[tuple[str, str | None, str | None], list[str]]:
+    """Group (ticker, timeframe, start, end) windows by timeframe and window."""
+    groups: dict[tuple[str, str | None, str | None], list[str]] = {}
+    for ticker, timeframe, start, end in units:
+        groups.setdefault((timeframe, start, end), []).append(ticker)
+    return groups
+
+
+def get_grouped_data(
+    requests: list[tuple[str, str, str | None]],
+    batch_size: int = YF_BATCH_SIZE,
+    max_workers: int = 1,
+    cancel: Event | None = None,
+) -> dict[tuple[str, str], pd.DataFrame]:
+    """
+    Fetch data for (ticker, timeframe, from_date) requests. A from_date of
+    None means the full available history.
+
+    Each request is split into windows Yahoo will serve (plan_ranges), and
+    the windows shared by many tickers go out as batched downloads on up to
+    max_workers threads. The windows of each (ticker, timeframe) are then
+    stitched back together. Once cancel is set, batches that have not
+    started yet are skipped. Windows that come back without data are
+    retried in re-grouped batches for up to YF_RETRY_ROUNDS extra rounds.
+
+    Returns:
+        Dict of (ticker, timeframe) -> frame, only for requests that returned data
+    """
+    def fetch_batch(tickers: list[str], timeframe: str, start: str | None, end: str | None) -> dict[str, pd.DataFrame]:
+        if cancel is not None and cancel.is_set():
+            return {}
+        return get_batch_data(tickers, timeframe, start, end, "max", batch_size)
+
+    pieces: dict[tuple[str, str], list[pd.DataFrame]] = {}
+    pending = _plan_units(requests)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="update-fetch") as executor:
+        for round_number in range(YF_RETRY_ROUNDS + 1):
+            if round_number > 0:
+                if cancel is not None and cancel.is_set():
+                    break
+                logger.info(f"Retrying {len(pending)} windows without data (round {round_number}/{YF_RETRY_ROUNDS})")
+
+            batches = []
+            for (timeframe, start, end), tickers in _group_units(pending).items():
+                logger.info(f"Fetching {len(tickers)} tickers for {timeframe} from {start or 'max'} to {end or 'now'}")
+                for i in range(0, len(tickers), batch_size):
+                    batches.append((tickers[i:i + batch_size], timeframe, start, end))
+
+            futures = [executor.submit(fetch_batch, *batch) for batch in batches]
+            fetched_units = set()
+            for future, (_, timeframe, start, end) in zip(futures, batches):
+                for ticker, frame in future.result().items():
+                    pieces.setdefault((ticker, timeframe), []).append(frame)
+                    fetched_units.add((ticker, timeframe, start, end))
+
+            pending = [unit for unit in pending if unit not in fetched_units]
+            if not pending:
+                break
+
+    return {key: _stitch(frames) for key, frames in pieces.items()}
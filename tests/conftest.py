@@ -0,0 +1,23 @@
+import pandas as pd
+import pytest
+
+import service.files
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Store series under a temporary directory instead of DATA_DIR."""
+    monkeypatch.setattr(service.files, "DATA_DIR", tmp_path)
+    return tmp_path
+
+
+def make_bars(dates: pd.DatetimeIndex, close: float = 100.0) -> pd.DataFrame:
+    """Daily bars in the layout the pipeline stores, one per date."""
+    return pd.DataFrame({
+        "Date": dates,
+        "Open": close,
+        "High": close + 1,
+        "Low": close - 1,
+        "Close": close,
+        "Volume": 1000,
+    })
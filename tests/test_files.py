@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from service.files import add_ticker, append_ticker, get_ticker_path, read_ticker_range, _index_path, _load_index
+from tests.conftest import make_bars
+
+TZ = "America/New_York"
+
+
+def _days(start: str, periods: int) -> pd.DatetimeIndex:
+    return pd.date_range(start, periods=periods, freq="D", tz=TZ)
+
+
+def _store(periods: int = 10) -> Path:
+    add_ticker("AAPL", "NMS", "1d", make_bars(_days("2024-01-01", periods)), None)
+    return get_ticker_path("NMS", "AAPL", "1d")
+
+
+def _assert_index(path) -> None:
+    """The stored row index matches the bytes and dates of the CSV."""
+    raw = path.read_bytes()
+    index = _load_index(path)
+    assert index is not None
+    assert index["ino"] == path.stat().st_ino
+    assert index["end"] == len(raw)
+
+    header_end = raw.index(b"\n") + 1
+    line_ends = np.flatnonzero(np.frombuffer(raw, dtype=np.uint8) == ord("\n"))
+    np.testing.assert_array_equal(index["offsets"], line_ends[:-1] + 1)
+    assert index["offsets"][0] == header_end
+
+    dates = pd.to_datetime(pd.read_csv(path)["Date"], utc=True).dt.as_unit("ns").astype("int64").to_numpy()
+    np.testing.assert_array_equal(index["timestamps"], dates)
+
+
+def test_append_extends_in_place(data_dir):
+    path = _store()
+    ino = path.stat().st_ino
+
+    last_date, rows = append_ticker("AAPL", "NMS", "1d", make_bars(_days("2024-01-11", 3)))
+
+    assert rows == 3
+    assert last_date.startswith("2024-01-13")
+    assert path.stat().st_ino == ino
+    assert len(pd.read_csv(path)) == 13
+    _assert_index(path)
+
+
+def test_append_overlap_replaces_stored_bars(data_dir):
+    path = _store()
+    ino = path.stat().st_ino
+
+    # New bars for days 7 and 8: day 9 and 10 stay after them
+    last_date, rows = append_ticker("AAPL", "NMS", "1d", make_bars(_days("2024-01-07", 2), close=200.0))
+
+    assert rows == 0
+    assert last_date.startswith("2024-01-10")
+    assert path.stat().st_ino != ino
+    stored = pd.read_csv(path)
+    assert len(stored) == 10
+    assert stored["Close"].tolist() == [100.0] * 6 + [200.0] * 2 + [100.0] * 2
+    _assert_index(path)
+
+
+def test_append_overlap_and_extend(data_dir):
+    path = _store()
+
+    _, rows = append_ticker("AAPL", "NMS", "1d", make_bars(_days("2024-01-09", 4), close=200.0))
+
+    assert rows == 2
+    stored = pd.read_csv(path)
+    assert len(stored) == 12
+    assert stored["Close"].tolist() == [100.0] * 8 + [200.0] * 4
+    _assert_index(path)
+
+
+def test_append_writes_over_cut_short_row(data_dir):
+    path = _store()
+    with open(path, "ab") as f:
+        f.write(b"2024-01-11 00:00:00-05:00,100.0,10")
+
+    # Readers stop at the last complete row
+    assert len(read_ticker_range("AAPL", "NMS", "1d")) == 10
+
+    _, rows = append_ticker("AAPL", "NMS", "1d", make_bars(_days("2024-01-11", 1), close=200.0))
+
+    assert rows == 1
+    raw = path.read_bytes()
+    assert raw.endswith(b"\n")
+    assert raw.count(b"2024-01-11") == 1
+    assert pd.read_csv(path)["Close"].iloc[-1] == 200.0
+    _assert_index(path)
+
+
+def test_append_overlap_beyond_tail_merges(data_dir):
+    path = _store()
+
+    _, rows = append_ticker("AAPL", "NMS", "1d", make_bars(_days("2024-01-02", 1), close=200.0), tail_bytes=100)
+
+    assert rows == 0
+    assert pd.read_csv(path)["Close"].tolist() == [100.0] + [200.0] + [100.0] * 8
+    _assert_index(path)
+
+
+def test_index_rebuilt_and_extended_by_readers(data_dir):
+    path = _store()
+    _index_path(path).unlink()
+
+    assert len(read_ticker_range("AAPL", "NMS", "1d")) == 10
+    _assert_index(path)
+
+    # Rows written without updating the index are indexed on the next read
+    with open(path, "ab") as f:
+        f.write(make_bars(_days("2024-01-11", 2)).to_csv(header=False, index=False).encode())
+    start = pd.Timestamp("2024-01-10", tz=TZ).as_unit("ns").value
+    assert len(read_ticker_range("AAPL", "NMS", "1d", start_ns=start)) == 3
+    _assert_index(path)
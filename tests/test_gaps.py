@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+
+from service.gaps import scan_gaps, _within_gaps
+from service.time import get_calendar
+
+TZ = "America/New_York"
+HOUR_NS = 3600 * 1_000_000_000
+
+
+def _daily(start: str, end: str) -> np.ndarray:
+    return get_calendar("NMS").bar_starts("1d", date.fromisoformat(start), date.fromisoformat(end))
+
+
+def test_no_gap_across_holiday():
+    # Good Friday 2024-03-29 is not a session
+    assert scan_gaps("NMS", "1d", _daily("2024-03-25", "2024-04-05")) == []
+
+
+def test_gap_across_holiday():
+    stored = _daily("2024-03-25", "2024-04-05")
+    days = pd.DatetimeIndex(stored, tz="UTC").tz_convert(TZ).strftime("%Y-%m-%d")
+    stored = stored[~days.isin(["2024-03-28", "2024-04-01", "2024-04-02", "2024-04-04"])]
+
+    gaps = scan_gaps("NMS", "1d", stored)
+
+    # Good Friday is not an expected bar, so the bars missing around it form one gap
+    assert [(first.date().isoformat(), last.date().isoformat(), count) for first, last, count in gaps] == [
+        ("2024-03-28", "2024-04-02", 3),
+        ("2024-04-04", "2024-04-04", 1),
+    ]
+
+
+def test_daily_bars_not_stamped_at_midnight():
+    # Yahoo sometimes stamps daily bars at the open instead of midnight
+    stored = _daily("2024-03-25", "2024-04-05") + 9 * HOUR_NS + 30 * 60 * 1_000_000_000
+    assert scan_gaps("NMS", "1d", stored) == []
+
+
+def test_intraday_gap_across_holiday():
+    calendar = get_calendar("NMS")
+    stored = calendar.bar_starts("1h", date(2024, 7, 3), date(2024, 7, 5))
+    assert scan_gaps("NMS", "1h", stored) == []
+
+    # The missing hours of July 5 form one gap after the Independence Day holiday
+    gaps = scan_gaps("NMS", "1h", np.r_[stored[:7], stored[-1:]])
+    assert len(gaps) == 1
+    first, last, count = gaps[0]
+    assert (first.isoformat(), last.isoformat(), count) == ("2024-07-05T09:30:00-04:00", "2024-07-05T14:30:00-04:00", 6)
+
+
+def test_fetched_rows_within_gaps():
+    gaps = [
+        (pd.Timestamp("2024-03-28", tz=TZ), pd.Timestamp("2024-03-28", tz=TZ), 1),
+        (pd.Timestamp("2024-04-01", tz=TZ), pd.Timestamp("2024-04-02", tz=TZ), 2),
+    ]
+    fetched = pd.DataFrame({
+        "Date": pd.to_datetime(["2024-03-27 00:00", "2024-03-28 00:00", "2024-04-01 00:00", "2024-04-02 09:30", "2024-04-03 00:00"]).tz_localize(TZ),
+        "Close": [1.0, 2.0, 3.0, 4.0, 5.0],
+    })
+
+    # The last missing day is kept even when its bar is not stamped at midnight
+    assert _within_gaps(fetched, gaps, "1d", TZ)["Close"].tolist() == [2.0, 3.0, 4.0]
@@ -0,0 +1,90 @@
+import pytest
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from service.time import SessionCalendar, get_calendar, _easter, _holiday_dates
+
+
+def _dates(*days: str) -> set[date]:
+    return {date.fromisoformat(day) for day in days}
+
+
+@pytest.mark.parametrize("year, expected", [(2024, "2024-03-31"), (2025, "2025-04-20"), (2038, "2038-04-25")])
+def test_easter(year, expected):
+    assert _easter(year) == date.fromisoformat(expected)
+
+
+# Published holiday calendars of each exchange for one year (weekdays only)
+@pytest.mark.parametrize("exchange, year, expected", [
+    # Christmas on Saturday moves back to Friday, New Year's Day 2022 on Saturday is not moved into 2021
+    ("NMS", 2021, ["2021-01-01", "2021-01-18", "2021-02-15", "2021-04-02", "2021-05-31", "2021-07-05",
+                   "2021-09-06", "2021-11-25", "2021-12-24"]),
+    # Juneteenth from 2022, on Sunday moved to Monday
+    ("NYQ", 2022, ["2022-01-17", "2022-02-21", "2022-04-15", "2022-05-30", "2022-06-20", "2022-07-04",
+                   "2022-09-05", "2022-11-24", "2022-12-26"]),
+    # Christmas and Boxing Day on the weekend both move to the next free weekdays
+    ("LON", 2021, ["2021-01-01", "2021-04-02", "2021-04-05", "2021-05-03", "2021-05-31", "2021-08-30",
+                   "2021-12-27", "2021-12-28"]),
+    # Weekend holidays are dropped
+    ("FRA", 2022, ["2022-04-15", "2022-04-18", "2022-12-26"]),
+    ("STO", 2024, ["2024-01-01", "2024-03-29", "2024-04-01", "2024-05-01", "2024-05-09", "2024-06-06",
+                   "2024-06-21", "2024-12-24", "2024-12-25", "2024-12-26", "2024-12-31"]),
+    ("PAR", 2024, ["2024-01-01", "2024-03-29", "2024-04-01", "2024-05-01", "2024-12-25", "2024-12-26"]),
+    # Constitution Day on Saturday is dropped, Greenery Day on Sunday moves past Children's Day
+    ("TYO", 2025, ["2025-01-01", "2025-01-02", "2025-01-03", "2025-01-13", "2025-02-11", "2025-02-24",
+                   "2025-04-29", "2025-05-05", "2025-05-06", "2025-07-21", "2025-08-11", "2025-09-15",
+                   "2025-10-13", "2025-11-03", "2025-11-24", "2025-12-31"]),
+    # Sunday holidays move to Monday, Saturday ones (HKSAR Establishment Day) are dropped
+    ("HKG", 2023, ["2023-01-02", "2023-04-07", "2023-04-10", "2023-05-01", "2023-10-02", "2023-12-25",
+                   "2023-12-26"]),
+    # Christmas on Saturday and Boxing Day on Sunday move to Monday and Tuesday
+    ("TSE", 2021, ["2021-01-01", "2021-02-15", "2021-04-02", "2021-05-24", "2021-07-01", "2021-08-02",
+                   "2021-09-06", "2021-10-11", "2021-12-27", "2021-12-28"]),
+])
+def test_holidays(exchange, year, expected):
+    assert _holiday_dates(exchange, year, year) == _dates(*expected)
+
+
+def test_rule_years():
+    # Juneteenth is only observed from 2022
+    assert date(2021, 6, 18) not in _holiday_dates("NMS", 2021, 2021)
+    assert date(2023, 6, 19) in _holiday_dates("NMS", 2023, 2023)
+
+
+def test_sessions_skip_weekends_and_holidays():
+    calendar = get_calendar("NMS")
+    sessions = calendar.sessions_between(date(2024, 3, 27), date(2024, 4, 2))
+    assert [str(day) for day in sessions] == ["2024-03-27", "2024-03-28", "2024-04-01", "2024-04-02"]
+    assert not calendar.is_session(date(2024, 3, 29))
+    assert not calendar.is_session(date(2024, 3, 30))
+
+
+def test_session_hours_follow_dst():
+    calendar = get_calendar("NMS")
+    # New York switches to daylight saving time two weeks before Europe
+    opens, closes = calendar.session_hours_between(date(2024, 3, 8), date(2024, 3, 11))
+    utc = [datetime.fromtimestamp(ns / 1e9, ZoneInfo("UTC")).strftime("%H:%M") for ns in [*opens, *closes]]
+    assert utc == ["14:30", "13:30", "21:00", "20:00"]
+
+
+def test_intraday_bar_starts():
+    calendar = get_calendar("LON")
+    starts = calendar.bar_starts("1h", date(2024, 1, 2), date(2024, 1, 2))
+    local = [datetime.fromtimestamp(ns / 1e9, ZoneInfo("Europe/London")).strftime("%H:%M") for ns in starts]
+    # The last bar starts at 16:00 and is cut short by the 16:30 close
+    assert local == ["08:00", "09:00", "10:00", "11:00", "12:00", "13:00", "14:00", "15:00", "16:00"]
+
+
+def test_last_closed_session():
+    calendar = get_calendar("STO")
+    stockholm = ZoneInfo("Europe/Stockholm")
+    # Before the Friday close the last closed session is Thursday, after it Friday
+    assert str(calendar.last_closed_session(datetime(2024, 6, 14, 17, 0, tzinfo=stockholm))) == "2024-06-13"
+    assert str(calendar.last_closed_session(datetime(2024, 6, 14, 18, 0, tzinfo=stockholm))) == "2024-06-14"
+    # Midsummer Eve is not a session
+    assert str(calendar.last_closed_session(datetime(2024, 6, 22, 12, 0, tzinfo=stockholm))) == "2024-06-20"
+
+
+def test_unknown_exchange():
+    with pytest.raises(ValueError):
+        SessionCalendar("XXX", 2024, 2024)